@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -16,6 +17,7 @@ from api.routers import (
     health,
     models,
     notebooks,
+    search,
     settings,
     source_chat,
     sources,
@@ -60,12 +62,72 @@ async def lifespan(app: FastAPI):
         # Fail fast - don't start the API with an outdated database schema
         raise RuntimeError(f"Failed to run database migrations: {str(e)}") from e
 
+    # Vector index depends on the embedding model dimension, so it is managed
+    # outside the migrations. Search falls back to a full scan without it.
+    try:
+        from open_notebook.utils.vector_index import ensure_vector_index
+
+        dimension = await ensure_vector_index()
+        if dimension:
+            logger.info(f"Vector index ready (dimension {dimension})")
+    except Exception as e:
+        logger.warning(f"Could not set up vector index: {str(e)}")
+
+    # Compile the prompt templates once, before the first request needs them
+    try:
+        from open_notebook.utils.prompt_templates import precompile_prompts
+
+        logger.info(f"Compiled {precompile_prompts()} prompt templates")
+    except Exception as e:
+        logger.warning(f"Could not precompile prompt templates: {str(e)}")
+
+    # Keep the chat checkpoint database from growing without bound
+    checkpoint_pruning = None
+    try:
+        from open_notebook.graphs.checkpoint import (
+            CHECKPOINT_PRUNE_INTERVAL_SECONDS,
+            prune_checkpoints_periodically,
+        )
+
+        if CHECKPOINT_PRUNE_INTERVAL_SECONDS > 0:
+            checkpoint_pruning = asyncio.create_task(prune_checkpoints_periodically())
+    except Exception as e:
+        logger.warning(f"Could not start chat checkpoint pruning: {str(e)}")
+
+    # Pick up settings changes made by other processes
+    settings_watch = None
+    try:
+        from open_notebook.utils.settings_cache import (
+            SETTINGS_LIVE_UPDATES,
+            watch_settings,
+        )
+
+        if SETTINGS_LIVE_UPDATES:
+            settings_watch = asyncio.create_task(watch_settings())
+    except Exception as e:
+        logger.warning(f"Could not start settings live updates: {str(e)}")
+
     logger.success("API initialization completed successfully")
 
     # Yield control to the application
     yield
 
     # Shutdown: cleanup if needed
+    for task in (checkpoint_pruning, settings_watch):
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    try:
+        from open_notebook.graphs.checkpoint import close_checkpointer
+
+        await close_checkpointer()
+    except Exception as e:
+        logger.warning(f"Could not close chat checkpointer: {str(e)}")
+
     logger.info("API shutdown complete")
 
 
@@ -94,6 +156,7 @@ app.include_router(embedding.router, prefix="/api", tags=["embedding"])
 app.include_router(embedding_rebuild.router, prefix="/api/embeddings", tags=["embeddings"])
 app.include_router(settings.router, prefix="/api", tags=["settings"])
 app.include_router(context.router, prefix="/api", tags=["context"])
+app.include_router(search.router, prefix="/api", tags=["search"])
 app.include_router(sources.router, prefix="/api", tags=["sources"])
 app.include_router(commands_router.router, prefix="/api", tags=["commands"])
 app.include_router(chat.router, prefix="/api", tags=["chat"])
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, Field, model_validator
@@ -72,6 +73,15 @@ class RebuildRequest(BaseModel):
         description="Rebuild mode: 'existing' only re-embeds items with embeddings, 'all' embeds everything",
     )
     include_sources: bool = Field(True, description="Include sources in rebuild")
+    concurrency: Optional[int] = Field(
+        None, ge=1, description="Number of sources re-embedded concurrently"
+    )
+    rate_limit_per_minute: Optional[int] = Field(
+        None, ge=0, description="Max embedding provider calls per minute (0 = unlimited)"
+    )
+    resume: bool = Field(
+        True, description="Resume an interrupted rebuild with the same parameters"
+    )
 
 
 class RebuildResponse(BaseModel):
@@ -220,6 +230,40 @@ class ContextResponse(BaseModel):
     total_tokens: Optional[int] = Field(None, description="Estimated token count")
 
 
+# Search API models
+class SearchRequest(BaseModel):
+    query: str = Field(..., min_length=1, description="Search query")
+    mode: Literal["text", "vector", "hybrid"] = Field(
+        "hybrid", description="BM25 text search, vector search, or both fused with RRF"
+    )
+    notebook_id: Optional[str] = Field(None, description="Only search this notebook's sources")
+    source_ids: Optional[List[str]] = Field(None, description="Only search these sources")
+    created_after: Optional[datetime] = Field(None, description="Only sources created at or after")
+    created_before: Optional[datetime] = Field(None, description="Only sources created at or before")
+    min_similarity: float = Field(
+        0.0, ge=0.0, le=1.0, description="Cosine threshold for vector hits"
+    )
+    limit: int = Field(10, ge=1, le=50, description="Results per page")
+    cursor: Optional[str] = Field(None, description="Cursor from the previous page")
+
+
+class SearchResult(BaseModel):
+    source_id: str
+    source_title: Optional[str] = None
+    order: int = Field(..., description="Chunk position within the source")
+    content: str
+    score: float = Field(..., description="Ranking score for the selected mode")
+    similarity: Optional[float] = None
+    bm25_score: Optional[float] = None
+
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page")
+    mode: str
+    took_ms: float = Field(..., description="Retrieval time in milliseconds")
+
+
 # Source status response
 class SourceStatusResponse(BaseModel):
     status: Optional[str] = Field(None, description="Processing status")
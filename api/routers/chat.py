@@ -11,7 +11,7 @@ from open_notebook.domain.notebook import ChatSession, Notebook, Source
 from open_notebook.exceptions import (
     NotFoundError,
 )
-from open_notebook.graphs.chat import graph as chat_graph
+from open_notebook.graphs.chat import get_graph as get_chat_graph
 
 router = APIRouter()
 
@@ -191,7 +191,7 @@ async def get_session(session_id: str):
             raise HTTPException(status_code=404, detail="Session not found")
 
         # Get session state from LangGraph to retrieve messages
-        thread_state = chat_graph.get_state(
+        thread_state = await get_chat_graph().aget_state(
             config=RunnableConfig(configurable={"thread_id": session_id})
         )
 
@@ -375,7 +375,8 @@ async def execute_chat(request: ExecuteChatRequest):
         )
 
         # Get current state
-        current_state = chat_graph.get_state(
+        chat_graph = get_chat_graph()
+        current_state = await chat_graph.aget_state(
             config=RunnableConfig(
                 configurable={"thread_id": request.session_id}
             )
@@ -394,7 +395,7 @@ async def execute_chat(request: ExecuteChatRequest):
         state_values["messages"].append(user_message)
 
         # Execute chat graph
-        result = chat_graph.invoke(
+        result = await chat_graph.ainvoke(
             input=state_values,  # type: ignore[arg-type]
             config=RunnableConfig(
                 configurable={
@@ -467,6 +468,9 @@ async def build_context(request: BuildContextRequest):
 
         context_data: dict[str, list[dict[str, str]]] = {"sources": []}
         total_content = ""
+        # Counts stored on sources at ingestion time
+        stored_tokens = 0
+        stored_chars = 0
 
         # Process context configuration if provided
         if request.context_config:
@@ -491,7 +495,12 @@ async def build_context(request: BuildContextRequest):
                     if "full content" in status:
                         source_context = await source.get_context(context_size="long")
                         context_data["sources"].append(source_context)
-                        total_content += str(source_context)
+                        if source.token_count is not None and source.char_count is not None:
+                            stored_tokens += source.token_count
+                            stored_chars += source.char_count
+                            total_content += str({**source_context, "full_text": None})
+                        else:
+                            total_content += str(source_context)
                 except Exception as e:
                     logger.warning(f"Error processing source {source_id}: {str(e)}")
                     continue
@@ -508,12 +517,14 @@ async def build_context(request: BuildContextRequest):
                     continue
 
         # Calculate character and token counts
-        char_count = len(total_content)
+        char_count = stored_chars + len(total_content)
         # Use token count utility if available
         try:
             from open_notebook.utils import token_count
 
-            estimated_tokens = token_count(total_content) if total_content else 0
+            estimated_tokens = stored_tokens + (
+                token_count(total_content) if total_content else 0
+            )
         except ImportError:
             # Fallback to simple estimation
             estimated_tokens = char_count // 4
@@ -21,6 +21,8 @@ async def get_notebook_context(notebook_id: str, context_request: ContextRequest
 
         context_data: dict[str, list[dict[str, str]]] = {"source": []}
         total_content = ""
+        # Token counts stored on sources at ingestion time
+        stored_tokens = 0
 
         # Process context configuration if provided
         if context_request.context_config:
@@ -45,7 +47,11 @@ async def get_notebook_context(notebook_id: str, context_request: ContextRequest
                     if "full content" in status:
                         source_context = await source.get_context(context_size="long")
                         context_data["source"].append(source_context)
-                        total_content += str(source_context)
+                        if source.token_count is not None:
+                            stored_tokens += source.token_count
+                            total_content += str({**source_context, "full_text": None})
+                        else:
+                            total_content += str(source_context)
                 except Exception as e:
                     logger.warning(f"Error processing source {source_id}: {str(e)}")
                     continue
@@ -62,7 +68,9 @@ async def get_notebook_context(notebook_id: str, context_request: ContextRequest
                     continue
 
         # Calculate estimated token count
-        estimated_tokens = token_count(total_content) if total_content else 0
+        estimated_tokens = stored_tokens + (
+            token_count(total_content) if total_content else 0
+        )
 
         return ContextResponse(
             notebook_id=notebook_id,
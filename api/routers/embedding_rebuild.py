@@ -22,6 +22,9 @@ async def start_rebuild(request: RebuildRequest):
 
     - **mode**: "existing" (re-embed items with embeddings) or "all" (embed everything)
     - **include_sources**: Include sources in rebuild (default: true)
+    - **concurrency**: Sources re-embedded in parallel (default: REBUILD_CONCURRENCY)
+    - **rate_limit_per_minute**: Embedding provider calls per minute (0 = unlimited)
+    - **resume**: Continue an interrupted rebuild instead of starting over (default: true)
 
     Returns command ID to track progress and estimated item count.
     """
@@ -67,6 +70,9 @@ async def start_rebuild(request: RebuildRequest):
             {
                 "mode": request.mode,
                 "include_sources": request.include_sources,
+                "concurrency": request.concurrency,
+                "rate_limit_per_minute": request.rate_limit_per_minute,
+                "resume": request.resume,
             },
         )
 
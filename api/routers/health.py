@@ -1,8 +1,9 @@
-from typing import Dict, Any, Optional, Tuple, List
+from typing import AsyncGenerator, Dict, Any, Optional, Set, Tuple, List, Union
 from fastapi import APIRouter, HTTPException, Header, BackgroundTasks
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from ai_prompter import Prompter
+from fastapi.responses import StreamingResponse
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, AIMessage
 from datetime import datetime
+import json
 import re
 import os
 import random
@@ -23,13 +24,24 @@ from api.models import (
     HealthChatSessionListResponse,
     HealthChatSessionDetailResponse,
     HealthChatSessionUpdateRequest,
+    HealthReferenceItem,
 )
 from open_notebook.domain.models import model_manager
-from open_notebook.domain.notebook import Notebook, Source
+from open_notebook.domain.notebook import Notebook
 from open_notebook.domain.health import HealthExamination, HealthChatSession
 from open_notebook.database.repository import repo_query, ensure_record_id
-from open_notebook.graphs.chat import graph as chat_graph
-from open_notebook.graphs.utils import provision_langchain_model
+from open_notebook.utils.chat_history import build_history, schedule_summary, summary_section
+from open_notebook.utils.notebook_context import (
+    build_notebook_context,
+    context_covers,
+    get_notebook_context,
+)
+from open_notebook.utils.prompt_templates import render_prompt
+from open_notebook.utils.recommendation_cache import (
+    RECOMMENDATION_CACHE_TTL_SECONDS,
+    recommendation_cache,
+    recommendation_key,
+)
 
 router = APIRouter()
 
@@ -94,64 +106,74 @@ def detect_language(text: str) -> str:
     
     return 'id'
 
+def _predict(request: HealthPredictionRequest) -> Dict[str, Any]:
+    return health_prediction_service.predict(
+        age=request.age,
+        gender=request.gender,
+        height=request.height,
+        weight=request.weight,
+        systolic_bp=request.systolic_blood_pressure,
+        diastolic_bp=request.diastolic_blood_pressure,
+        cholesterol=request.cholesterol,
+        glucose=request.glucose,
+        smoking=request.smoking,
+        alcohol=request.alcohol,
+        physical_activity=request.physical_activity,
+    )
+
+
+async def _save_examination(
+    request: HealthPredictionRequest, result: Dict[str, Any], x_user_id: Optional[str]
+) -> Optional[str]:
+    """Save the examination and its prediction; returns the short examination id."""
+    resolved_user_id: Optional[str] = None
+    if x_user_id:
+        try:
+            rows = await repo_query(
+                "SELECT id FROM user WHERE session_token = $session_token LIMIT 1",
+                {"session_token": x_user_id},
+            )
+            if rows:
+                raw_id = rows[0].get("id", "")
+                resolved_user_id = (
+                    raw_id.split(":")[-1] if ":" in raw_id else raw_id
+                )
+        except Exception as resolve_error:  # pragma: no cover - best effort
+            pass
+
+    examination = HealthExamination(
+        user_id=resolved_user_id,
+        age=request.age,
+        gender=request.gender,
+        height=request.height,
+        weight=request.weight,
+        systolic_bp=request.systolic_blood_pressure,
+        diastolic_bp=request.diastolic_blood_pressure,
+        bmi=result["bmi"],
+        pulse_pressure=result["pulse_pressure"],
+        risk_level=result["risk_level"],
+        prediction_proba=result["probabilities"]["disease"] / 100.0,
+        cholesterol=request.cholesterol,
+        glucose=request.glucose,
+        smoking=request.smoking,
+        alcohol=request.alcohol,
+        physical_activity=request.physical_activity,
+    )
+    await examination.save()
+    
+    examination_id = None
+    if examination.id:
+        examination_id = examination.id.split(":")[-1] if ":" in examination.id else examination.id
+    return examination_id
+
 @router.post("/health/predict", response_model=HealthPredictionResponse)
 async def predict_health(
     request: HealthPredictionRequest,
     x_user_id: Optional[str] = Header(default=None, alias="X-User-Id"),
 ):
     try:
-        result = health_prediction_service.predict(
-            age=request.age,
-            gender=request.gender,
-            height=request.height,
-            weight=request.weight,
-            systolic_bp=request.systolic_blood_pressure,
-            diastolic_bp=request.diastolic_blood_pressure,
-            cholesterol=request.cholesterol,
-            glucose=request.glucose,
-            smoking=request.smoking,
-            alcohol=request.alcohol,
-            physical_activity=request.physical_activity,
-        )
-
-        resolved_user_id: Optional[str] = None
-        if x_user_id:
-            try:
-                rows = await repo_query(
-                    "SELECT id FROM user WHERE session_token = $session_token LIMIT 1",
-                    {"session_token": x_user_id},
-                )
-                if rows:
-                    raw_id = rows[0].get("id", "")
-                    resolved_user_id = (
-                        raw_id.split(":")[-1] if ":" in raw_id else raw_id
-                    )
-            except Exception as resolve_error:  # pragma: no cover - best effort
-                pass
-
-        examination = HealthExamination(
-            user_id=resolved_user_id,
-            age=request.age,
-            gender=request.gender,
-            height=request.height,
-            weight=request.weight,
-            systolic_bp=request.systolic_blood_pressure,
-            diastolic_bp=request.diastolic_blood_pressure,
-            bmi=result["bmi"],
-            pulse_pressure=result["pulse_pressure"],
-            risk_level=result["risk_level"],
-            prediction_proba=result["probabilities"]["disease"] / 100.0,
-            cholesterol=request.cholesterol,
-            glucose=request.glucose,
-            smoking=request.smoking,
-            alcohol=request.alcohol,
-            physical_activity=request.physical_activity,
-        )
-        await examination.save()
-        
-        examination_id = None
-        if examination.id:
-            examination_id = examination.id.split(":")[-1] if ":" in examination.id else examination.id
+        result = _predict(request)
+        examination_id = await _save_examination(request, result, x_user_id)
 
         return HealthPredictionResponse(
             success=True,
@@ -163,284 +185,259 @@ async def predict_health(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in health prediction: {str(e)}")
 
+HEALTH_CONTEXT_QUERY = "health lifestyle recommendation diet physical activity exercise cardiovascular disease prevention BMI blood pressure cholesterol glucose smoking alcohol"
+
 async def _build_notebook_context(notebook_id: Optional[str] = None, query_text: Optional[str] = None) -> Tuple[str, List[str]]:
-    """Build context string from notebook sources using semantic search if query provided, and return list of available IDs."""
+    """Return the notebook context (served from its precomputed snapshot when current) and list of available IDs."""
     try:
         if not notebook_id:
-            notebooks = await Notebook.get_all(order_by="updated desc")
-            if not notebooks:
-                return "", []
-            notebook = notebooks[0]
+            notebook = await Notebook.get_latest()
         else:
             notebook = await Notebook.get(notebook_id)
         
         if not notebook:
             return "", []
 
-        context_parts = []
-        available_ids = []
-        sources_to_include = []
-        
-        if query_text:
-            try:
-                embedding_model = await model_manager.get_embedding_model()
-                if embedding_model:
-                    query_embedding = await embedding_model.aembed_query(query_text)
-                    
-                    results = await repo_query(
-                        """
-                        SELECT 
-                            source.id as id,
-                            source.title as title,
-                            source_embedding.content as content,
-                            vector::similarity::cosine(source_embedding.embedding, $query_embedding) as similarity
-                        FROM source_embedding
-                        WHERE source.notebook = $notebook_id
-                            AND source_embedding.embedding != NONE
-                            AND array::len(source_embedding.embedding) = array::len($query_embedding)
-                            AND vector::similarity::cosine(source_embedding.embedding, $query_embedding) >= 0.4
-                        ORDER BY similarity DESC
-                        LIMIT 8
-                        """,
-                        {
-                            "notebook_id": notebook.id,
-                            "query_embedding": query_embedding
-                        }
-                    )
-                    
-                    source_ids_found = set()
-                    for result in results:
-                        source_id = result.get('id')
-                        if source_id and source_id not in source_ids_found:
-                            source_ids_found.add(source_id)
-                            try:
-                                source = await Source.get(source_id)
-                                if source:
-                                    chat_include = getattr(source, 'chat_include', None) or 'full'
-                                    if chat_include != 'off':
-                                        sources_to_include.append((source, result.get('similarity', 0)))
-                            except Exception:
-                                continue
-                    
-                    sources_to_include.sort(key=lambda x: x[1], reverse=True)
-                    sources_to_include = [s[0] for s in sources_to_include[:5]]
-            except Exception:
-                pass
-        
-        if not sources_to_include:
-            sources = await notebook.get_sources()
-            sources_to_include = sources[:5]
-        
-        max_sources = 5
-        sources_added = 0
-        
-        for source in sources_to_include:
-            try:
-                if sources_added >= max_sources:
-                    break
-                
-                chat_include = getattr(source, 'chat_include', None) or 'full'
-                
-                if chat_include == 'off':
-                    continue
-                
-                source_context = await source.get_context(context_size="full")
-                source_id = source.id
-                source_id_clean = source_id.split(':')[-1] if ':' in source_id else source_id
-                source_ref_id = f"source:{source_id_clean}"
-                
-                context_text = f"=== {source_ref_id} ===\n"
-                context_text += f"Title: {source_context.get('title', 'No title')}\n"
-                
-                if chat_include == 'full':
-                    available_ids.append(source_ref_id)
-                    full_text = source_context.get('full_text', '')
-                    if full_text:
-                        context_text += f"\nFull Content: {full_text[:8000]}{'...' if len(full_text) > 8000 else ''}\n"
-                else:
-                    available_ids.append(source_ref_id)
-                
-                context_parts.append(context_text)
-                sources_added += 1
-            except Exception as e:
-                continue
+        return await get_notebook_context(notebook, query_text)
+    except Exception as e:
+        return "", []
 
-        context_str = "\n\n".join(context_parts) if context_parts else ""
+async def _session_context(session: HealthChatSession, message: str) -> Tuple[str, List[str]]:
+    """
+    Context for a chat turn, reusing the retrieval stored on the session.
+
+    The stored context is kept while the notebook is unchanged and covers the
+    message; otherwise the message itself is used as the retrieval query.
+    """
+    try:
+        notebook = await Notebook.get_latest()
+        if not notebook:
+            return "", []
+
+        version = str(notebook.updated)
+        if session.has_context(str(notebook.id), version):
+            context_str, available_ids = session.context or "", list(session.context_ids)
+        else:
+            context_str, available_ids = await get_notebook_context(notebook, HEALTH_CONTEXT_QUERY)
+
+        if message.strip() and not context_covers(message, context_str):
+            message_context, message_ids, retrieved = await build_notebook_context(notebook, message)
+            if retrieved:
+                context_str, available_ids = message_context, message_ids
+
+        session.set_context(str(notebook.id), version, context_str, available_ids)
         return context_str, available_ids
     except Exception as e:
         return "", []
 
-@router.post("/health/recommendation", response_model=HealthRecommendationResponse)
-async def get_health_recommendation(request: HealthRecommendationRequest):
+def _gender_text(gender: int) -> str:
+    return "Perempuan" if gender == 1 else "Laki-laki"
+
+
+def _risk_level_text(risk_level: str) -> str:
+    return {
+        "low": "rendah",
+        "medium": "sedang",
+        "high": "tinggi",
+    }.get(risk_level, risk_level)
+
+
+async def _prepare_recommendation(
+    request: HealthRecommendationRequest,
+    context: Optional[Tuple[str, List[str]]] = None,
+) -> Union[HealthRecommendationResponse, Tuple[Any, List[BaseMessage], str, Tuple, bool]]:
+    """
+    Build the model input for a recommendation.
+
+    Pass `context` when the notebook context was already retrieved. Returns a
+    HealthRecommendationResponse instead when the request is answered without
+    calling the model (no chat model configured, cached recommendation).
+    """
+    chat_model = await model_manager.get_default_model("chat")
+    if not chat_model:
+        return HealthRecommendationResponse(
+            success=False,
+            recommendation="",
+            error="Chat Model belum dikonfigurasi. Silakan konfigurasi Chat Model di Model Management terlebih dahulu.",
+        )
+
+    if context is None:
+        context = await _build_notebook_context(query_text=HEALTH_CONTEXT_QUERY)
+    context_str, available_ids = context
+
+    trulens_enabled = await get_trulens_enabled()
+    cache_key = recommendation_key(
+        request,
+        context_str,
+        available_ids,
+        (await model_manager.get_defaults()).default_chat_model,
+        trulens_enabled,
+    )
+    if RECOMMENDATION_CACHE_TTL_SECONDS > 0:
+        cached_response = recommendation_cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response.model_copy(deep=True)
+    
+    gender_text = _gender_text(request.gender)
+    risk_level_text = _risk_level_text(request.risk_level)
+
+    system_prompt_data = {
+        "notebook": None,
+        "context": context_str if context_str else None,
+        "available_ids": available_ids if available_ids else [],
+    }
+    
+    system_prompt = render_prompt("health_recommendation_system", system_prompt_data)
+    
+    optional_fields = {}
+    if request.cholesterol is not None:
+        cholesterol_text = {1: "Normal", 2: "Di Atas Normal", 3: "Jauh Di Atas Normal"}.get(request.cholesterol, "Tidak Diketahui")
+        optional_fields["cholesterol"] = request.cholesterol
+        optional_fields["cholesterol_text"] = cholesterol_text
+    if request.glucose is not None:
+        glucose_text = {1: "Normal", 2: "Di Atas Normal", 3: "Jauh Di Atas Normal"}.get(request.glucose, "Tidak Diketahui")
+        optional_fields["glucose"] = request.glucose
+        optional_fields["glucose_text"] = glucose_text
+    if request.smoking is not None:
+        smoking_text = "Merokok" if request.smoking == 1 else "Tidak Merokok"
+        optional_fields["smoking"] = request.smoking
+        optional_fields["smoking_text"] = smoking_text
+    if request.alcohol is not None:
+        alcohol_text = "Ya" if request.alcohol == 1 else "Tidak"
+        optional_fields["alcohol"] = request.alcohol
+        optional_fields["alcohol_text"] = alcohol_text
+    if request.physical_activity is not None:
+        physical_text = "Aktif" if request.physical_activity == 1 else "Tidak Aktif"
+        optional_fields["physical_activity"] = request.physical_activity
+        optional_fields["physical_activity_text"] = physical_text
+    
+    user_prompt_data = {
+        "age": request.age,
+        "gender_text": gender_text,
+        "height": request.height,
+        "weight": request.weight,
+        "systolic_bp": request.systolic_blood_pressure,
+        "diastolic_bp": request.diastolic_blood_pressure,
+        "bmi": request.bmi,
+        "risk_level_text": risk_level_text,
+        "prob_disease": f"{request.prob_disease:.1f}",
+        "available_ids": available_ids if available_ids else [],
+        **optional_fields
+    }
+    
+    user_prompt = render_prompt("health_recommendation_user", user_prompt_data)
+
+    langchain_model = chat_model.to_langchain()
+    
+    if hasattr(langchain_model, 'temperature'):
+        langchain_model.temperature = 0.2
+    elif hasattr(langchain_model, 'model_kwargs'):
+        langchain_model.model_kwargs['temperature'] = 0.2
+    
+    messages: List[BaseMessage] = [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=user_prompt),
+    ]
+    return langchain_model, messages, context_str, cache_key, trulens_enabled
+
+
+async def _finish_recommendation(
+    request: HealthRecommendationRequest,
+    recommendation: str,
+    context_str: str,
+    cache_key: Tuple,
+    trulens_enabled: bool,
+) -> HealthRecommendationResponse:
+    """Add references and TruLens evaluation to a generated recommendation, and cache it."""
+    processed_content, references = await _answer_references(recommendation)
+
+    rec_evaluation_metrics = None
+    
     try:
-        chat_model = await model_manager.get_default_model("chat")
-        if not chat_model:
-            return HealthRecommendationResponse(
-                success=False,
-                recommendation="",
-                error="Chat Model belum dikonfigurasi. Silakan konfigurasi Chat Model di Model Management terlebih dahulu.",
+        if trulens_enabled:
+            gender_text = _gender_text(request.gender)
+            risk_level_text = _risk_level_text(request.risk_level)
+            query_parts = [f"Usia {request.age} tahun", f"Jenis kelamin {gender_text}", f"Tekanan darah {request.systolic_blood_pressure}/{request.diastolic_blood_pressure} mmHg", f"BMI {request.bmi}", f"Tingkat risiko {risk_level_text}"]
+            if request.cholesterol is not None:
+                cholesterol_text = {1: "Normal", 2: "Di Atas Normal", 3: "Jauh Di Atas Normal"}.get(request.cholesterol, "")
+                query_parts.append(f"Kolesterol {cholesterol_text}")
+            if request.glucose is not None:
+                glucose_text = {1: "Normal", 2: "Di Atas Normal", 3: "Jauh Di Atas Normal"}.get(request.glucose, "")
+                query_parts.append(f"Glukosa {glucose_text}")
+            if request.smoking is not None:
+                smoking_text = "Merokok" if request.smoking == 1 else "Tidak Merokok"
+                query_parts.append(f"Kebiasaan merokok {smoking_text}")
+            if request.alcohol is not None:
+                alcohol_text = "Ya" if request.alcohol == 1 else "Tidak"
+                query_parts.append(f"Konsumsi alkohol {alcohol_text}")
+            if request.physical_activity is not None:
+                physical_text = "Aktif" if request.physical_activity == 1 else "Tidak Aktif"
+                query_parts.append(f"Aktivitas fisik {physical_text}")
+            
+            query = f"Rekomendasi gaya hidup sehat untuk: {', '.join(query_parts)}"
+            
+            max_context_length = 3000
+            max_response_length = 2000
+            truncated_context = (context_str[:max_context_length] + "...") if context_str and len(context_str) > max_context_length else (context_str if context_str else "")
+            truncated_response = (recommendation[:max_response_length] + "...") if recommendation and len(recommendation) > max_response_length else recommendation
+            
+            eval_result = await trulens_service.evaluate_rag(
+                query=query,
+                context=truncated_context,
+                response=truncated_response,
+                app_id="health_recommendation"
             )
+            
+            if eval_result.get("success") and eval_result.get("metrics"):
+                rec_evaluation_metrics = eval_result['metrics'].copy()
+                random_uniq = os.getenv("RANDOM_UNIQ", "false").lower() == "true"
+                if 'context_relevance' in rec_evaluation_metrics:
+                    if random_uniq:
+                        original_value = rec_evaluation_metrics['context_relevance']
+                        random_addition = random.uniform(0.05, 0.20)
+                        adjusted_value = original_value + random_addition
+                        rec_evaluation_metrics['context_relevance'] = max(0.75, min(0.90, adjusted_value))
+                if 'groundedness' in rec_evaluation_metrics:
+                    if random_uniq:
+                        original_value = rec_evaluation_metrics['groundedness']
+                        random_addition = random.uniform(0.05, 0.20)
+                        adjusted_value = original_value + random_addition
+                        rec_evaluation_metrics['groundedness'] = max(0.75, min(0.90, adjusted_value))
+    except Exception:
+        pass
+    
+    # Check threshold
+    meets_threshold, threshold_warning = check_trulens_threshold(rec_evaluation_metrics)
+    
+    recommendation_response = HealthRecommendationResponse(
+        success=True,
+        recommendation=recommendation,
+        processed_content=processed_content,
+        references=references,
+        evaluation_metrics=rec_evaluation_metrics,
+        meets_threshold=meets_threshold,
+        threshold_warning=threshold_warning
+    )
+    # Answers below the TruLens thresholds are regenerated on the next request
+    if RECOMMENDATION_CACHE_TTL_SECONDS > 0 and meets_threshold:
+        recommendation_cache.set(cache_key, recommendation_response.model_copy(deep=True))
+    return recommendation_response
 
-        query_text = f"health lifestyle recommendation diet physical activity exercise cardiovascular disease prevention BMI blood pressure cholesterol glucose smoking alcohol"
-        context_str, available_ids = await _build_notebook_context(query_text=query_text)
-        
-        gender_text = "Perempuan" if request.gender == 1 else "Laki-laki"
-        risk_level_text = {
-            "low": "rendah",
-            "medium": "sedang",
-            "high": "tinggi",
-        }.get(request.risk_level, request.risk_level)
-
-        system_prompt_data = {
-            "notebook": None,
-            "context": context_str if context_str else None,
-            "available_ids": available_ids if available_ids else [],
-        }
-        
-        system_prompt = Prompter(prompt_template="health_recommendation_system").render(data=system_prompt_data)
-        
-        optional_fields = {}
-        if request.cholesterol is not None:
-            cholesterol_text = {1: "Normal", 2: "Di Atas Normal", 3: "Jauh Di Atas Normal"}.get(request.cholesterol, "Tidak Diketahui")
-            optional_fields["cholesterol"] = request.cholesterol
-            optional_fields["cholesterol_text"] = cholesterol_text
-        if request.glucose is not None:
-            glucose_text = {1: "Normal", 2: "Di Atas Normal", 3: "Jauh Di Atas Normal"}.get(request.glucose, "Tidak Diketahui")
-            optional_fields["glucose"] = request.glucose
-            optional_fields["glucose_text"] = glucose_text
-        if request.smoking is not None:
-            smoking_text = "Merokok" if request.smoking == 1 else "Tidak Merokok"
-            optional_fields["smoking"] = request.smoking
-            optional_fields["smoking_text"] = smoking_text
-        if request.alcohol is not None:
-            alcohol_text = "Ya" if request.alcohol == 1 else "Tidak"
-            optional_fields["alcohol"] = request.alcohol
-            optional_fields["alcohol_text"] = alcohol_text
-        if request.physical_activity is not None:
-            physical_text = "Aktif" if request.physical_activity == 1 else "Tidak Aktif"
-            optional_fields["physical_activity"] = request.physical_activity
-            optional_fields["physical_activity_text"] = physical_text
-        
-        user_prompt_data = {
-            "age": request.age,
-            "gender_text": gender_text,
-            "height": request.height,
-            "weight": request.weight,
-            "systolic_bp": request.systolic_blood_pressure,
-            "diastolic_bp": request.diastolic_blood_pressure,
-            "bmi": request.bmi,
-            "risk_level_text": risk_level_text,
-            "prob_disease": f"{request.prob_disease:.1f}",
-            "available_ids": available_ids if available_ids else [],
-            **optional_fields
-        }
-        
-        user_prompt = Prompter(prompt_template="health_recommendation_user").render(data=user_prompt_data)
 
-        langchain_model = chat_model.to_langchain()
-        
-        if hasattr(langchain_model, 'temperature'):
-            langchain_model.temperature = 0.2
-        elif hasattr(langchain_model, 'model_kwargs'):
-            langchain_model.model_kwargs['temperature'] = 0.2
-        
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_prompt),
-        ]
+@router.post("/health/recommendation", response_model=HealthRecommendationResponse)
+async def get_health_recommendation(request: HealthRecommendationRequest):
+    try:
+        prepared = await _prepare_recommendation(request)
+        if isinstance(prepared, HealthRecommendationResponse):
+            return prepared
+        langchain_model, messages, context_str, cache_key, trulens_enabled = prepared
+
         response = await langchain_model.ainvoke(messages)
 
         recommendation = response.content if hasattr(response, "content") else str(response)
 
-        from open_notebook.utils.reference_utils import (
-            fetch_reference_titles,
-            parse_references,
-            process_references,
-        )
-        from api.models import HealthReferenceItem
-        
-        processed_content = None
-        references = None
-        
-        refs = parse_references(recommendation)
-        if refs:
-            ref_titles = await fetch_reference_titles(refs)
-            processed_content, ref_list = process_references(recommendation, ref_titles)
-            references = [
-                HealthReferenceItem(
-                    number=ref["number"],
-                    type=ref["type"],
-                    id=ref["id"],
-                    title=ref["title"],
-                )
-                for ref in ref_list
-            ]
-
-        rec_evaluation_metrics = None
-        
-        try:
-            trulens_enabled = await get_trulens_enabled()
-            if trulens_enabled:
-                query_parts = [f"Usia {request.age} tahun", f"Jenis kelamin {gender_text}", f"Tekanan darah {request.systolic_blood_pressure}/{request.diastolic_blood_pressure} mmHg", f"BMI {request.bmi}", f"Tingkat risiko {risk_level_text}"]
-                if request.cholesterol is not None:
-                    cholesterol_text = {1: "Normal", 2: "Di Atas Normal", 3: "Jauh Di Atas Normal"}.get(request.cholesterol, "")
-                    query_parts.append(f"Kolesterol {cholesterol_text}")
-                if request.glucose is not None:
-                    glucose_text = {1: "Normal", 2: "Di Atas Normal", 3: "Jauh Di Atas Normal"}.get(request.glucose, "")
-                    query_parts.append(f"Glukosa {glucose_text}")
-                if request.smoking is not None:
-                    smoking_text = "Merokok" if request.smoking == 1 else "Tidak Merokok"
-                    query_parts.append(f"Kebiasaan merokok {smoking_text}")
-                if request.alcohol is not None:
-                    alcohol_text = "Ya" if request.alcohol == 1 else "Tidak"
-                    query_parts.append(f"Konsumsi alkohol {alcohol_text}")
-                if request.physical_activity is not None:
-                    physical_text = "Aktif" if request.physical_activity == 1 else "Tidak Aktif"
-                    query_parts.append(f"Aktivitas fisik {physical_text}")
-                
-                query = f"Rekomendasi gaya hidup sehat untuk: {', '.join(query_parts)}"
-                
-                max_context_length = 3000
-                max_response_length = 2000
-                truncated_context = (context_str[:max_context_length] + "...") if context_str and len(context_str) > max_context_length else (context_str if context_str else "")
-                truncated_response = (recommendation[:max_response_length] + "...") if recommendation and len(recommendation) > max_response_length else recommendation
-                
-                eval_result = await trulens_service.evaluate_rag(
-                    query=query,
-                    context=truncated_context,
-                    response=truncated_response,
-                    app_id="health_recommendation"
-                )
-                
-                if eval_result.get("success") and eval_result.get("metrics"):
-                    rec_evaluation_metrics = eval_result['metrics'].copy()
-                    random_uniq = os.getenv("RANDOM_UNIQ", "false").lower() == "true"
-                    if 'context_relevance' in rec_evaluation_metrics:
-                        if random_uniq:
-                            original_value = rec_evaluation_metrics['context_relevance']
-                            random_addition = random.uniform(0.05, 0.20)
-                            adjusted_value = original_value + random_addition
-                            rec_evaluation_metrics['context_relevance'] = max(0.75, min(0.90, adjusted_value))
-                    if 'groundedness' in rec_evaluation_metrics:
-                        if random_uniq:
-                            original_value = rec_evaluation_metrics['groundedness']
-                            random_addition = random.uniform(0.05, 0.20)
-                            adjusted_value = original_value + random_addition
-                            rec_evaluation_metrics['groundedness'] = max(0.75, min(0.90, adjusted_value))
-        except Exception:
-            pass
-        
-        # Check threshold
-        meets_threshold, threshold_warning = check_trulens_threshold(rec_evaluation_metrics)
-        
-        return HealthRecommendationResponse(
-            success=True,
-            recommendation=recommendation,
-            processed_content=processed_content,
-            references=references,
-            evaluation_metrics=rec_evaluation_metrics,
-            meets_threshold=meets_threshold,
-            threshold_warning=threshold_warning
+        return await _finish_recommendation(
+            request, recommendation, context_str, cache_key, trulens_enabled
         )
     except Exception as e:
         return HealthRecommendationResponse(
@@ -449,407 +446,559 @@ async def get_health_recommendation(request: HealthRecommendationRequest):
             error=f"Error generating recommendation: {str(e)}",
         )
 
-@router.post("/health/chat", response_model=HealthChatResponse)
-async def health_chat(
-    request: HealthChatRequest,
-    x_user_id: Optional[str] = Header(default=None, alias="X-User-Id"),
-):
+# Examinations being saved by assessment streams, kept until done
+_pending_examinations: Set["asyncio.Task[Optional[str]]"] = set()
+
+
+async def stream_health_assessment(
+    request: HealthPredictionRequest, x_user_id: Optional[str]
+) -> AsyncGenerator[str, None]:
+    """
+    Stream a prediction and the recommendation for it as Server-Sent Events.
+
+    Notebook retrieval (including the query embedding) runs while the model
+    scores the examination, and the examination is saved while the
+    recommendation is generated.
+
+    Events: "prediction" with the prediction data, "ai_token" for each
+    recommendation text delta, "examination" with the id of the saved
+    HealthExamination, then "complete" with the full
+    HealthRecommendationResponse.
+    """
+    retrieval = asyncio.create_task(
+        _build_notebook_context(query_text=HEALTH_CONTEXT_QUERY)
+    )
     try:
-        chat_model = await model_manager.get_default_model("chat")
-        if not chat_model:
-            return HealthChatResponse(
-                success=False,
-                answer="",
-                error="Chat Model belum dikonfigurasi. Silakan konfigurasi Chat Model di Model Management terlebih dahulu.",
+        try:
+            result = await asyncio.to_thread(_predict, request)
+        except ValueError as e:
+            yield _sse_event({"type": "error", "message": str(e)})
+            return
+        yield _sse_event({"type": "prediction", "data": result})
+
+        # Not tied to the stream: the examination is saved even if the client leaves
+        saving = asyncio.create_task(_save_examination(request, result, x_user_id))
+        _pending_examinations.add(saving)
+        saving.add_done_callback(_pending_examinations.discard)
+
+        recommendation_request = HealthRecommendationRequest(
+            age=request.age,
+            gender=request.gender,
+            height=request.height,
+            weight=request.weight,
+            systolic_blood_pressure=request.systolic_blood_pressure,
+            diastolic_blood_pressure=request.diastolic_blood_pressure,
+            bmi=result["bmi"],
+            risk_level=result["risk_level"],
+            prob_disease=result["probabilities"]["disease"],
+            cholesterol=request.cholesterol,
+            glucose=request.glucose,
+            smoking=request.smoking,
+            alcohol=request.alcohol,
+            physical_activity=request.physical_activity,
+        )
+        prepared = await _prepare_recommendation(recommendation_request, await retrieval)
+        if isinstance(prepared, HealthRecommendationResponse):
+            response = prepared
+        else:
+            langchain_model, messages, context_str, cache_key, trulens_enabled = prepared
+
+            tokens: List[str] = []
+            async for chunk in langchain_model.astream(messages):
+                delta = chunk.content if hasattr(chunk, "content") else str(chunk)
+                if isinstance(delta, str) and delta:
+                    tokens.append(delta)
+                    yield _sse_event({"type": "ai_token", "content": delta})
+
+            response = await _finish_recommendation(
+                recommendation_request,
+                "".join(tokens),
+                context_str,
+                cache_key,
+                trulens_enabled,
             )
 
-        query_text = f"health lifestyle recommendation diet physical activity exercise cardiovascular disease prevention BMI blood pressure cholesterol glucose smoking alcohol"
-        context_str, available_ids = await _build_notebook_context(query_text=query_text)
-        
-        detected_language = detect_language(request.message)
-        
-        patient_data_dict = None
-        if request.patient_data:
-            prob_disease = request.patient_data.get('prob_disease')
-            patient_data_dict = {
-                "age": request.patient_data.get('age', 'N/A'),
-                "systolic_bp": request.patient_data.get('systolic_bp', 'N/A'),
-                "diastolic_bp": request.patient_data.get('diastolic_bp', 'N/A'),
-                "bmi": request.patient_data.get('bmi', 'N/A'),
-                "prob_disease": f"{prob_disease:.1f}" if prob_disease is not None else None,
-            }
+        try:
+            examination_id = await saving
+        except Exception as e:
+            logger.error(f"Error saving health examination: {str(e)}")
+            examination_id = None
+        yield _sse_event({"type": "examination", "examination_id": examination_id})
+        yield _sse_event({"type": "complete", "data": response.model_dump()})
+    except Exception as e:
+        logger.error(f"Error in health assessment streaming: {str(e)}")
+        yield _sse_event({"type": "error", "message": f"Error in health assessment: {str(e)}"})
+    finally:
+        retrieval.cancel()
 
-        system_prompt_data = {
-            "notebook": None,
-            "context": context_str if context_str else None,
-            "patient_data": patient_data_dict,
-            "risk_level": request.risk_level,
-            "detected_language": detected_language,
-            "available_ids": available_ids if available_ids else [],
-        }
-        
-        health_system_prompt = Prompter(prompt_template="health_chat_system").render(data=system_prompt_data)
 
-        resolved_user_id: Optional[str] = None
-        if x_user_id:
-            try:
-                rows = await repo_query(
-                    "SELECT id FROM user WHERE session_token = $session_token LIMIT 1",
-                    {"session_token": x_user_id},
-                )
-                if rows:
-                    raw_id = rows[0].get("id", "")
-                    resolved_user_id = (
-                        raw_id.split(":")[-1] if ":" in raw_id else raw_id
-                    )
-            except Exception as resolve_error:  # pragma: no cover - best effort
-                pass
+@router.post("/health/assessment/stream")
+async def health_assessment_stream(
+    request: HealthPredictionRequest,
+    x_user_id: Optional[str] = Header(default=None, alias="X-User-Id"),
+):
+    """Prediction and recommendation in one request: /health/predict, then /health/recommendation streamed."""
+    return StreamingResponse(
+        stream_health_assessment(request, x_user_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
 
-        session = None
-        examination_id_full = None
-        
-        if request.session_id:
-            try:
-                session_id_full = (
-                    request.session_id
-                    if request.session_id.startswith("health_chat_session:")
-                    else f"health_chat_session:{request.session_id}"
-                )
-                session = await HealthChatSession.get(session_id_full)
-            except Exception as e:
-                session = None
-        
-        if not session and request.examination_id:
-            try:
-                examination_id_full = (
-                    request.examination_id
-                    if request.examination_id.startswith("health_examination:")
-                    else f"health_examination:{request.examination_id}"
-                )
-                
-                result = await repo_query(
-                    "SELECT * FROM health_chat_session WHERE examination_id = $examination_id LIMIT 1",
-                    {"examination_id": examination_id_full}
-                )
-                
-                if not result:
-                    try:
-                        result = await repo_query(
-                            "SELECT * FROM health_chat_session WHERE examination_id = $examination_id LIMIT 1",
-                            {"examination_id": ensure_record_id(examination_id_full)}
-                        )
-                    except Exception:
-                        pass
-                
-                if not result:
-                    examination_id_short = examination_id_full.split(":")[-1] if ":" in examination_id_full else examination_id_full
-                    try:
-                        result = await repo_query(
-                            "SELECT * FROM health_chat_session WHERE examination_id = $examination_id LIMIT 1",
-                            {"examination_id": examination_id_short}
-                        )
-                    except Exception:
-                        pass
-                
-                if result:
-                    session = HealthChatSession(**result[0])
-            except Exception as e:
-                pass
-        
-        if not session:
-            if not request.examination_id:
-                return HealthChatResponse(
-                    success=False,
-                    answer="",
-                    error="examination_id is required to create a new chat session",
+
+async def _prepare_health_chat(
+    request: HealthChatRequest, x_user_id: Optional[str]
+) -> Union[HealthChatResponse, Tuple[Any, List[BaseMessage], HealthChatSession, str]]:
+    """
+    Resolve (or create) the chat session and build the model input for a turn.
+
+    Returns a HealthChatResponse instead when the request is answered without
+    calling the model (no chat model configured, session creation).
+    """
+    chat_model = await model_manager.get_default_model("chat")
+    if not chat_model:
+        return HealthChatResponse(
+            success=False,
+            answer="",
+            error="Chat Model belum dikonfigurasi. Silakan konfigurasi Chat Model di Model Management terlebih dahulu.",
+        )
+
+    resolved_user_id: Optional[str] = None
+    if x_user_id:
+        try:
+            rows = await repo_query(
+                "SELECT id FROM user WHERE session_token = $session_token LIMIT 1",
+                {"session_token": x_user_id},
+            )
+            if rows:
+                raw_id = rows[0].get("id", "")
+                resolved_user_id = (
+                    raw_id.split(":")[-1] if ":" in raw_id else raw_id
                 )
+        except Exception as resolve_error:  # pragma: no cover - best effort
+            pass
 
+    session = None
+    examination_id_full = None
+    
+    if request.session_id:
+        try:
+            session_id_full = (
+                request.session_id
+                if request.session_id.startswith("health_chat_session:")
+                else f"health_chat_session:{request.session_id}"
+            )
+            session = await HealthChatSession.get(session_id_full)
+        except Exception as e:
+            session = None
+    
+    if not session and request.examination_id:
+        try:
             examination_id_full = (
                 request.examination_id
                 if request.examination_id.startswith("health_examination:")
                 else f"health_examination:{request.examination_id}"
             )
-
-            title: str = ""
-            risk_label_map = {"low": "Risiko Rendah", "medium": "Risiko Sedang", "high": "Risiko Tinggi"}
-            risk_label = risk_label_map.get(request.risk_level, request.risk_level)
-
-            systolic = None
-            diastolic = None
-            if request.patient_data:
-                systolic = request.patient_data.get("systolic_bp")
-                diastolic = request.patient_data.get("diastolic_bp")
-
-            if systolic is not None and diastolic is not None:
-                title = f"{risk_label} - {systolic}/{diastolic}"
-            else:
-                title = risk_label
-
-            session = HealthChatSession(
-                user_id=resolved_user_id,
-                examination_id=examination_id_full,
-                title=title,
-                messages=[],
+            
+            result = await repo_query(
+                "SELECT * FROM health_chat_session WHERE examination_id = $examination_id LIMIT 1",
+                {"examination_id": examination_id_full}
             )
             
-            try:
-                examination = await HealthExamination.get(examination_id_full)
-                if examination:
-                    bmi_category = 'Kurus' if examination.bmi < 18.5 else 'Normal' if examination.bmi < 25 else 'Gemuk' if examination.bmi < 30 else 'Obesitas'
-                    bp_category = 'Normal' if examination.systolic_bp < 120 and examination.diastolic_bp < 80 else 'Meningkat' if examination.systolic_bp < 130 and examination.diastolic_bp < 80 else 'Tinggi Tahap 1' if examination.systolic_bp < 140 or examination.diastolic_bp < 90 else 'Tinggi Tahap 2' if examination.systolic_bp < 180 or examination.diastolic_bp < 120 else 'Krisis Hipertensi'
-                    
-                    examination_id_clean = request.examination_id
-                    patient_info = {
-                        'age': examination.age,
-                        'gender': examination.gender,
-                        'blood_pressure': f"{examination.systolic_bp}/{examination.diastolic_bp}",
-                        'bmi': examination.bmi,
-                        'bmi_category': bmi_category,
-                        'bp_category': bp_category,
-                    }
-                    
-                    # Add optional fields if they exist
-                    if examination.cholesterol is not None:
-                        patient_info['cholesterol'] = examination.cholesterol
-                    if examination.glucose is not None:
-                        patient_info['glucose'] = examination.glucose
-                    if examination.smoking is not None:
-                        patient_info['smoking'] = examination.smoking
-                    if examination.alcohol is not None:
-                        patient_info['alcohol'] = examination.alcohol
-                    if examination.physical_activity is not None:
-                        patient_info['physical_activity'] = examination.physical_activity
-                    
-                    result_content = {
-                        'risk_level': examination.risk_level,
-                        'risk_label': risk_label_map.get(examination.risk_level, examination.risk_level),
-                        'patient_info': patient_info,
-                        'prob_disease': examination.prediction_proba * 100,
-                        'examination_id': examination_id_clean,
-                    }
-                    
-                    if request.recommendation:
-                        result_content['recommendation'] = request.recommendation
-                    if request.recommendation_processed_content:
-                        result_content['recommendation_processed_content'] = request.recommendation_processed_content
-                    if request.recommendation_references:
-                        result_content['recommendation_references'] = request.recommendation_references
-                    
-                    result_message = {
-                        'type': 'result',
-                        'content': result_content,
-                        'timestamp': datetime.now().isoformat()
-                    }
-                    session.messages.append(result_message)
-                    
-                    has_references = bool(request.recommendation_references) and len(request.recommendation_references) > 0
-                    if request.recommendation and has_references:
-                        recommendation_text = f"**💡 Rekomendasi Gaya Hidup Sehat:**\n\n{request.recommendation}\n\n**ℹ️ Catatan:** Hasil ini bersifat edukatif dan tidak menggantikan konsultasi medis profesional."
-                        bot_message = {
-                            'type': 'bot',
-                            'content': recommendation_text,
-                            'timestamp': datetime.now().isoformat(),
-                        }
-                        if request.recommendation_evaluation_metrics:
-                            bot_message['evaluation_metrics'] = request.recommendation_evaluation_metrics.copy()
-                            random_uniq = os.getenv("RANDOM_UNIQ", "false").lower() == "true"
-                            if 'context_relevance' in bot_message['evaluation_metrics']:
-                                if random_uniq:
-                                    original_value = bot_message['evaluation_metrics']['context_relevance']
-                                    random_addition = random.uniform(0.05, 0.20)
-                                    adjusted_value = original_value + random_addition
-                                    bot_message['evaluation_metrics']['context_relevance'] = max(0.75, min(0.90, adjusted_value))
-                            if 'groundedness' in bot_message['evaluation_metrics']:
-                                if random_uniq:
-                                    original_value = bot_message['evaluation_metrics']['groundedness']
-                                    random_addition = random.uniform(0.05, 0.20)
-                                    adjusted_value = original_value + random_addition
-                                    bot_message['evaluation_metrics']['groundedness'] = max(0.75, min(0.90, adjusted_value))
-                        if request.recommendation_processed_content:
-                            processed_content_str = str(request.recommendation_processed_content)
-                            if '💡 Rekomendasi Gaya Hidup Sehat:' not in processed_content_str and '💡 Rekomendasi Gaya Hidup:' not in processed_content_str:
-                                bot_message['processed_content'] = f"**💡 Rekomendasi Gaya Hidup Sehat:**\n\n{processed_content_str}\n\n**ℹ️ Catatan:** Hasil ini bersifat edukatif dan tidak menggantikan konsultasi medis profesional."
-                            else:
-                                bot_message['processed_content'] = processed_content_str
-                        if request.recommendation_references:
-                            bot_message['references'] = request.recommendation_references
-                        session.messages.append(bot_message)
-                        
-                        try:
-                            session_id_full = session.id if session.id else f"health_chat_session:{session_id}"
-                            message_index = len(session.messages) - 1
-                            await repo_query(
-                                "CREATE evaluation_inclusion SET session_id = $session_id, message_index = $message_index, included = true, created = time::now(), updated = time::now()",
-                                {"session_id": session_id_full, "message_index": message_index}
-                            )
-                        except Exception:
-                            pass
-                    elif request.recommendation:
-                        recommendation_text = f"**💡 Rekomendasi Gaya Hidup Sehat:**\n\n{request.recommendation}\n\n**ℹ️ Catatan:** Hasil ini bersifat edukatif dan tidak menggantikan konsultasi medis profesional."
-                        bot_message = {
-                            'type': 'bot',
-                            'content': recommendation_text,
-                            'timestamp': datetime.now().isoformat()
-                        }
-                        if request.recommendation_processed_content:
-                            processed_content_str = str(request.recommendation_processed_content)
-                            if '💡 Rekomendasi Gaya Hidup Sehat:' not in processed_content_str and '💡 Rekomendasi Gaya Hidup:' not in processed_content_str:
-                                bot_message['processed_content'] = f"**💡 Rekomendasi Gaya Hidup Sehat:**\n\n{processed_content_str}\n\n**ℹ️ Catatan:** Hasil ini bersifat edukatif dan tidak menggantikan konsultasi medis profesional."
-                            else:
-                                bot_message['processed_content'] = processed_content_str
-                        if request.recommendation_references:
-                            bot_message['references'] = request.recommendation_references
-                        session.messages.append(bot_message)
-            except Exception as e:
-                pass
-        
-        is_new_session = session.id is None
-        is_empty_message = not request.message or not request.message.strip()
-        has_result_and_recommendation = len(session.messages) >= 2 and session.messages[0].get('type') == 'result' and session.messages[1].get('type') == 'bot'
-        has_only_result_message = len(session.messages) == 1 and session.messages[0].get('type') == 'result'
-        
-        if is_new_session and is_empty_message and (has_result_and_recommendation or has_only_result_message):
-            await session.save()
-            session_id = None
-            if session.id:
-                session_id = session.id.split(":")[-1] if ":" in session.id else session.id
+            if not result:
+                try:
+                    result = await repo_query(
+                        "SELECT * FROM health_chat_session WHERE examination_id = $examination_id LIMIT 1",
+                        {"examination_id": ensure_record_id(examination_id_full)}
+                    )
+                except Exception:
+                    pass
+            
+            if not result:
+                examination_id_short = examination_id_full.split(":")[-1] if ":" in examination_id_full else examination_id_full
+                try:
+                    result = await repo_query(
+                        "SELECT * FROM health_chat_session WHERE examination_id = $examination_id LIMIT 1",
+                        {"examination_id": examination_id_short}
+                    )
+                except Exception:
+                    pass
             
+            if result:
+                session = HealthChatSession(**result[0])
+        except Exception as e:
+            pass
+    
+    if not session:
+        if not request.examination_id:
             return HealthChatResponse(
-                success=True,
+                success=False,
                 answer="",
-                session_id=session_id,
+                error="examination_id is required to create a new chat session",
             )
-        
-        history_messages = []
-        if session.messages:
-            for msg in session.messages:
-                if msg.get('type') == 'user':
-                    history_messages.append(HumanMessage(content=msg.get('content', '')))
-                elif msg.get('type') == 'bot':
-                    history_messages.append(AIMessage(content=msg.get('content', '')))
-        
-        langchain_model = chat_model.to_langchain()
-        messages = [SystemMessage(content=health_system_prompt)]
-        messages.extend(history_messages)
-        messages.append(HumanMessage(content=request.message))
-        
-        response = await langchain_model.ainvoke(messages)
 
-        answer = response.content if hasattr(response, "content") else str(response)
-        
-        from open_notebook.utils.reference_utils import (
-            fetch_reference_titles,
-            parse_references,
-            process_references,
+        examination_id_full = (
+            request.examination_id
+            if request.examination_id.startswith("health_examination:")
+            else f"health_examination:{request.examination_id}"
+        )
+
+        title: str = ""
+        risk_label_map = {"low": "Risiko Rendah", "medium": "Risiko Sedang", "high": "Risiko Tinggi"}
+        risk_label = risk_label_map.get(request.risk_level, request.risk_level)
+
+        systolic = None
+        diastolic = None
+        if request.patient_data:
+            systolic = request.patient_data.get("systolic_bp")
+            diastolic = request.patient_data.get("diastolic_bp")
+
+        if systolic is not None and diastolic is not None:
+            title = f"{risk_label} - {systolic}/{diastolic}"
+        else:
+            title = risk_label
+
+        session = HealthChatSession(
+            user_id=resolved_user_id,
+            examination_id=examination_id_full,
+            title=title,
+            messages=[],
         )
-        from api.models import HealthReferenceItem
-        
-        processed_content = None
-        references = None
-        
-        refs = parse_references(answer)
-        if refs:
-            ref_titles = await fetch_reference_titles(refs)
-            processed_content, ref_list = process_references(answer, ref_titles)
-            references = [
-                HealthReferenceItem(
-                    number=ref["number"],
-                    type=ref["type"],
-                    id=ref["id"],
-                    title=ref["title"],
-                )
-                for ref in ref_list
-            ]
-        
-        session.messages.append({
-            'type': 'user',
-            'content': request.message,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-        bot_message = {
-            'type': 'bot',
-            'content': answer,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        if processed_content:
-            bot_message['processed_content'] = processed_content
-        if references:
-            bot_message['references'] = [ref.model_dump() for ref in references]
         
         try:
-            trulens_enabled = await get_trulens_enabled()
-            if trulens_enabled:
-                eval_context = context_str if context_str else ""
-                if not eval_context and session.messages:
-                    recent_messages = session.messages[-6:]
-                    context_parts = []
-                    for msg in recent_messages:
-                        msg_type = msg.get('type', '')
-                        msg_content = msg.get('content', '')
-                        if isinstance(msg_content, str):
-                            context_parts.append(f"{msg_type}: {msg_content[:200]}")
-                    eval_context = "\n".join(context_parts)
+            examination = await HealthExamination.get(examination_id_full)
+            if examination:
+                bmi_category = 'Kurus' if examination.bmi < 18.5 else 'Normal' if examination.bmi < 25 else 'Gemuk' if examination.bmi < 30 else 'Obesitas'
+                bp_category = 'Normal' if examination.systolic_bp < 120 and examination.diastolic_bp < 80 else 'Meningkat' if examination.systolic_bp < 130 and examination.diastolic_bp < 80 else 'Tinggi Tahap 1' if examination.systolic_bp < 140 or examination.diastolic_bp < 90 else 'Tinggi Tahap 2' if examination.systolic_bp < 180 or examination.diastolic_bp < 120 else 'Krisis Hipertensi'
                 
-                if not eval_context:
-                    eval_context = "Health knowledge base context"
+                examination_id_clean = request.examination_id
+                patient_info = {
+                    'age': examination.age,
+                    'gender': examination.gender,
+                    'blood_pressure': f"{examination.systolic_bp}/{examination.diastolic_bp}",
+                    'bmi': examination.bmi,
+                    'bmi_category': bmi_category,
+                    'bp_category': bp_category,
+                }
                 
-                query = request.message
-                if not query or not query.strip():
-                    query = "Pertanyaan tentang kesehatan dan gaya hidup sehat"
+                # Add optional fields if they exist
+                if examination.cholesterol is not None:
+                    patient_info['cholesterol'] = examination.cholesterol
+                if examination.glucose is not None:
+                    patient_info['glucose'] = examination.glucose
+                if examination.smoking is not None:
+                    patient_info['smoking'] = examination.smoking
+                if examination.alcohol is not None:
+                    patient_info['alcohol'] = examination.alcohol
+                if examination.physical_activity is not None:
+                    patient_info['physical_activity'] = examination.physical_activity
                 
-                max_context_length = 4000
-                max_response_length = 2500
-                truncated_context = (eval_context[:max_context_length] + "...") if eval_context and len(eval_context) > max_context_length else (eval_context if eval_context else "")
-                truncated_response = (answer[:max_response_length] + "...") if answer and len(answer) > max_response_length else answer
+                result_content = {
+                    'risk_level': examination.risk_level,
+                    'risk_label': risk_label_map.get(examination.risk_level, examination.risk_level),
+                    'patient_info': patient_info,
+                    'prob_disease': examination.prediction_proba * 100,
+                    'examination_id': examination_id_clean,
+                }
                 
-                eval_result = await trulens_service.evaluate_rag(
-                    query=query,
-                    context=truncated_context,
-                    response=truncated_response,
-                    app_id="health_chat"
-                )
+                if request.recommendation:
+                    result_content['recommendation'] = request.recommendation
+                if request.recommendation_processed_content:
+                    result_content['recommendation_processed_content'] = request.recommendation_processed_content
+                if request.recommendation_references:
+                    result_content['recommendation_references'] = request.recommendation_references
+                
+                result_message = {
+                    'type': 'result',
+                    'content': result_content,
+                    'timestamp': datetime.now().isoformat()
+                }
+                session.messages.append(result_message)
                 
-                if eval_result.get("success") and eval_result.get("metrics") and references:
-                    bot_message['evaluation_metrics'] = eval_result['metrics'].copy()
-                    random_uniq = os.getenv("RANDOM_UNIQ", "false").lower() == "true"
-                    if 'context_relevance' in bot_message['evaluation_metrics']:
-                        if random_uniq:
-                            original_value = bot_message['evaluation_metrics']['context_relevance']
-                            random_addition = random.uniform(0.05, 0.20)
-                            adjusted_value = original_value + random_addition
-                            bot_message['evaluation_metrics']['context_relevance'] = max(0.75, min(0.90, adjusted_value))
-                    if 'groundedness' in bot_message['evaluation_metrics']:
-                        if random_uniq:
-                            original_value = bot_message['evaluation_metrics']['groundedness']
-                            random_addition = random.uniform(0.05, 0.20)
-                            adjusted_value = original_value + random_addition
-                            bot_message['evaluation_metrics']['groundedness'] = max(0.75, min(0.90, adjusted_value))
-        except Exception:
+                has_references = bool(request.recommendation_references) and len(request.recommendation_references) > 0
+                if request.recommendation and has_references:
+                    recommendation_text = f"**💡 Rekomendasi Gaya Hidup Sehat:**\n\n{request.recommendation}\n\n**ℹ️ Catatan:** Hasil ini bersifat edukatif dan tidak menggantikan konsultasi medis profesional."
+                    bot_message = {
+                        'type': 'bot',
+                        'content': recommendation_text,
+                        'timestamp': datetime.now().isoformat(),
+                    }
+                    if request.recommendation_evaluation_metrics:
+                        bot_message['evaluation_metrics'] = request.recommendation_evaluation_metrics.copy()
+                        random_uniq = os.getenv("RANDOM_UNIQ", "false").lower() == "true"
+                        if 'context_relevance' in bot_message['evaluation_metrics']:
+                            if random_uniq:
+                                original_value = bot_message['evaluation_metrics']['context_relevance']
+                                random_addition = random.uniform(0.05, 0.20)
+                                adjusted_value = original_value + random_addition
+                                bot_message['evaluation_metrics']['context_relevance'] = max(0.75, min(0.90, adjusted_value))
+                        if 'groundedness' in bot_message['evaluation_metrics']:
+                            if random_uniq:
+                                original_value = bot_message['evaluation_metrics']['groundedness']
+                                random_addition = random.uniform(0.05, 0.20)
+                                adjusted_value = original_value + random_addition
+                                bot_message['evaluation_metrics']['groundedness'] = max(0.75, min(0.90, adjusted_value))
+                    if request.recommendation_processed_content:
+                        processed_content_str = str(request.recommendation_processed_content)
+                        if '💡 Rekomendasi Gaya Hidup Sehat:' not in processed_content_str and '💡 Rekomendasi Gaya Hidup:' not in processed_content_str:
+                            bot_message['processed_content'] = f"**💡 Rekomendasi Gaya Hidup Sehat:**\n\n{processed_content_str}\n\n**ℹ️ Catatan:** Hasil ini bersifat edukatif dan tidak menggantikan konsultasi medis profesional."
+                        else:
+                            bot_message['processed_content'] = processed_content_str
+                    if request.recommendation_references:
+                        bot_message['references'] = request.recommendation_references
+                    session.messages.append(bot_message)
+                    
+                    try:
+                        session_id_full = session.id if session.id else f"health_chat_session:{session_id}"
+                        message_index = len(session.messages) - 1
+                        await repo_query(
+                            "CREATE evaluation_inclusion SET session_id = $session_id, message_index = $message_index, included = true, created = time::now(), updated = time::now()",
+                            {"session_id": session_id_full, "message_index": message_index}
+                        )
+                    except Exception:
+                        pass
+                elif request.recommendation:
+                    recommendation_text = f"**💡 Rekomendasi Gaya Hidup Sehat:**\n\n{request.recommendation}\n\n**ℹ️ Catatan:** Hasil ini bersifat edukatif dan tidak menggantikan konsultasi medis profesional."
+                    bot_message = {
+                        'type': 'bot',
+                        'content': recommendation_text,
+                        'timestamp': datetime.now().isoformat()
+                    }
+                    if request.recommendation_processed_content:
+                        processed_content_str = str(request.recommendation_processed_content)
+                        if '💡 Rekomendasi Gaya Hidup Sehat:' not in processed_content_str and '💡 Rekomendasi Gaya Hidup:' not in processed_content_str:
+                            bot_message['processed_content'] = f"**💡 Rekomendasi Gaya Hidup Sehat:**\n\n{processed_content_str}\n\n**ℹ️ Catatan:** Hasil ini bersifat edukatif dan tidak menggantikan konsultasi medis profesional."
+                        else:
+                            bot_message['processed_content'] = processed_content_str
+                    if request.recommendation_references:
+                        bot_message['references'] = request.recommendation_references
+                    session.messages.append(bot_message)
+        except Exception as e:
             pass
-        
-        # Check threshold
-        chat_evaluation_metrics = bot_message.get('evaluation_metrics')
-        meets_threshold, threshold_warning = check_trulens_threshold(chat_evaluation_metrics)
-        
-        session.messages.append(bot_message)
-        
+    
+    is_new_session = session.id is None
+    is_empty_message = not request.message or not request.message.strip()
+    has_result_and_recommendation = len(session.messages) >= 2 and session.messages[0].get('type') == 'result' and session.messages[1].get('type') == 'bot'
+    has_only_result_message = len(session.messages) == 1 and session.messages[0].get('type') == 'result'
+    
+    if is_new_session and is_empty_message and (has_result_and_recommendation or has_only_result_message):
+        # Keep the recommendation's retrieval for the upcoming turns
+        await _session_context(session, "")
         await session.save()
-        
         session_id = None
         if session.id:
             session_id = session.id.split(":")[-1] if ":" in session.id else session.id
-
+        
         return HealthChatResponse(
             success=True,
-            answer=answer,
+            answer="",
             session_id=session_id,
-            processed_content=processed_content,
-            references=references,
-            evaluation_metrics=chat_evaluation_metrics,
-            meets_threshold=meets_threshold,
-            threshold_warning=threshold_warning
+        )
+    
+    context_str, available_ids = await _session_context(session, request.message or "")
+    
+    detected_language = detect_language(request.message)
+    
+    patient_data_dict = None
+    if request.patient_data:
+        prob_disease = request.patient_data.get('prob_disease')
+        patient_data_dict = {
+            "age": request.patient_data.get('age', 'N/A'),
+            "systolic_bp": request.patient_data.get('systolic_bp', 'N/A'),
+            "diastolic_bp": request.patient_data.get('diastolic_bp', 'N/A'),
+            "bmi": request.patient_data.get('bmi', 'N/A'),
+            "prob_disease": f"{prob_disease:.1f}" if prob_disease is not None else None,
+        }
+
+    system_prompt_data = {
+        "notebook": None,
+        "context": context_str if context_str else None,
+        "patient_data": patient_data_dict,
+        "risk_level": request.risk_level,
+        "detected_language": detected_language,
+        "available_ids": available_ids if available_ids else [],
+    }
+    
+    health_system_prompt = render_prompt("health_chat_system", system_prompt_data)
+
+    history_messages = []
+    if session.messages:
+        for msg in session.messages:
+            if msg.get('type') == 'user':
+                history_messages.append(HumanMessage(content=msg.get('content', '')))
+            elif msg.get('type') == 'bot':
+                history_messages.append(AIMessage(content=msg.get('content', '')))
+    
+    # Recent messages verbatim; older ones through the session's rolling summary
+    recent_messages, window_start = build_history(history_messages)
+    if session.id and window_start > session.summarized_count:
+        schedule_summary(
+            session.id,
+            session.history_summary,
+            history_messages[session.summarized_count:window_start],
+            window_start,
+            session.save_history_summary,
+        )
+    
+    langchain_model = chat_model.to_langchain()
+    messages = [SystemMessage(content=health_system_prompt + summary_section(session.history_summary))]
+    messages.extend(recent_messages)
+    messages.append(HumanMessage(content=request.message))
+    
+    return langchain_model, messages, session, context_str
+
+
+async def _answer_references(
+    answer: str,
+) -> Tuple[Optional[str], Optional[List[HealthReferenceItem]]]:
+    """Answer text with numbered citation links, and its reference list."""
+    from open_notebook.utils.reference_utils import (
+        fetch_reference_titles,
+        parse_references,
+        process_references,
+    )
+    
+    processed_content = None
+    references = None
+    
+    refs = parse_references(answer)
+    if refs:
+        ref_titles = await fetch_reference_titles(refs)
+        processed_content, ref_list = process_references(answer, ref_titles)
+        references = [
+            HealthReferenceItem(
+                number=ref["number"],
+                type=ref["type"],
+                id=ref["id"],
+                title=ref["title"],
+            )
+            for ref in ref_list
+        ]
+    
+    return processed_content, references
+
+
+async def _finish_health_chat(
+    request: HealthChatRequest,
+    session: HealthChatSession,
+    answer: str,
+    context_str: str,
+    processed_content: Optional[str],
+    references: Optional[List[HealthReferenceItem]],
+) -> HealthChatResponse:
+    """Append the turn to the session, evaluate the answer and save the session."""
+    session.messages.append({
+        'type': 'user',
+        'content': request.message,
+        'timestamp': datetime.now().isoformat()
+    })
+    
+    bot_message = {
+        'type': 'bot',
+        'content': answer,
+        'timestamp': datetime.now().isoformat()
+    }
+    
+    if processed_content:
+        bot_message['processed_content'] = processed_content
+    if references:
+        bot_message['references'] = [ref.model_dump() for ref in references]
+    
+    try:
+        trulens_enabled = await get_trulens_enabled()
+        if trulens_enabled:
+            eval_context = context_str if context_str else ""
+            if not eval_context and session.messages:
+                recent_messages = session.messages[-6:]
+                context_parts = []
+                for msg in recent_messages:
+                    msg_type = msg.get('type', '')
+                    msg_content = msg.get('content', '')
+                    if isinstance(msg_content, str):
+                        context_parts.append(f"{msg_type}: {msg_content[:200]}")
+                eval_context = "\n".join(context_parts)
+            
+            if not eval_context:
+                eval_context = "Health knowledge base context"
+            
+            query = request.message
+            if not query or not query.strip():
+                query = "Pertanyaan tentang kesehatan dan gaya hidup sehat"
+            
+            max_context_length = 4000
+            max_response_length = 2500
+            truncated_context = (eval_context[:max_context_length] + "...") if eval_context and len(eval_context) > max_context_length else (eval_context if eval_context else "")
+            truncated_response = (answer[:max_response_length] + "...") if answer and len(answer) > max_response_length else answer
+            
+            eval_result = await trulens_service.evaluate_rag(
+                query=query,
+                context=truncated_context,
+                response=truncated_response,
+                app_id="health_chat"
+            )
+            
+            if eval_result.get("success") and eval_result.get("metrics") and references:
+                bot_message['evaluation_metrics'] = eval_result['metrics'].copy()
+                random_uniq = os.getenv("RANDOM_UNIQ", "false").lower() == "true"
+                if 'context_relevance' in bot_message['evaluation_metrics']:
+                    if random_uniq:
+                        original_value = bot_message['evaluation_metrics']['context_relevance']
+                        random_addition = random.uniform(0.05, 0.20)
+                        adjusted_value = original_value + random_addition
+                        bot_message['evaluation_metrics']['context_relevance'] = max(0.75, min(0.90, adjusted_value))
+                if 'groundedness' in bot_message['evaluation_metrics']:
+                    if random_uniq:
+                        original_value = bot_message['evaluation_metrics']['groundedness']
+                        random_addition = random.uniform(0.05, 0.20)
+                        adjusted_value = original_value + random_addition
+                        bot_message['evaluation_metrics']['groundedness'] = max(0.75, min(0.90, adjusted_value))
+    except Exception:
+        pass
+    
+    # Check threshold
+    chat_evaluation_metrics = bot_message.get('evaluation_metrics')
+    meets_threshold, threshold_warning = check_trulens_threshold(chat_evaluation_metrics)
+    
+    session.messages.append(bot_message)
+    
+    await session.save()
+    
+    session_id = None
+    if session.id:
+        session_id = session.id.split(":")[-1] if ":" in session.id else session.id
+
+    return HealthChatResponse(
+        success=True,
+        answer=answer,
+        session_id=session_id,
+        processed_content=processed_content,
+        references=references,
+        evaluation_metrics=chat_evaluation_metrics,
+        meets_threshold=meets_threshold,
+        threshold_warning=threshold_warning
+    )
+
+
+@router.post("/health/chat", response_model=HealthChatResponse)
+async def health_chat(
+    request: HealthChatRequest,
+    x_user_id: Optional[str] = Header(default=None, alias="X-User-Id"),
+):
+    try:
+        prepared = await _prepare_health_chat(request, x_user_id)
+        if isinstance(prepared, HealthChatResponse):
+            return prepared
+        langchain_model, messages, session, context_str = prepared
+
+        response = await langchain_model.ainvoke(messages)
+
+        answer = response.content if hasattr(response, "content") else str(response)
+        processed_content, references = await _answer_references(answer)
+        return await _finish_health_chat(
+            request, session, answer, context_str, processed_content, references
         )
     except Exception as e:
         return HealthChatResponse(
@@ -859,6 +1008,70 @@ async def health_chat(
         )
 
 
+def _sse_event(event: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+async def stream_health_chat_response(
+    request: HealthChatRequest, x_user_id: Optional[str]
+) -> AsyncGenerator[str, None]:
+    """
+    Stream a health chat turn as Server-Sent Events.
+
+    Events: "ai_token" for each generated text delta, then "references" with
+    the processed answer once generation ends, then "complete" with the full
+    HealthChatResponse after evaluation and saving the session.
+    """
+    try:
+        prepared = await _prepare_health_chat(request, x_user_id)
+        if isinstance(prepared, HealthChatResponse):
+            yield _sse_event({"type": "complete", "data": prepared.model_dump()})
+            return
+        langchain_model, messages, session, context_str = prepared
+
+        tokens: List[str] = []
+        async for chunk in langchain_model.astream(messages):
+            delta = chunk.content if hasattr(chunk, "content") else str(chunk)
+            if isinstance(delta, str) and delta:
+                tokens.append(delta)
+                yield _sse_event({"type": "ai_token", "content": delta})
+
+        answer = "".join(tokens)
+        processed_content, references = await _answer_references(answer)
+        yield _sse_event(
+            {
+                "type": "references",
+                "processed_content": processed_content,
+                "references": [ref.model_dump() for ref in references or []],
+            }
+        )
+
+        response = await _finish_health_chat(
+            request, session, answer, context_str, processed_content, references
+        )
+        yield _sse_event({"type": "complete", "data": response.model_dump()})
+    except Exception as e:
+        logger.error(f"Error in health chat streaming: {str(e)}")
+        yield _sse_event({"type": "error", "message": f"Error in health chat: {str(e)}"})
+
+
+@router.post("/health/chat/stream")
+async def health_chat_stream(
+    request: HealthChatRequest,
+    x_user_id: Optional[str] = Header(default=None, alias="X-User-Id"),
+):
+    """Streaming variant of /health/chat: answer tokens are sent as they are generated."""
+    return StreamingResponse(
+        stream_health_chat_response(request, x_user_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
 @router.get("/health/sessions", response_model=HealthChatSessionListResponse)
 async def list_health_sessions(
     x_user_id: Optional[str] = Header(default=None, alias="X-User-Id"),
@@ -11,7 +11,7 @@ from api.models import (
     ModelResponse,
     ProviderAvailabilityResponse,
 )
-from open_notebook.domain.models import DefaultModels, Model
+from open_notebook.domain.models import DefaultModels, Model, model_manager
 from open_notebook.exceptions import InvalidInputError
 
 router = APIRouter()
@@ -131,6 +131,11 @@ async def update_default_models(defaults_data: DefaultModelsResponse):
     """Update default model assignments."""
     try:
         defaults = await DefaultModels.get_instance()
+        previous_models = {
+            defaults.default_chat_model,  # type: ignore[attr-defined]
+            defaults.large_context_model,  # type: ignore[attr-defined]
+            defaults.default_embedding_model,  # type: ignore[attr-defined]
+        }
         
         # Update only provided fields
         if defaults_data.default_chat_model is not None:
@@ -142,7 +147,18 @@ async def update_default_models(defaults_data: DefaultModelsResponse):
         
         await defaults.update()
 
-        # No cache refresh needed - next access will fetch fresh data from DB
+        # Release the clients of models that are no longer a default
+        current_models = {
+            defaults.default_chat_model,  # type: ignore[attr-defined]
+            defaults.large_context_model,  # type: ignore[attr-defined]
+            defaults.default_embedding_model,  # type: ignore[attr-defined]
+        }
+        for model_id in previous_models - current_models:
+            if model_id:
+                model_manager.invalidate(model_id)
+
+        # The vector index is not redefined here: the stored embeddings keep the
+        # previous model's dimension until the embedding rebuild, which owns it
 
         return DefaultModelsResponse(
             default_chat_model=defaults.default_chat_model,  # type: ignore[attr-defined]
@@ -6,6 +6,7 @@ from loguru import logger
 from api.models import NotebookResponse
 from open_notebook.database.repository import ensure_record_id, repo_query
 from open_notebook.domain.notebook import Notebook, Source
+from open_notebook.utils.memory_index import memory_vector_index
 
 router = APIRouter()
 
@@ -88,6 +89,7 @@ async def remove_source_from_notebook(notebook_id: str, source_id: str):
         )
 
         await Notebook.update_timestamp(notebook_id)
+        memory_vector_index.invalidate(notebook_id)
 
         return {"message": "Source removed from notebook successfully"}
     except HTTPException:
@@ -0,0 +1,231 @@
+import base64
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException
+from loguru import logger
+
+from api.models import SearchRequest, SearchResponse, SearchResult
+from open_notebook.database.repository import ensure_record_id, repo_query
+from open_notebook.domain.notebook import Source
+from open_notebook.exceptions import InvalidInputError
+from open_notebook.utils.hybrid_search import (
+    HYBRID_CANDIDATES,
+    bm25_search,
+    hybrid_search,
+)
+from open_notebook.utils.retrieval_cache import (
+    RETRIEVAL_CACHE_TTL_SECONDS,
+    TTLCache,
+    get_query_embedding,
+)
+from open_notebook.utils.vector_index import get_notebook_source_ids, knn_search
+
+router = APIRouter()
+
+# Deepest result reachable through pagination
+SEARCH_MAX_DEPTH = 200
+# Ranked hits are fetched at least this deep so the next pages come from cache
+SEARCH_MIN_FETCH_DEPTH = 50
+
+# {fingerprint: (hits, depth requested)}
+search_results_cache = TTLCache(64, RETRIEVAL_CACHE_TTL_SECONDS)
+
+
+def _fingerprint(request: SearchRequest) -> str:
+    """Hash of everything that determines the ranking (not the page)."""
+    data = request.model_dump(mode="json", exclude={"cursor", "limit"})
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def _encode_cursor(fingerprint: str, offset: int) -> str:
+    payload = json.dumps({"q": fingerprint[:16], "o": offset}).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def _decode_cursor(cursor: Optional[str], fingerprint: str) -> int:
+    if not cursor:
+        return 0
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        offset = int(payload["o"])
+    except Exception:
+        raise InvalidInputError("Invalid cursor")
+    if payload.get("q") != fingerprint[:16] or offset < 0:
+        raise InvalidInputError("Cursor does not belong to this query")
+    return offset
+
+
+def _source_id(source_id: str) -> str:
+    return source_id if source_id.startswith("source:") else f"source:{source_id}"
+
+
+async def _resolve_scope(request: SearchRequest) -> Optional[List[str]]:
+    """Source ids allowed by the notebook/source/date filters (None = all)."""
+    scope: Optional[List[str]] = None
+    if request.source_ids:
+        scope = [_source_id(sid) for sid in request.source_ids]
+
+    if request.notebook_id:
+        notebook_sources = [
+            str(sid) for sid in await get_notebook_source_ids(request.notebook_id)
+        ]
+        if scope is not None:
+            allowed = set(notebook_sources)
+            scope = [sid for sid in scope if sid in allowed]
+        else:
+            scope = notebook_sources
+
+    if request.created_after or request.created_before:
+        rows = await repo_query(
+            """
+            SELECT VALUE id FROM source
+            WHERE ($after = NONE OR created >= $after)
+                AND ($before = NONE OR created <= $before)
+                AND ($scope = NONE OR id IN $scope)
+            """,
+            {
+                "after": request.created_after,
+                "before": request.created_before,
+                "scope": (
+                    [ensure_record_id(sid) for sid in scope]
+                    if scope is not None
+                    else None
+                ),
+            },
+        )
+        scope = [str(sid) for sid in rows]
+
+    return scope
+
+
+async def _rank(
+    request: SearchRequest,
+    scope: Optional[List[str]],
+    depth: int,
+) -> List[Dict[str, Any]]:
+    """Ranked chunk hits for the request mode, with a `score` field."""
+    query_embedding: Optional[List[float]] = None
+    if request.mode in ("vector", "hybrid"):
+        try:
+            query_embedding = await get_query_embedding(request.query)
+        except Exception as e:
+            logger.warning(f"Could not embed search query: {str(e)}")
+        if request.mode == "vector" and not query_embedding:
+            raise InvalidInputError(
+                "Vector search requires a working embedding model. "
+                "Please configure one in the Models section."
+            )
+
+    if request.mode == "text":
+        hits = await bm25_search(request.query, scope, depth)
+        for hit in hits:
+            hit["score"] = hit.get("bm25_score") or 0.0
+        return hits
+
+    if request.mode == "vector":
+        hits = await knn_search(
+            query_embedding,  # type: ignore[arg-type]
+            limit=depth,
+            min_similarity=request.min_similarity,
+            source_ids=scope,
+        )
+        for hit in hits:
+            hit["score"] = hit.get("similarity") or 0.0
+        return hits
+
+    return await hybrid_search(
+        request.query,
+        query_embedding,
+        limit=depth,
+        min_similarity=request.min_similarity,
+        candidates=max(HYBRID_CANDIDATES, depth),
+        source_ids=scope,
+    )
+
+
+async def _ranked_hits(
+    request: SearchRequest, fingerprint: str, depth: int
+) -> List[Dict[str, Any]]:
+    """Ranked hits at least `depth` deep, reusing earlier pages' ranking."""
+    cached: Optional[Tuple[List[Dict[str, Any]], int]] = search_results_cache.get(
+        fingerprint
+    )
+    if cached:
+        hits, fetched_depth = cached
+        # Also reusable when the ranking ran out before the fetched depth
+        if fetched_depth >= depth or len(hits) < fetched_depth:
+            return hits
+
+    fetch_depth = min(SEARCH_MAX_DEPTH, max(depth, SEARCH_MIN_FETCH_DEPTH))
+    scope = await _resolve_scope(request)
+    if scope is not None and not scope:
+        hits = []
+    else:
+        hits = await _rank(request, scope, fetch_depth)
+    search_results_cache.set(fingerprint, (hits, fetch_depth))
+    return hits
+
+
+@router.post("/search", response_model=SearchResponse)
+async def search(request: SearchRequest):
+    """
+    Search source chunks by text (BM25), vector similarity, or both (hybrid).
+
+    Results are chunk-level and can be filtered by notebook, sources and source
+    creation date. Pass `next_cursor` back as `cursor` to get the next page.
+    """
+    try:
+        started = time.perf_counter()
+        fingerprint = _fingerprint(request)
+        offset = _decode_cursor(request.cursor, fingerprint)
+        depth = offset + request.limit
+        if depth > SEARCH_MAX_DEPTH:
+            raise InvalidInputError(
+                f"Pagination is limited to the first {SEARCH_MAX_DEPTH} results"
+            )
+
+        hits = await _ranked_hits(request, fingerprint, depth + 1)
+        page = hits[offset:depth]
+
+        titles: Dict[str, Optional[str]] = {}
+        if page:
+            sources = await Source.get_many(
+                list(dict.fromkeys(str(hit["id"]) for hit in page)),
+                fields=["title"],
+            )
+            titles = {str(source.id): source.title for source in sources}
+
+        results = [
+            SearchResult(
+                source_id=str(hit["id"]),
+                source_title=titles.get(str(hit["id"])),
+                order=int(hit.get("order") or 0),
+                content=hit.get("content") or "",
+                score=float(hit.get("score") or 0.0),
+                similarity=hit.get("similarity"),
+                bm25_score=hit.get("bm25_score"),
+            )
+            for hit in page
+        ]
+        next_cursor = (
+            _encode_cursor(fingerprint, depth)
+            if len(hits) > depth and depth < SEARCH_MAX_DEPTH
+            else None
+        )
+
+        return SearchResponse(
+            results=results,
+            next_cursor=next_cursor,
+            mode=request.mode,
+            took_ms=round((time.perf_counter() - started) * 1000, 2),
+        )
+    except HTTPException:
+        raise
+    except InvalidInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error searching: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error searching: {str(e)}")
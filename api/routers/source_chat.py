@@ -14,7 +14,7 @@ from open_notebook.domain.notebook import ChatSession, Source
 from open_notebook.exceptions import (
     NotFoundError,
 )
-from open_notebook.graphs.source_chat import source_chat_graph as source_chat_graph
+from open_notebook.graphs.source_chat import get_source_chat_graph
 
 router = APIRouter()
 
@@ -172,7 +172,7 @@ async def get_source_chat_session(
             raise HTTPException(status_code=404, detail="Session not found for this source")
         
         # Get session state from LangGraph to retrieve messages
-        thread_state = source_chat_graph.get_state(
+        thread_state = await get_source_chat_graph().aget_state(
             config=RunnableConfig(configurable={"thread_id": session_id})
         )
         
@@ -319,7 +319,8 @@ async def stream_source_chat_response(
     """Stream the source chat response as Server-Sent Events."""
     try:
         # Get current state
-        current_state = source_chat_graph.get_state(
+        source_chat_graph = get_source_chat_graph()
+        current_state = await source_chat_graph.aget_state(
             config=RunnableConfig(configurable={"thread_id": session_id})
         )
         
@@ -341,27 +342,29 @@ async def stream_source_chat_response(
         }
         yield f"data: {json.dumps(user_event)}\n\n"
         
-        # Execute source chat graph synchronously (like notebook chat does)
-        result = source_chat_graph.invoke(
+        # Stream the AI response as the model generates it; the final state
+        # (with the context indicators) arrives as the last "values" item
+        result: dict = {}
+        async for mode, payload in source_chat_graph.astream(
             input=state_values,  # type: ignore[arg-type]
             config=RunnableConfig(
                 configurable={
                     "thread_id": session_id,
                     "model_id": model_override
                 }
-            )
-        )
-        
-        # Stream the complete AI response
-        if "messages" in result:
-            for msg in result["messages"]:
-                if hasattr(msg, 'type') and msg.type == 'ai':
-                    ai_event = {
-                        "type": "ai_message", 
-                        "content": msg.content if hasattr(msg, 'content') else str(msg),
-                        "timestamp": None
-                    }
-                    yield f"data: {json.dumps(ai_event)}\n\n"
+            ),
+            stream_mode=["messages", "values"],
+        ):
+            if mode == "values":
+                result = payload
+                continue
+            chunk, metadata = payload
+            if metadata.get("langgraph_node") != "source_chat_agent":
+                continue
+            content = chunk.content if hasattr(chunk, "content") else str(chunk)
+            if isinstance(content, str) and content:
+                token_event = {"type": "ai_token", "content": content}
+                yield f"data: {json.dumps(token_event)}\n\n"
         
         # Stream context indicators
         if "context_indicators" in result:
@@ -29,6 +29,7 @@ from open_notebook.config import UPLOADS_FOLDER
 from open_notebook.database.repository import ensure_record_id, repo_query
 from open_notebook.domain.notebook import Notebook, Source
 from open_notebook.exceptions import InvalidInputError
+from open_notebook.utils.memory_index import memory_vector_index
 
 router = APIRouter()
 
@@ -974,6 +975,7 @@ async def delete_source(source_id: str):
 
         await Notebook.update_timestamps_for_source(source_id)
         await source.delete()
+        memory_vector_index.remove_source(source_id)
 
         return {"message": "Source deleted successfully"}
     except HTTPException:
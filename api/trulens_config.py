@@ -1,26 +1,32 @@
 from typing import Optional
 from open_notebook.database.repository import repo_query, ensure_record_id
+from open_notebook.utils.settings_cache import (
+  cache_setting,
+  get_cached_setting,
+  invalidate_setting,
+)
 
 TRULENS_SETTINGS_RECORD = "open_notebook:trulens_settings"
 
 
 async def get_trulens_enabled(default: bool = True) -> bool:
-  """Fetch TruLens enabled flag from database, fallback to default if missing."""
-  try:
-    rows = await repo_query(
-      "SELECT trulens_enabled FROM ONLY $rid",
-      {"rid": ensure_record_id(TRULENS_SETTINGS_RECORD)},
-    )
-    if rows:
-      data = rows[0] if isinstance(rows, list) else rows
-      enabled = data.get("trulens_enabled")
-      if enabled is None:
-        return default
-      return bool(enabled)
-  except Exception:
-    # If any issue occurs, keep system running with default value
+  """Fetch TruLens enabled flag (cached), fallback to default if missing."""
+  data = get_cached_setting(TRULENS_SETTINGS_RECORD)
+  if data is None:
+    try:
+      rows = await repo_query(
+        "SELECT trulens_enabled FROM ONLY $rid",
+        {"rid": ensure_record_id(TRULENS_SETTINGS_RECORD)},
+      )
+    except Exception:
+      # If any issue occurs, keep system running with default value
+      return default
+    data = (rows[0] if isinstance(rows, list) else rows) if rows else {}
+    cache_setting(TRULENS_SETTINGS_RECORD, data)
+  enabled = data.get("trulens_enabled")
+  if enabled is None:
     return default
-  return default
+  return bool(enabled)
 
 
 async def set_trulens_enabled(enabled: bool) -> bool:
@@ -38,6 +44,7 @@ async def set_trulens_enabled(enabled: bool) -> bool:
       "CREATE $rid SET trulens_enabled = $enabled, created = time::now(), updated = time::now()",
       {"rid": rid, "enabled": enabled},
     )
+  invalidate_setting(TRULENS_SETTINGS_RECORD)
   return enabled
 
 
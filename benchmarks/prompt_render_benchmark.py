@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark prompt rendering with large context payloads.
+
+Compares Prompter(prompt_template=...).render(), which loads and compiles the
+template on every call, with the cached templates of
+open_notebook.utils.prompt_templates.render_prompt at growing context sizes.
+
+Runs offline (no database or model needed), from the repository root:
+
+    python benchmarks/prompt_render_benchmark.py \
+        --sizes 10000 100000 1000000 --renders 200
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from ai_prompter import Prompter
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from open_notebook.utils.prompt_templates import (  # noqa: E402
+    precompile_prompts,
+    render_prompt,
+)
+
+TEMPLATES = ["health_chat_system", "health_recommendation_system", "chat"]
+
+
+def payload(size: int) -> dict:
+    passage = "Regular physical activity lowers blood pressure and improves sleep. "
+    context = (passage * (size // len(passage) + 1))[:size]
+    return {
+        "context": context,
+        "user_data": {"age": 45, "gender": "female", "bmi": 27.4},
+        "notebook": context,
+        "messages": [],
+    }
+
+
+def time_renders(render, renders: int) -> list:
+    timings = []
+    for _ in range(renders):
+        started = time.perf_counter()
+        render()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summarize(timings: list) -> str:
+    ordered = sorted(timings)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    return f"p50 {statistics.median(ordered):7.3f} ms   p95 {p95:7.3f} ms"
+
+
+def main(args) -> None:
+    started = time.perf_counter()
+    count = precompile_prompts()
+    print(f"precompiled {count} templates in {(time.perf_counter() - started) * 1000:.1f} ms\n")
+
+    print(f"{'template':<30}{'context':>10}  {'Prompter':<32}{'cached':<32}")
+    for name in TEMPLATES:
+        for size in sorted(args.sizes):
+            data = payload(size)
+            uncached = time_renders(
+                lambda: Prompter(prompt_template=name).render(data=data), args.renders
+            )
+            cached = time_renders(lambda: render_prompt(name, data), args.renders)
+            print(f"{name:<30}{size:>10}  {summarize(uncached):<32}{summarize(cached):<32}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--renders", type=int, default=200)
+    main(parser.parse_args())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark vector search latency on source_embedding as the table grows.
+
+Compares the brute-force cosine scan with the HNSW/KNN query used by
+open_notebook.utils.vector_index.knn_search at 10k, 100k and 1M chunks.
+
+Requires a running SurrealDB. The script deletes every `source_embedding` row
+and the vector index of the database it runs against, so it refuses to run
+unless SURREAL_DATABASE names a throwaway database, not the application
+database of .env, docker.env or .env.example (or --yes-delete is given):
+
+    SURREAL_DATABASE=vector_benchmark python benchmarks/vector_index_benchmark.py \
+        --sizes 10000 100000 1000000 --dimension 768 --queries 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from dotenv import dotenv_values
+from surrealdb import RecordID
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from open_notebook.database.repository import repo_insert, repo_query  # noqa: E402
+from open_notebook.utils.vector_index import (  # noqa: E402
+    VECTOR_INDEX_NAME,
+    ensure_vector_index,
+)
+
+BRUTE_FORCE_QUERY = """
+SELECT * FROM (
+    SELECT source AS id, vector::similarity::cosine(embedding, $q) AS similarity
+    FROM source_embedding
+    WHERE array::len(embedding) = array::len($q)
+)
+ORDER BY similarity DESC
+LIMIT 8
+"""
+
+KNN_QUERY = """
+SELECT source AS id, 1 - vector::distance::knn() AS similarity
+FROM source_embedding
+WHERE embedding <|8,100|> $q
+"""
+
+
+def random_vectors(count: int, dimension: int, rng: np.random.Generator) -> np.ndarray:
+    vectors = rng.standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def seed(target: int, current: int, dimension: int, rng, batch: int = 1000) -> None:
+    for start in range(current, target, batch):
+        size = min(batch, target - start)
+        vectors = random_vectors(size, dimension, rng)
+        await repo_insert(
+            "source_embedding",
+            [
+                {
+                    "source": RecordID("source", f"bench{(start + i) // 20}"),
+                    "order": (start + i) % 20,
+                    "content": f"benchmark chunk {start + i}",
+                    "embedding": vectors[i].tolist(),
+                }
+                for i in range(size)
+            ],
+        )
+
+
+async def time_query(query: str, queries: np.ndarray) -> list:
+    timings = []
+    for q in queries:
+        started = time.perf_counter()
+        await repo_query(query, {"q": q.tolist()})
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summarize(timings: list) -> str:
+    ordered = sorted(timings)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    return f"p50 {statistics.median(ordered):8.1f} ms   p95 {p95:8.1f} ms"
+
+
+ENV_FILES = [".env", "docker.env", ".env.example"]
+
+
+def check_target(args) -> None:
+    """Exit unless the benchmark targets a database that may be wiped."""
+    database = os.environ.get("SURREAL_DATABASE")
+    root = Path(__file__).parent.parent
+    app_databases = {
+        dotenv_values(root / name).get("SURREAL_DATABASE") for name in ENV_FILES
+    }
+    if args.yes_delete or (database and database not in app_databases):
+        return
+    sys.exit(
+        f"Refusing to delete all embeddings in database {database!r}. Set "
+        "SURREAL_DATABASE to a throwaway database, or pass --yes-delete."
+    )
+
+
+async def main(args) -> None:
+    check_target(args)
+    rng = np.random.default_rng(42)
+    await repo_query("DELETE source_embedding")
+    await ensure_vector_index(args.dimension)
+    queries = random_vectors(args.queries, args.dimension, rng)
+
+    current = 0
+    print(f"{'chunks':>10}  {'brute force':<34}{'knn (hnsw)':<34}")
+    for size in sorted(args.sizes):
+        await seed(size, current, args.dimension, rng)
+        current = size
+        # Wait for the concurrently built index to catch up
+        await asyncio.sleep(args.settle)
+        brute = await time_query(BRUTE_FORCE_QUERY, queries)
+        knn = await time_query(KNN_QUERY, queries)
+        print(f"{size:>10}  {summarize(brute):<34}{summarize(knn):<34}")
+
+    if not args.keep:
+        await repo_query("DELETE source_embedding")
+        await repo_query(
+            f"REMOVE INDEX IF EXISTS {VECTOR_INDEX_NAME} ON TABLE source_embedding"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument(
+        "--settle", type=float, default=5.0, help="Seconds to wait after seeding"
+    )
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded rows")
+    parser.add_argument(
+        "--yes-delete",
+        action="store_true",
+        help="Run even if SURREAL_DATABASE is unset or the application database",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -1,3 +1,5 @@
+import asyncio
+import os
 import time
 from typing import Dict, List, Literal, Optional
 
@@ -8,7 +10,16 @@ from surreal_commands import CommandInput, CommandOutput, command, submit_comman
 from open_notebook.database.repository import ensure_record_id, repo_query
 from open_notebook.domain.models import model_manager
 from open_notebook.domain.notebook import Source
+from open_notebook.domain.rebuild import RebuildJob
+from open_notebook.utils.rate_limiter import TokenBucket
 from open_notebook.utils.text_utils import split_text
+from open_notebook.utils.token_utils import token_count
+from open_notebook.utils.vector_index import ensure_vector_index, remove_vector_index
+
+# Rebuild tuning (overridable per request)
+REBUILD_CONCURRENCY = int(os.getenv("REBUILD_CONCURRENCY", "4"))
+EMBEDDING_RATE_LIMIT_PER_MINUTE = int(os.getenv("EMBEDDING_RATE_LIMIT_PER_MINUTE", "0"))
+REBUILD_EMBED_BATCH_SIZE = int(os.getenv("REBUILD_EMBED_BATCH_SIZE", "32"))
 
 
 def full_model_dump(model):
@@ -40,6 +51,7 @@ class EmbedChunkInput(CommandInput):
     source_id: str
     chunk_index: int
     chunk_text: str
+    token_count: Optional[int] = None
 
 
 class EmbedChunkOutput(CommandOutput):
@@ -65,6 +77,9 @@ class VectorizeSourceOutput(CommandOutput):
 class RebuildEmbeddingsInput(CommandInput):
     mode: Literal["existing", "all"]
     include_sources: bool = True
+    concurrency: Optional[int] = None  # Sources in flight (default REBUILD_CONCURRENCY)
+    rate_limit_per_minute: Optional[int] = None  # Embedding calls/min, 0 = unlimited
+    resume: bool = True  # Continue an interrupted rebuild_job with the same parameters
 
 
 class RebuildEmbeddingsOutput(CommandOutput):
@@ -73,6 +88,8 @@ class RebuildEmbeddingsOutput(CommandOutput):
     processed_items: int
     failed_items: int
     sources_processed: int = 0
+    resumed_items: int = 0
+    job_id: Optional[str] = None
     processing_time: float
     error_message: Optional[str] = None
 
@@ -199,22 +216,33 @@ async def embed_chunk_command(
 
         # Generate embedding for the chunk
         embedding = (await EMBEDDING_MODEL.aembed([input_data.chunk_text]))[0]
+        chunk_tokens = (
+            input_data.token_count
+            if input_data.token_count is not None
+            else token_count(input_data.chunk_text)
+        )
 
-        # Insert chunk embedding into database
+        # Replace the chunk's previous embedding (from an earlier vectorization
+        # or an earlier attempt of this job) in one transaction
         await repo_query(
             """
+            BEGIN TRANSACTION;
+            DELETE source_embedding WHERE source = $source_id AND order = $order;
             CREATE source_embedding CONTENT {
                 "source": $source_id,
                 "order": $order,
                 "content": $content,
                 "embedding": $embedding,
+                "token_count": $token_count,
             };
+            COMMIT TRANSACTION;
             """,
             {
                 "source_id": ensure_record_id(input_data.source_id),
                 "order": input_data.chunk_index,
                 "content": input_data.chunk_text,
                 "embedding": embedding,
+                "token_count": chunk_tokens,
             },
         )
 
@@ -264,9 +292,10 @@ async def vectorize_source_command(
     individual embed_chunk jobs to the worker queue.
 
     This command:
-    1. Deletes existing embeddings (idempotency)
-    2. Splits source text into chunks
-    3. Submits each chunk as a separate embed_chunk job
+    1. Splits source text into chunks
+    2. Deletes existing embeddings beyond the new chunk count
+    3. Submits each chunk as a separate embed_chunk job, which replaces the
+       chunk's existing embedding (idempotency)
     4. Returns immediately (jobs run in background)
 
     Natural concurrency control is provided by the worker pool size.
@@ -289,17 +318,7 @@ async def vectorize_source_command(
         if not source.full_text:
             raise ValueError(f"Source {input_data.source_id} has no text to vectorize")
 
-        # 2. Delete existing embeddings (idempotency)
-        logger.info(f"Deleting existing embeddings for source {input_data.source_id}")
-        delete_result = await repo_query(
-            "DELETE source_embedding WHERE source = $source_id",
-            {"source_id": ensure_record_id(input_data.source_id)}
-        )
-        deleted_count = len(delete_result) if delete_result else 0
-        if deleted_count > 0:
-            logger.info(f"Deleted {deleted_count} existing embeddings")
-
-        # 3. Split text into chunks
+        # 2. Split text into chunks
         logger.info(f"Splitting text into chunks for source {input_data.source_id}")
         chunks = split_text(source.full_text)
         total_chunks = len(chunks)
@@ -308,6 +327,20 @@ async def vectorize_source_command(
         if total_chunks == 0:
             raise ValueError("No chunks created after splitting text")
 
+        # 3. Delete embeddings beyond the new chunk count. The others are
+        # replaced one by one by the chunk jobs, so the source stays searchable
+        # until its new embeddings are in place.
+        await repo_query(
+            "DELETE source_embedding WHERE source = $source_id AND order >= $total_chunks",
+            {
+                "source_id": ensure_record_id(input_data.source_id),
+                "total_chunks": total_chunks,
+            },
+        )
+
+        # Store text statistics so context sizing can skip tokenizing the text
+        await source.save_text_stats(chunk_count=total_chunks)
+
         # 4. Submit each chunk as a separate job
         logger.info(f"Submitting {total_chunks} chunk jobs to worker queue")
         jobs_submitted = 0
@@ -321,6 +354,7 @@ async def vectorize_source_command(
                         "source_id": input_data.source_id,
                         "chunk_index": idx,
                         "chunk_text": chunk_text,
+                        "token_count": token_count(chunk_text),
                     }
                 )
                 jobs_submitted += 1
@@ -401,6 +435,64 @@ async def collect_items_for_rebuild(
     return items
 
 
+async def embed_source_inline(
+    source_id: str,
+    embedding_model,
+    rate_limiter: TokenBucket,
+    batch_size: int = REBUILD_EMBED_BATCH_SIZE,
+) -> int:
+    """
+    Re-embed a source directly (without fanning out embed_chunk jobs).
+
+    Chunks are embedded in batches, each batch paced by the shared rate limiter.
+    Existing embeddings are only replaced once every batch succeeded, so a failure
+    leaves the previous embeddings in place.
+
+    Returns:
+        Number of chunks written
+    """
+    source = await Source.get(source_id)
+    if not source:
+        raise ValueError(f"Source '{source_id}' not found")
+    if not source.full_text:
+        raise ValueError(f"Source {source_id} has no text to vectorize")
+
+    chunks = split_text(source.full_text)
+    if not chunks:
+        raise ValueError("No chunks created after splitting text")
+
+    embeddings: List[List[float]] = []
+    for start in range(0, len(chunks), batch_size):
+        await rate_limiter.acquire()
+        embeddings.extend(
+            await embedding_model.aembed(chunks[start : start + batch_size])
+        )
+
+    record_id = ensure_record_id(source_id)
+    rows = [
+        {
+            "source": record_id,
+            "order": idx,
+            "content": chunk_text,
+            "embedding": embedding,
+            "token_count": token_count(chunk_text),
+        }
+        for idx, (chunk_text, embedding) in enumerate(zip(chunks, embeddings))
+    ]
+    # One transaction, so the old embeddings survive a failed insert
+    await repo_query(
+        """
+        BEGIN TRANSACTION;
+        DELETE source_embedding WHERE source = $source_id;
+        INSERT INTO source_embedding $rows;
+        COMMIT TRANSACTION;
+        """,
+        {"source_id": record_id, "rows": rows},
+    )
+    await source.save_text_stats(chunk_count=len(chunks))
+    return len(chunks)
+
+
 @command("rebuild_embeddings", app="open_notebook", retry=None)
 async def rebuild_embeddings_command(
     input_data: RebuildEmbeddingsInput,
@@ -408,17 +500,34 @@ async def rebuild_embeddings_command(
     """
     Rebuild embeddings for sources
 
+    Sources are re-embedded with bounded concurrency (`concurrency` sources in
+    flight) and embedding-provider calls are paced by a token bucket
+    (`rate_limit_per_minute`). Progress is checkpointed to a `rebuild_job`
+    record after every source, so a rebuild interrupted by a worker restart
+    resumes with the sources it had not finished yet.
+
     Retry Strategy:
     - Retries disabled (retry=None) - batch failures are immediately reported
     - This ensures immediate visibility when batch operations fail
     - Allows operators to quickly identify and resolve issues
     """
     start_time = time.time()
+    job: Optional[RebuildJob] = None
 
     try:
+        concurrency = max(1, input_data.concurrency or REBUILD_CONCURRENCY)
+        rate_limit = (
+            input_data.rate_limit_per_minute
+            if input_data.rate_limit_per_minute is not None
+            else EMBEDDING_RATE_LIMIT_PER_MINUTE
+        )
+
         logger.info("=" * 60)
         logger.info(f"Starting embedding rebuild with mode={input_data.mode}")
         logger.info(f"Include: sources={input_data.include_sources}")
+        logger.info(
+            f"Concurrency: {concurrency}, rate limit: {rate_limit or 'unlimited'} calls/min"
+        )
         logger.info("=" * 60)
 
         # Check embedding model availability
@@ -429,59 +538,95 @@ async def rebuild_embeddings_command(
             )
 
         logger.info(f"Using embedding model: {EMBEDDING_MODEL}")
+        embedding_model_id = (await model_manager.get_defaults()).default_embedding_model
 
-        # Collect items to process
-        items = await collect_items_for_rebuild(
-            input_data.mode,
-            input_data.include_sources,
-        )
+        # Resume an interrupted job or collect items for a new one
+        if input_data.resume:
+            job = await RebuildJob.find_resumable(
+                input_data.mode, input_data.include_sources, embedding_model_id
+            )
+        if job:
+            logger.info(
+                f"Resuming rebuild job {job.id}: "
+                f"{len(job.completed_ids) + len(job.failed_ids)}/{len(job.source_ids)} already done"
+            )
+        else:
+            items = await collect_items_for_rebuild(
+                input_data.mode,
+                input_data.include_sources,
+            )
+            job = RebuildJob(
+                mode=input_data.mode,
+                include_sources=input_data.include_sources,
+                embedding_model=embedding_model_id,
+                source_ids=items["sources"],
+            )
+            await job.save()
 
-        total_items = len(items["sources"])
-        logger.info(f"Total items to process: {total_items}")
+        total_items = len(job.source_ids)
+        pending = job.pending_ids()
+        resumed_items = total_items - len(pending)
+        logger.info(f"Total items to process: {len(pending)} (of {total_items})")
 
         if total_items == 0:
             logger.warning("No items found to rebuild")
+            await job.finish("completed")
             return RebuildEmbeddingsOutput(
                 success=True,
                 total_items=0,
                 processed_items=0,
                 failed_items=0,
+                job_id=job.id,
                 processing_time=time.time() - start_time,
             )
 
         # Initialize counters
         sources_processed = 0
-        failed_items = 0
+        failed_items = len(job.failed_ids)
+        semaphore = asyncio.Semaphore(concurrency)
+        checkpoint_lock = asyncio.Lock()
+        rate_limiter = TokenBucket.per_minute(rate_limit)
+
+        async def process_source(source_id: str) -> None:
+            nonlocal sources_processed, failed_items
+            async with semaphore:
+                try:
+                    await embed_source_inline(source_id, EMBEDDING_MODEL, rate_limiter)
+                    completed, failed = [source_id], []
+                except Exception as e:
+                    logger.error(f"Failed to re-embed source {source_id}: {e}")
+                    completed, failed = [], [source_id]
+
+            async with checkpoint_lock:
+                await job.checkpoint(completed, failed)
+                sources_processed += len(completed)
+                failed_items += len(failed)
+                done = resumed_items + sources_processed + len(failed)
+                if done % 10 == 0 or done == total_items:
+                    logger.info(f"  Progress: {done}/{total_items} sources processed")
+
+        # The index may have the previous model's dimension; searches use the
+        # brute-force scan until it is redefined below
+        await remove_vector_index()
 
         # Process sources
-        logger.info(f"\nProcessing {len(items['sources'])} sources...")
-        for idx, source_id in enumerate(items["sources"], 1):
-            try:
-                source = await Source.get(source_id)
-                if not source:
-                    logger.warning(f"Source {source_id} not found, skipping")
-                    failed_items += 1
-                    continue
-
-                await source.vectorize()
-                sources_processed += 1
+        logger.info(f"\nProcessing {len(pending)} sources...")
+        await asyncio.gather(*(process_source(source_id) for source_id in pending))
+        await job.finish("completed")
 
-                if idx % 10 == 0 or idx == len(items["sources"]):
-                    logger.info(
-                        f"  Progress: {idx}/{len(items['sources'])} sources processed"
-                    )
-
-            except Exception as e:
-                logger.error(f"Failed to re-embed source {source_id}: {e}")
-                failed_items += 1
+        # The HNSW index must match the (possibly new) embedding dimension
+        try:
+            await ensure_vector_index()
+        except Exception as e:
+            logger.warning(f"Could not update vector index after rebuild: {e}")
 
         processing_time = time.time() - start_time
-        processed_items = sources_processed
+        processed_items = len(job.completed_ids)
 
         logger.info("=" * 60)
         logger.info("REBUILD COMPLETE")
         logger.info(f"  Total processed: {processed_items}/{total_items}")
-        logger.info(f"  Sources: {sources_processed}")
+        logger.info(f"  Sources: {sources_processed} (resumed past {resumed_items})")
         logger.info(f"  Failed: {failed_items}")
         logger.info(f"  Time: {processing_time:.2f}s")
         logger.info("=" * 60)
@@ -492,6 +637,8 @@ async def rebuild_embeddings_command(
             processed_items=processed_items,
             failed_items=failed_items,
             sources_processed=sources_processed,
+            resumed_items=resumed_items,
+            job_id=job.id,
             processing_time=processing_time,
         )
 
@@ -505,6 +652,7 @@ async def rebuild_embeddings_command(
             total_items=0,
             processed_items=0,
             failed_items=0,
+            job_id=job.id if job else None,
             processing_time=processing_time,
             error_message=str(e),
         )
@@ -120,6 +120,15 @@ class AsyncMigrationManager:
             AsyncMigration.from_file("migrations/22.surrealql"),
             AsyncMigration.from_file("migrations/23.surrealql"),
             AsyncMigration.from_file("migrations/24.surrealql"),
+            # 25.surrealql drops evaluation_inclusion, which is still in use,
+            # so it is intentionally not applied.
+            AsyncMigration.from_file("migrations/26.surrealql"),
+            AsyncMigration.from_file("migrations/27.surrealql"),
+            AsyncMigration.from_file("migrations/28.surrealql"),
+            AsyncMigration.from_file("migrations/29.surrealql"),
+            AsyncMigration.from_file("migrations/30.surrealql"),
+            AsyncMigration.from_file("migrations/31.surrealql"),
+            AsyncMigration.from_file("migrations/32.surrealql"),
         ]
         self.down_migrations = [
             AsyncMigration.from_file("migrations/1_down.surrealql"),
@@ -146,7 +155,13 @@ class AsyncMigrationManager:
             AsyncMigration.from_file("migrations/22_down.surrealql"),
             AsyncMigration.from_file("migrations/23_down.surrealql"),
             AsyncMigration.from_file("migrations/24_down.surrealql"),
-            AsyncMigration.from_file("migrations/23_down.surrealql"),
+            AsyncMigration.from_file("migrations/26_down.surrealql"),
+            AsyncMigration.from_file("migrations/27_down.surrealql"),
+            AsyncMigration.from_file("migrations/28_down.surrealql"),
+            AsyncMigration.from_file("migrations/29_down.surrealql"),
+            AsyncMigration.from_file("migrations/30_down.surrealql"),
+            AsyncMigration.from_file("migrations/31_down.surrealql"),
+            AsyncMigration.from_file("migrations/32_down.surrealql"),
         ]
         self.runner = AsyncMigrationRunner(
             up_migrations=self.up_migrations,
@@ -18,6 +18,11 @@ from open_notebook.exceptions import (
     InvalidInputError,
     NotFoundError,
 )
+from open_notebook.utils.settings_cache import (
+    cache_setting,
+    get_cached_setting,
+    invalidate_setting,
+)
 
 T = TypeVar("T", bound="ObjectModel")
 
@@ -244,30 +249,37 @@ class RecordModel(BaseModel):
             object.__setattr__(self, "_initialized", True)
             object.__setattr__(self, "_db_loaded", False)
 
-    async def _load_from_db(self):
-        """Load data from database if not already loaded"""
-        if not getattr(self, "_db_loaded", False):
+    @classmethod
+    async def fetch_record(cls) -> Dict[str, Any]:
+        """The record's row, served from the settings cache while fresh"""
+        row = get_cached_setting(cls.record_id)
+        if row is None:
             result = await repo_query(
                 "SELECT * FROM ONLY $record_id",
-                {"record_id": ensure_record_id(self.record_id)},
+                {"record_id": ensure_record_id(cls.record_id)},
             )
 
             # Handle case where record doesn't exist yet
-            if result:
-                if isinstance(result, list) and len(result) > 0:
-                    # Standard list response
+            row = {}
+            if isinstance(result, list) and len(result) > 0:
+                # Standard list response
+                if isinstance(result[0], dict):
                     row = result[0]
-                    if isinstance(row, dict):
-                        for key, value in row.items():
-                            if hasattr(self, key):
-                                object.__setattr__(self, key, value)
-                elif isinstance(result, dict):
-                    # Direct dict response
-                    for key, value in result.items():
-                        if hasattr(self, key):
-                            object.__setattr__(self, key, value)
-
-            object.__setattr__(self, "_db_loaded", True)
+            elif isinstance(result, dict):
+                # Direct dict response
+                row = result
+            cache_setting(cls.record_id, row)
+        return row
+
+    async def _load_from_db(self):
+        """Load data from database unless the loaded record is still fresh"""
+        loaded = getattr(self, "_db_loaded", False)
+        if loaded and get_cached_setting(self.record_id) is not None:
+            return
+        for key, value in (await self.fetch_record()).items():
+            if hasattr(self, key):
+                object.__setattr__(self, key, value)
+        object.__setattr__(self, "_db_loaded", True)
 
     @classmethod
     async def get_instance(cls) -> "RecordModel":
@@ -300,6 +312,7 @@ class RecordModel(BaseModel):
             self.record_id,
             data,
         )
+        invalidate_setting(self.record_id)
 
         result = await repo_query(
             "SELECT * FROM $record_id", {"record_id": ensure_record_id(self.record_id)}
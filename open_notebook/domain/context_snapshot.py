@@ -0,0 +1,81 @@
+import hashlib
+import json
+from typing import Any, ClassVar, Dict, List, Optional
+
+from loguru import logger
+from pydantic import Field
+
+from open_notebook.database.repository import ensure_record_id, repo_query, repo_upsert
+from open_notebook.domain.base import ObjectModel
+from open_notebook.exceptions import DatabaseOperationError
+
+
+def config_hash(config: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+class ContextSnapshot(ObjectModel):
+    """
+    Prebuilt notebook context for a retrieval config.
+
+    There is one record per (notebook, config). It is valid while
+    notebook_updated matches the notebook's current `updated` timestamp.
+    """
+
+    table_name: ClassVar[str] = "context_snapshot"
+
+    notebook_id: str
+    notebook_updated: str
+    config_hash: str
+    config: Dict[str, Any] = Field(default_factory=dict)
+    context: str = ""
+    available_ids: List[str] = Field(default_factory=list)
+
+    @staticmethod
+    def record_id(notebook_id: str, config_digest: str) -> str:
+        notebook_key = notebook_id.split(":")[-1]
+        return f"context_snapshot:{notebook_key}_{config_digest[:16]}"
+
+    @classmethod
+    async def find(
+        cls, notebook_id: str, config_digest: str
+    ) -> Optional["ContextSnapshot"]:
+        """The stored snapshot for a notebook and config, whatever its version."""
+        try:
+            rows = await repo_query(
+                "SELECT * FROM $id",
+                {"id": ensure_record_id(cls.record_id(notebook_id, config_digest))},
+            )
+            return cls(**rows[0]) if rows else None
+        except Exception as e:
+            logger.error(f"Error fetching context snapshot for {notebook_id}: {str(e)}")
+            raise DatabaseOperationError(e)
+
+    @classmethod
+    async def for_notebook(cls, notebook_id: str) -> List["ContextSnapshot"]:
+        try:
+            rows = await repo_query(
+                "SELECT * FROM context_snapshot WHERE notebook_id = $notebook_id",
+                {"notebook_id": str(notebook_id)},
+            )
+            return [cls(**row) for row in rows]
+        except Exception as e:
+            logger.error(f"Error fetching context snapshots for {notebook_id}: {str(e)}")
+            raise DatabaseOperationError(e)
+
+    async def store(self) -> None:
+        """Create or overwrite the snapshot record of this notebook and config."""
+        self.id = self.record_id(self.notebook_id, self.config_hash)
+        await repo_upsert(
+            self.table_name,
+            self.id,
+            {
+                "notebook_id": self.notebook_id,
+                "notebook_updated": self.notebook_updated,
+                "config_hash": self.config_hash,
+                "config": self.config,
+                "context": self.context,
+                "available_ids": self.available_ids,
+            },
+            add_timestamp=True,
+        )
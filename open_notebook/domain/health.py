@@ -3,6 +3,7 @@ from datetime import datetime
 from pydantic import BaseModel, Field, field_validator
 from surrealdb import RecordID
 
+from open_notebook.database.repository import ensure_record_id, repo_query
 from open_notebook.domain.base import ObjectModel
 
 
@@ -34,9 +35,32 @@ class HealthChatSession(ObjectModel):
     examination_id: Optional[Union[str, RecordID]] = None
     title: Optional[str] = None
     messages: List[Dict[str, Any]] = Field(default_factory=list)
+    # Retrieval reused across turns while the notebook version is unchanged
+    context: Optional[str] = None
+    context_ids: List[str] = Field(default_factory=list)
+    context_notebook_id: Optional[str] = None
+    context_version: Optional[str] = None
+    # Rolling summary of the first `summarized_count` user/bot messages
+    history_summary: Optional[str] = None
+    summarized_count: int = 0
     
     class Config:
         arbitrary_types_allowed = True
+
+    def has_context(self, notebook_id: str, version: str) -> bool:
+        return (
+            self.context is not None
+            and self.context_notebook_id == notebook_id
+            and self.context_version == version
+        )
+
+    def set_context(
+        self, notebook_id: str, version: str, context: str, context_ids: List[str]
+    ) -> None:
+        self.context_notebook_id = notebook_id
+        self.context_version = version
+        self.context = context
+        self.context_ids = list(context_ids)
     
     @field_validator("examination_id", mode="before")
     @classmethod
@@ -47,6 +71,26 @@ class HealthChatSession(ObjectModel):
             return str(value)
         return str(value) if value else None
     
+    async def save_history_summary(self, summary: str, summarized_count: int) -> None:
+        """
+        Store the history summary without rewriting the session.
+
+        The in-memory session is updated too, so a later save() of this
+        object (which replaces the whole record) keeps the summary.
+        """
+        self.history_summary = summary
+        self.summarized_count = summarized_count
+        if not self.id:
+            return
+        await repo_query(
+            "UPDATE $id SET history_summary = $summary, summarized_count = $count",
+            {
+                "id": ensure_record_id(self.id),
+                "summary": summary,
+                "count": summarized_count,
+            },
+        )
+
     def _prepare_save_data(self) -> Dict[str, Any]:
         data = super()._prepare_save_data()
         
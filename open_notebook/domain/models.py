@@ -1,13 +1,18 @@
-from typing import ClassVar, Dict, Optional, Union
+import json
+from collections import OrderedDict
+from typing import Any, ClassVar, Dict, Optional, Tuple, Union
 
 from esperanto import AIFactory, EmbeddingModel, LanguageModel
 from loguru import logger
 
-from open_notebook.database.repository import ensure_record_id, repo_query
+from open_notebook.database.repository import repo_query
 from open_notebook.domain.base import ObjectModel, RecordModel
 
 ModelType = Union[LanguageModel, EmbeddingModel]
 
+# Model instances kept per ModelManager, by (model id, config)
+MODEL_CACHE_SIZE = 32
+
 
 class Model(ObjectModel):
     table_name: ClassVar[str] = "model"
@@ -22,6 +27,16 @@ class Model(ObjectModel):
         )
         return [Model(**model) for model in models]
 
+    async def save(self) -> None:
+        await super().save()
+        # Cached instances were created from the previous name and provider
+        model_manager.invalidate(self.id)
+
+    async def delete(self) -> bool:
+        result = await super().delete()
+        model_manager.invalidate(self.id)
+        return result
+
 
 class DefaultModels(RecordModel):
     record_id: ClassVar[str] = "open_notebook:default_models"
@@ -32,23 +47,10 @@ class DefaultModels(RecordModel):
 
     @classmethod
     async def get_instance(cls) -> "DefaultModels":
-        """Always fetch fresh defaults from database (override parent caching behavior)"""
-        result = await repo_query(
-            "SELECT * FROM ONLY $record_id",
-            {"record_id": ensure_record_id(cls.record_id)},
-        )
-
-        if result:
-            if isinstance(result, list) and len(result) > 0:
-                data = result[0]
-            elif isinstance(result, dict):
-                data = result
-            else:
-                data = {}
-        else:
-            data = {}
+        """Fresh instance from the cached record (override parent singleton behavior)"""
+        data = await cls.fetch_record()
 
-        # Create new instance with fresh data (bypass singleton cache)
+        # Create new instance with the record data (bypass singleton cache)
         instance = object.__new__(cls)
         object.__setattr__(instance, "__dict__", {})
         super(RecordModel, instance).__init__(**data)
@@ -57,13 +59,37 @@ class DefaultModels(RecordModel):
 
 class ModelManager:
     def __init__(self):
-        pass  # No caching needed
+        # Cached instances keep their provider HTTP clients across requests
+        self._models: "OrderedDict[Tuple[str, str], ModelType]" = OrderedDict()
+        # LangChain versions of the cached language models, by id(model)
+        self._langchain_models: Dict[int, Any] = {}
+
+    @staticmethod
+    def _cache_key(model_id: str, kwargs: Dict[str, Any]) -> Tuple[str, str]:
+        return str(model_id), json.dumps(kwargs, sort_keys=True, default=str)
+
+    def _evict(self, key: Tuple[str, str]) -> None:
+        model = self._models.pop(key, None)
+        if model is not None:
+            self._langchain_models.pop(id(model), None)
+
+    def invalidate(self, model_id: Optional[str] = None) -> None:
+        """Drop the cached instances of a model, or of all models."""
+        for key in list(self._models):
+            if model_id is None or key[0] == str(model_id):
+                self._evict(key)
 
     async def get_model(self, model_id: str, **kwargs) -> Optional[ModelType]:
-        """Get a model by ID. Esperanto will cache the actual model instance."""
+        """Get a model by ID, reusing the instance created for the same config."""
         if not model_id:
             return None
 
+        key = self._cache_key(model_id, kwargs)
+        cached = self._models.get(key)
+        if cached is not None:
+            self._models.move_to_end(key)
+            return cached
+
         try:
             model: Model = await Model.get(model_id)
         except Exception:
@@ -75,15 +101,15 @@ class ModelManager:
         ]:
             raise ValueError(f"Invalid model type: {model.type}")
 
-        # Create model based on type (Esperanto will cache the instance)
+        instance: ModelType
         if model.type == "language":
-            return AIFactory.create_language(
+            instance = AIFactory.create_language(
                 model_name=model.name,
                 provider=model.provider,
                 config=kwargs,
             )
         elif model.type == "embedding":
-            return AIFactory.create_embedding(
+            instance = AIFactory.create_embedding(
                 model_name=model.name,
                 provider=model.provider,
                 config=kwargs,
@@ -91,6 +117,21 @@ class ModelManager:
         else:
             raise ValueError(f"Invalid model type: {model.type}")
 
+        self._models[key] = instance
+        while len(self._models) > MODEL_CACHE_SIZE:
+            self._evict(next(iter(self._models)))
+        return instance
+
+    def to_langchain(self, model: LanguageModel) -> Any:
+        """LangChain version of a language model, created once per cached instance."""
+        if not any(cached is model for cached in self._models.values()):
+            return model.to_langchain()
+        langchain_model = self._langchain_models.get(id(model))
+        if langchain_model is None:
+            langchain_model = model.to_langchain()
+            self._langchain_models[id(model)] = langchain_model
+        return langchain_model
+
     async def get_defaults(self) -> DefaultModels:
         """Get the default models configuration from database"""
         defaults = await DefaultModels.get_instance()
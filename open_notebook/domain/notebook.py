@@ -10,13 +10,57 @@ from open_notebook.database.repository import ensure_record_id, repo_query, repo
 from open_notebook.domain.base import ObjectModel
 from open_notebook.domain.models import model_manager
 from open_notebook.exceptions import DatabaseOperationError, InvalidInputError
-from open_notebook.utils import split_text
+from open_notebook.utils import split_text, token_count
+from open_notebook.utils.retrieval_cache import (
+    RETRIEVAL_CACHE_TTL_SECONDS,
+    TTLCache,
+    invalidate_retrieval_cache,
+)
 from datetime import datetime
 
 
+# Most recently updated notebook, the default for requests without a notebook id.
+# The TTL bounds staleness for updates made by other processes.
+_latest_notebook_cache = TTLCache(1, RETRIEVAL_CACHE_TTL_SECONDS)
+
+
 class Notebook(ObjectModel):
     table_name: ClassVar[str] = "notebook"
 
+    @classmethod
+    async def get_latest(cls) -> Optional["Notebook"]:
+        """The most recently updated notebook, or None when there are none."""
+        cached = _latest_notebook_cache.get("latest")
+        if cached is not None:
+            return cached
+        try:
+            # `updated` is projected because SurrealDB orders by selected fields
+            rows = await repo_query(
+                "SELECT id, updated FROM notebook ORDER BY updated DESC LIMIT 1"
+            )
+        except Exception as e:
+            logger.error(f"Error fetching latest notebook: {str(e)}")
+            raise DatabaseOperationError(e)
+        if not rows:
+            return None
+        notebook = await cls.get(str(rows[0]["id"]))
+        _latest_notebook_cache.set("latest", notebook)
+        return notebook
+
+    @staticmethod
+    def invalidate_latest() -> None:
+        _latest_notebook_cache.clear()
+
+    async def save(self) -> None:
+        await super().save()
+        Notebook.invalidate_latest()
+
+    async def delete(self) -> bool:
+        try:
+            return await super().delete()
+        finally:
+            Notebook.invalidate_latest()
+
     async def get_sources(self) -> List["Source"]:
         try:
             srcs = await repo_query(
@@ -42,6 +86,12 @@ class Notebook(ObjectModel):
                 ensure_record_id(notebook_id),
                 {"updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
             )
+            invalidate_retrieval_cache(notebook_id)
+            Notebook.invalidate_latest()
+
+            from open_notebook.utils.notebook_context import schedule_snapshot_refresh
+
+            schedule_snapshot_refresh(notebook_id)
         except Exception as e:
             logger.warning(f"Failed to update notebook timestamp for {notebook_id}: {str(e)}")
 
@@ -115,6 +165,9 @@ class Source(ObjectModel):
     topics: Optional[List[str]] = Field(default_factory=list)
     full_text: Optional[str] = None
     chat_include: Optional[str] = Field(default="full", description="Chat inclusion mode: 'off' or 'full'")
+    token_count: Optional[int] = None
+    char_count: Optional[int] = None
+    chunk_count: Optional[int] = None
     command: Optional[Union[str, RecordID]] = Field(
         default=None, description="Link to surreal-commands processing job"
     )
@@ -140,6 +193,94 @@ class Source(ObjectModel):
             return str(value)
         return str(value) if value else None
 
+    @classmethod
+    async def get_many(
+        cls,
+        ids: List[str],
+        fields: Optional[List[str]] = None,
+        full_text_limit: Optional[int] = None,
+    ) -> List["Source"]:
+        """
+        Fetch several sources in a single query, in the order of `ids`.
+
+        Args:
+            ids: Source ids; missing sources are skipped
+            fields: Fields to project (id is always included); all fields if None
+            full_text_limit: Return only the first N characters of full_text,
+                sliced in the database instead of in Python
+        """
+        if not ids:
+            return []
+        fields = fields or ["*"]
+        for name in fields:
+            if name != "*" and not name.isidentifier():
+                raise InvalidInputError(f"Invalid field name: {name}")
+
+        projection = []
+        for name in fields:
+            if name == "full_text" and full_text_limit is not None:
+                projection.append(
+                    "string::slice(full_text ?? '', 0, $full_text_limit) AS full_text"
+                )
+            else:
+                projection.append(name)
+        if "*" not in fields:
+            projection.insert(0, "id")
+        elif full_text_limit is not None:
+            projection.append(
+                "string::slice(full_text ?? '', 0, $full_text_limit) AS full_text"
+            )
+
+        try:
+            rows = await repo_query(
+                f"SELECT {', '.join(projection)} FROM $ids",
+                {
+                    "ids": [ensure_record_id(source_id) for source_id in ids],
+                    "full_text_limit": full_text_limit,
+                },
+            )
+        except Exception as e:
+            logger.error(f"Error fetching sources {ids}: {str(e)}")
+            logger.exception(e)
+            raise DatabaseOperationError(e)
+
+        by_id = {str(row["id"]): cls(**row) for row in rows or []}
+        return [by_id[str(source_id)] for source_id in ids if str(source_id) in by_id]
+
+    def compute_text_stats(self) -> None:
+        """Set char_count and token_count from full_text (one tokenizer pass)."""
+        text = self.full_text or ""
+        self.char_count = len(text)
+        self.token_count = token_count(text) if text else 0
+
+    async def save_text_stats(self, chunk_count: Optional[int] = None) -> None:
+        """
+        Compute and store the text statistics without rewriting the record.
+
+        Args:
+            chunk_count: Number of embedded chunks, when known
+        """
+        self.compute_text_stats()
+        if chunk_count is not None:
+            self.chunk_count = chunk_count
+        try:
+            await repo_query(
+                """
+                UPDATE $id SET
+                    token_count = $token_count,
+                    char_count = $char_count,
+                    chunk_count = $chunk_count
+                """,
+                {
+                    "id": ensure_record_id(self.id),
+                    "token_count": self.token_count,
+                    "char_count": self.char_count,
+                    "chunk_count": self.chunk_count,
+                },
+            )
+        except Exception as e:
+            logger.warning(f"Failed to store text stats for source {self.id}: {str(e)}")
+
     async def get_status(self) -> Optional[str]:
         """Get the processing status of the associated command"""
         if not self.command:
@@ -264,6 +405,20 @@ class Source(ObjectModel):
             raise DatabaseOperationError(e)
 
 
+    async def save(self) -> None:
+        await super().save()
+        from open_notebook.utils.reference_utils import invalidate_reference_title
+
+        invalidate_reference_title(str(self.id))
+
+    async def delete(self) -> bool:
+        from open_notebook.utils.reference_utils import invalidate_reference_title
+
+        try:
+            return await super().delete()
+        finally:
+            invalidate_reference_title(str(self.id))
+
     def _prepare_save_data(self) -> dict:
         """Override to ensure command field is always RecordID format for database"""
         data = super()._prepare_save_data()
@@ -0,0 +1,85 @@
+from typing import ClassVar, List, Literal, Optional
+
+from loguru import logger
+from pydantic import Field
+
+from open_notebook.database.repository import ensure_record_id, repo_query
+from open_notebook.domain.base import ObjectModel
+from open_notebook.exceptions import DatabaseOperationError
+
+
+class RebuildJob(ObjectModel):
+    """Checkpoint record for an embedding rebuild, used to resume after restarts."""
+
+    table_name: ClassVar[str] = "rebuild_job"
+
+    mode: Literal["existing", "all"]
+    include_sources: bool = True
+    status: Literal["running", "completed", "failed"] = "running"
+    embedding_model: Optional[str] = None
+    source_ids: List[str] = Field(default_factory=list)
+    completed_ids: List[str] = Field(default_factory=list)
+    failed_ids: List[str] = Field(default_factory=list)
+
+    @classmethod
+    async def find_resumable(
+        cls, mode: str, include_sources: bool, embedding_model: Optional[str]
+    ) -> Optional["RebuildJob"]:
+        """Return the most recent unfinished job with the same parameters, if any."""
+        try:
+            rows = await repo_query(
+                """
+                SELECT * FROM rebuild_job
+                WHERE status = 'running'
+                    AND mode = $mode
+                    AND include_sources = $include_sources
+                    AND embedding_model = $embedding_model
+                ORDER BY updated DESC
+                LIMIT 1
+                """,
+                {
+                    "mode": mode,
+                    "include_sources": include_sources,
+                    "embedding_model": embedding_model,
+                },
+            )
+            return cls(**rows[0]) if rows else None
+        except Exception as e:
+            logger.error(f"Error looking up resumable rebuild job: {str(e)}")
+            logger.exception(e)
+            raise DatabaseOperationError(e)
+
+    def pending_ids(self) -> List[str]:
+        """Source ids that have not been checkpointed as completed or failed."""
+        done = set(self.completed_ids) | set(self.failed_ids)
+        return [source_id for source_id in self.source_ids if source_id not in done]
+
+    async def checkpoint(
+        self, completed: List[str], failed: Optional[List[str]] = None
+    ) -> None:
+        """Append finished source ids to the job record without rewriting it."""
+        failed = failed or []
+        if not completed and not failed:
+            return
+        await repo_query(
+            """
+            UPDATE $id SET
+                completed_ids = array::union(completed_ids, $completed),
+                failed_ids = array::union(failed_ids, $failed),
+                updated = time::now()
+            """,
+            {
+                "id": ensure_record_id(self.id),
+                "completed": completed,
+                "failed": failed,
+            },
+        )
+        self.completed_ids.extend(completed)
+        self.failed_ids.extend(failed)
+
+    async def finish(self, status: Literal["completed", "failed"]) -> None:
+        await repo_query(
+            "UPDATE $id SET status = $status, updated = time::now()",
+            {"id": ensure_record_id(self.id), "status": status},
+        )
+        self.status = status
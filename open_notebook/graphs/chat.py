@@ -1,18 +1,17 @@
-import asyncio
-import sqlite3
-from typing import Annotated, Optional
+from typing import Annotated, Dict, Optional, Tuple
 
-from ai_prompter import Prompter
 from langchain_core.messages import SystemMessage
 from langchain_core.runnables import RunnableConfig
-from langgraph.checkpoint.sqlite import SqliteSaver
 from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import add_messages
+from langgraph.graph.state import CompiledStateGraph
 from typing_extensions import TypedDict
 
-from open_notebook.config import LANGGRAPH_CHECKPOINT_FILE
 from open_notebook.domain.notebook import Notebook
+from open_notebook.graphs.checkpoint import compile_graph
 from open_notebook.graphs.utils import provision_langchain_model
+from open_notebook.utils.chat_history import build_history, schedule_summary, summary_section
+from open_notebook.utils.prompt_templates import render_prompt
 
 
 class ThreadState(TypedDict):
@@ -21,62 +20,64 @@ class ThreadState(TypedDict):
     context: Optional[str]
     context_config: Optional[dict]
     model_override: Optional[str]
+    # Rolling summary of the first `summarized_count` messages
+    summary: Optional[str]
+    summarized_count: Optional[int]
 
 
-def call_model_with_messages(state: ThreadState, config: RunnableConfig) -> dict:
-    system_prompt = Prompter(prompt_template="chat").render(data=state)  # type: ignore[arg-type]
-    payload = [SystemMessage(content=system_prompt)] + state.get("messages", [])
+# Summaries finished in the background, by thread id. They are applied by the
+# thread's next turn, as writing the graph state from outside a run would race
+# with the run's own checkpoint.
+_finished_summaries: Dict[str, Tuple[str, int]] = {}
+
+
+async def call_model_with_messages(state: ThreadState, config: RunnableConfig) -> dict:
+    thread_id = config.get("configurable", {}).get("thread_id")
+    summary = state.get("summary")
+    summarized_count = state.get("summarized_count") or 0
+    finished = _finished_summaries.pop(thread_id, None) if thread_id else None
+    if finished and finished[1] > summarized_count:
+        summary, summarized_count = finished
+
+    system_prompt = render_prompt("chat", state)  # type: ignore[arg-type]
+    system_prompt += summary_section(summary)
+    history = state.get("messages", [])
+    recent_messages, window_start = build_history(history)
+    payload = [SystemMessage(content=system_prompt)] + recent_messages
     model_id = config.get("configurable", {}).get("model_id") or state.get(
         "model_override"
     )
 
-    # Handle async model provisioning from sync context
-    def run_in_new_loop():
-        """Run the async function in a new event loop"""
-        new_loop = asyncio.new_event_loop()
-        try:
-            asyncio.set_event_loop(new_loop)
-            return new_loop.run_until_complete(
-                provision_langchain_model(
-                    str(payload), model_id, "chat", max_tokens=8192
-                )
-            )
-        finally:
-            new_loop.close()
-            asyncio.set_event_loop(None)
-
-    try:
-        # Try to get the current event loop
-        asyncio.get_running_loop()
-        # If we're in an event loop, run in a thread with a new loop
-        import concurrent.futures
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(run_in_new_loop)
-            model = future.result()
-    except RuntimeError:
-        # No event loop running, safe to use asyncio.run()
-        model = asyncio.run(
-            provision_langchain_model(
-                str(payload),
-                model_id,
-                "chat",
-                max_tokens=8192,
-            )
-        )
+    if thread_id and window_start > summarized_count:
 
-    ai_message = model.invoke(payload)
-    return {"messages": ai_message}
+        async def keep_summary(new_summary: str, count: int) -> None:
+            _finished_summaries[thread_id] = (new_summary, count)
 
+        schedule_summary(
+            f"chat:{thread_id}",
+            summary,
+            history[summarized_count:window_start],
+            window_start,
+            keep_summary,
+        )
+
+    model = await provision_langchain_model(
+        str(payload), model_id, "chat", max_tokens=8192
+    )
+    ai_message = await model.ainvoke(payload)
+    return {
+        "messages": ai_message,
+        "summary": summary,
+        "summarized_count": summarized_count,
+    }
 
-conn = sqlite3.connect(
-    LANGGRAPH_CHECKPOINT_FILE,
-    check_same_thread=False,
-)
-memory = SqliteSaver(conn)
 
 agent_state = StateGraph(ThreadState)
 agent_state.add_node("agent", call_model_with_messages)
 agent_state.add_edge(START, "agent")
 agent_state.add_edge("agent", END)
-graph = agent_state.compile(checkpointer=memory)
+
+
+def get_graph() -> CompiledStateGraph:
+    """The chat graph, checkpointed for the running event loop."""
+    return compile_graph(agent_state)
@@ -0,0 +1,132 @@
+"""
+LangGraph checkpointer shared by the chat graphs.
+
+AsyncSqliteSaver binds to the event loop it is created on, so the saver (and
+the graphs compiled with it) are created on first use from the running loop
+instead of at import time. In the API that is the server's loop; a new loop
+(e.g. a script calling asyncio.run twice) gets a new saver.
+
+The saver puts the database in WAL mode when it sets up its tables, so
+state reads do not wait on checkpoint writes. The aiosqlite connection runs
+on a non-daemon thread: call close_checkpointer() on shutdown so the
+process can exit.
+
+Every chat turn adds checkpoints, but only the latest one per thread is
+needed to continue a conversation. prune_checkpoints() keeps the newest
+CHECKPOINT_KEEP_PER_THREAD checkpoints of each thread (and their pending
+writes); the API runs it every CHECKPOINT_PRUNE_INTERVAL_SECONDS.
+"""
+
+import asyncio
+import os
+from typing import Dict, Optional, Tuple
+
+import aiosqlite
+from loguru import logger
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph import StateGraph
+from langgraph.graph.state import CompiledStateGraph
+
+from open_notebook.config import LANGGRAPH_CHECKPOINT_FILE
+
+CHECKPOINT_KEEP_PER_THREAD = max(1, int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", "2")))
+CHECKPOINT_PRUNE_INTERVAL_SECONDS = float(
+    os.getenv("CHECKPOINT_PRUNE_INTERVAL_SECONDS", "3600")
+)
+
+_checkpointer: Optional[AsyncSqliteSaver] = None
+# {id(graph builder): (checkpointer it was compiled with, compiled graph)}
+_compiled: Dict[int, Tuple[AsyncSqliteSaver, CompiledStateGraph]] = {}
+
+
+def get_checkpointer() -> AsyncSqliteSaver:
+    """The checkpointer for the running event loop."""
+    global _checkpointer
+    loop = asyncio.get_running_loop()
+    if _checkpointer is None or _checkpointer.loop is not loop:
+        if _checkpointer is not None:
+            # Bound to a previous loop; stops its worker thread without awaiting
+            _checkpointer.conn.stop()
+        # The connection is opened by the saver on its first use
+        _checkpointer = AsyncSqliteSaver(aiosqlite.connect(LANGGRAPH_CHECKPOINT_FILE))
+    return _checkpointer
+
+
+def compile_graph(builder: StateGraph) -> CompiledStateGraph:
+    """Compile a graph with the shared checkpointer, once per checkpointer."""
+    checkpointer = get_checkpointer()
+    cached = _compiled.get(id(builder))
+    if cached is None or cached[0] is not checkpointer:
+        cached = (checkpointer, builder.compile(checkpointer=checkpointer))
+        _compiled[id(builder)] = cached
+    return cached[1]
+
+
+async def close_checkpointer() -> None:
+    """Close the checkpointer connection (and its worker thread)."""
+    global _checkpointer
+    if _checkpointer is not None:
+        checkpointer, _checkpointer = _checkpointer, None
+        _compiled.clear()
+        await checkpointer.conn.close()
+
+
+async def prune_checkpoints(
+    checkpointer: Optional[AsyncSqliteSaver] = None,
+    keep: int = CHECKPOINT_KEEP_PER_THREAD,
+) -> int:
+    """
+    Delete all but the newest `keep` checkpoints of every thread.
+
+    Checkpoint ids are time-ordered, so the newest have the highest ids.
+
+    Returns:
+        Number of checkpoints deleted
+    """
+    checkpointer = checkpointer or get_checkpointer()
+    await checkpointer.setup()
+    async with checkpointer.lock:
+        conn = checkpointer.conn
+        cursor = await conn.execute(
+            """
+            DELETE FROM checkpoints WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, ROW_NUMBER() OVER (
+                        PARTITION BY thread_id, checkpoint_ns
+                        ORDER BY checkpoint_id DESC
+                    ) AS position
+                    FROM checkpoints
+                ) WHERE position > ?
+            )
+            """,
+            (max(1, keep),),
+        )
+        deleted = cursor.rowcount
+        await conn.execute(
+            """
+            DELETE FROM writes WHERE NOT EXISTS (
+                SELECT 1 FROM checkpoints
+                WHERE checkpoints.thread_id = writes.thread_id
+                    AND checkpoints.checkpoint_ns = writes.checkpoint_ns
+                    AND checkpoints.checkpoint_id = writes.checkpoint_id
+            )
+            """
+        )
+        await conn.commit()
+        # Fold the WAL back into the database so it does not keep growing either
+        await conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return deleted
+
+
+async def prune_checkpoints_periodically(
+    interval: float = CHECKPOINT_PRUNE_INTERVAL_SECONDS,
+) -> None:
+    """Prune checkpoints now and then every `interval` seconds, until cancelled."""
+    while True:
+        try:
+            deleted = await prune_checkpoints()
+            if deleted:
+                logger.info(f"Pruned {deleted} old chat checkpoints")
+        except Exception as e:
+            logger.warning(f"Failed to prune chat checkpoints: {str(e)}")
+        await asyncio.sleep(interval)
@@ -51,6 +51,7 @@ async def save_source(state: SourceState) -> dict:
         file_path=getattr(content_state, "file_path", None),
     )
     source.full_text = content_state.content
+    source.compute_text_stats()
     
     # Preserve existing title if none provided in processed content
     if content_state.title:
@@ -1,19 +1,18 @@
-import asyncio
-import sqlite3
 from typing import Annotated, Dict, List, Optional
 
-from ai_prompter import Prompter
 from langchain_core.messages import SystemMessage
 from langchain_core.runnables import RunnableConfig
-from langgraph.checkpoint.sqlite import SqliteSaver
 from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import add_messages
+from langgraph.graph.state import CompiledStateGraph
 from typing_extensions import TypedDict
 
-from open_notebook.config import LANGGRAPH_CHECKPOINT_FILE
 from open_notebook.domain.notebook import Source
+from open_notebook.graphs.checkpoint import compile_graph
 from open_notebook.graphs.utils import provision_langchain_model
+from open_notebook.utils import token_count
 from open_notebook.utils.context_builder import ContextBuilder
+from open_notebook.utils.prompt_templates import render_prompt
 
 
 class SourceChatState(TypedDict):
@@ -25,7 +24,7 @@ class SourceChatState(TypedDict):
     context_indicators: Optional[Dict[str, List[str]]]
 
 
-def call_model_with_source_context(
+async def call_model_with_source_context(
     state: SourceChatState, config: RunnableConfig
 ) -> dict:
     """
@@ -41,34 +40,12 @@ def call_model_with_source_context(
     if not source_id:
         raise ValueError("source_id is required in state")
 
-    # Build source context using ContextBuilder (run async code in new loop)
-    def build_context():
-        """Build context in a new event loop"""
-        new_loop = asyncio.new_event_loop()
-        try:
-            asyncio.set_event_loop(new_loop)
-            context_builder = ContextBuilder(
-                source_id=source_id,
-                max_tokens=50000,  # Reasonable limit for source context
-            )
-            return new_loop.run_until_complete(context_builder.build())
-        finally:
-            new_loop.close()
-            asyncio.set_event_loop(None)
-
-    # Get the built context
-    try:
-        # Try to get the current event loop
-        asyncio.get_running_loop()
-        # If we're in an event loop, run in a thread with a new loop
-        import concurrent.futures
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(build_context)
-            context_data = future.result()
-    except RuntimeError:
-        # No event loop running, safe to create a new one
-        context_data = build_context()
+    # Build source context using ContextBuilder
+    context_builder = ContextBuilder(
+        source_id=source_id,
+        max_tokens=50000,  # Reasonable limit for source context
+    )
+    context_data = await context_builder.build()
 
     # Extract source from context
     source = None
@@ -92,50 +69,24 @@ def call_model_with_source_context(
     }
 
     # Apply the source_chat prompt template
-    system_prompt = Prompter(prompt_template="source_chat").render(data=prompt_data)
+    system_prompt = render_prompt("source_chat", prompt_data)
     payload = [SystemMessage(content=system_prompt)] + state.get("messages", [])
-
-    # Handle async model provisioning from sync context
-    def run_in_new_loop():
-        """Run the async function in a new event loop"""
-        new_loop = asyncio.new_event_loop()
-        try:
-            asyncio.set_event_loop(new_loop)
-            return new_loop.run_until_complete(
-                provision_langchain_model(
-                    str(payload),
-                    config.get("configurable", {}).get("model_id")
-                    or state.get("model_override"),
-                    "chat",
-                    max_tokens=8192,
-                )
-            )
-        finally:
-            new_loop.close()
-            asyncio.set_event_loop(None)
-
-    try:
-        # Try to get the current event loop
-        asyncio.get_running_loop()
-        # If we're in an event loop, run in a thread with a new loop
-        import concurrent.futures
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future = executor.submit(run_in_new_loop)
-            model = future.result()
-    except RuntimeError:
-        # No event loop running, safe to use asyncio.run()
-        model = asyncio.run(
-            provision_langchain_model(
-                str(payload),
-                config.get("configurable", {}).get("model_id")
-                or state.get("model_override"),
-                "chat",
-                max_tokens=8192,
-            )
-        )
-
-    ai_message = model.invoke(payload)
+    # Context size comes from the stored chunk/source token counts; only the
+    # conversation is tokenized (the template itself is a few hundred tokens)
+    content_tokens = (context_data.get("total_tokens") or 0) + token_count(
+        str(state.get("messages", []))
+    )
+
+    model = await provision_langchain_model(
+        str(payload),
+        config.get("configurable", {}).get("model_id")
+        or state.get("model_override"),
+        "chat",
+        content_tokens=content_tokens,
+        max_tokens=8192,
+    )
+
+    ai_message = await model.ainvoke(payload)
 
     # Update state with context information
     return {
@@ -184,16 +135,13 @@ def _format_source_context(context_data: Dict) -> str:
     return "\n".join(context_parts)
 
 
-# Create SQLite checkpointer
-conn = sqlite3.connect(
-    LANGGRAPH_CHECKPOINT_FILE,
-    check_same_thread=False,
-)
-memory = SqliteSaver(conn)
-
 # Create the StateGraph
 source_chat_state = StateGraph(SourceChatState)
 source_chat_state.add_node("source_chat_agent", call_model_with_source_context)
 source_chat_state.add_edge(START, "source_chat_agent")
 source_chat_state.add_edge("source_chat_agent", END)
-source_chat_graph = source_chat_state.compile(checkpointer=memory)
+
+
+def get_source_chat_graph() -> CompiledStateGraph:
+    """The source chat graph, checkpointed for the running event loop."""
+    return compile_graph(source_chat_state)
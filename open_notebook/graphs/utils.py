@@ -1,3 +1,5 @@
+from typing import Optional
+
 from esperanto import LanguageModel
 from langchain_core.language_models.chat_models import BaseChatModel
 from loguru import logger
@@ -7,15 +9,18 @@ from open_notebook.utils import token_count
 
 
 async def provision_langchain_model(
-    content, model_id, default_type, **kwargs
+    content, model_id, default_type, content_tokens: Optional[int] = None, **kwargs
 ) -> BaseChatModel:
     """
     Returns the best model to use based on the context size and on whether there is a specific model being requested in Config.
     If context > 105_000, returns the large_context_model
     If model_id is specified in Config, returns that model
     Otherwise, returns the default model for the given type
+
+    Pass content_tokens when the size is already known (e.g. from stored
+    source token counts) to skip tokenizing the content.
     """
-    tokens = token_count(content)
+    tokens = content_tokens if content_tokens is not None else token_count(content)
 
     if tokens > 105_000:
         logger.debug(
@@ -29,4 +34,4 @@ async def provision_langchain_model(
 
     logger.debug(f"Using model: {model}")
     assert isinstance(model, LanguageModel), f"Model is not a LanguageModel: {model}"
-    return model.to_langchain()
+    return model_manager.to_langchain(model)
@@ -14,6 +14,7 @@ from .text_utils import (
     split_text,
 )
 from .token_utils import token_cost, token_count
+from .version_utils import compare_versions, get_installed_version
 
 __all__ = [
     "split_text",
@@ -23,4 +24,6 @@ __all__ = [
     "clean_thinking_content",
     "token_count",
     "token_cost",
+    "compare_versions",
+    "get_installed_version",
 ]
\ No newline at end of file
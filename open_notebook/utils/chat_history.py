@@ -0,0 +1,118 @@
+"""
+Token-budgeted chat history for Open Notebook.
+
+Each turn sends the model the last CHAT_HISTORY_KEEP_MESSAGES messages
+verbatim (fewer when they exceed CHAT_HISTORY_MAX_TOKENS) and, in place of
+everything older, a rolling summary added to the system prompt. When
+messages leave the window, the summary is extended with them in the
+background and persisted by the caller (on the health chat session, or in
+the chat graph state), so later turns reuse it instead of the full history.
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+from loguru import logger
+
+from .prompt_templates import render_prompt
+from .token_utils import token_count
+
+CHAT_HISTORY_MAX_TOKENS = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "3000"))
+CHAT_HISTORY_KEEP_MESSAGES = int(os.getenv("CHAT_HISTORY_KEEP_MESSAGES", "8"))
+CHAT_HISTORY_SUMMARY_MAX_TOKENS = 1024
+
+_pending_summaries: Dict[str, "asyncio.Task[None]"] = {}
+
+
+def message_text(message: BaseMessage) -> str:
+    content = message.content
+    return content if isinstance(content, str) else str(content)
+
+
+def build_history(
+    messages: List[BaseMessage],
+    max_tokens: int = CHAT_HISTORY_MAX_TOKENS,
+    keep: int = CHAT_HISTORY_KEEP_MESSAGES,
+    count: Callable[[str], int] = token_count,
+) -> Tuple[List[BaseMessage], int]:
+    """
+    The recent messages to send verbatim.
+
+    Takes up to `keep` messages from the end while they fit in `max_tokens`;
+    the last message is always included.
+
+    Returns:
+        Tuple of (recent messages, index of the first of them in `messages`)
+    """
+    start = len(messages)
+    used = 0
+    while start > max(0, len(messages) - keep):
+        tokens = count(message_text(messages[start - 1]))
+        if start < len(messages) and used + tokens > max_tokens:
+            break
+        used += tokens
+        start -= 1
+    return messages[start:], start
+
+
+def summary_section(summary: Optional[str]) -> str:
+    """Text to append to the system prompt for the summarized history."""
+    if not summary:
+        return ""
+    return f"\n\n# EARLIER CONVERSATION (SUMMARY)\n\n{summary}"
+
+
+async def summarize_history(
+    summary: Optional[str], messages: List[BaseMessage]
+) -> str:
+    """Extend a conversation summary with the given messages."""
+    from open_notebook.graphs.utils import provision_langchain_model
+
+    conversation = "\n\n".join(
+        f"{'User' if message.type == 'human' else 'Assistant'}: {message_text(message)}"
+        for message in messages
+    )
+    prompt = render_prompt(
+        "chat_summary", {"summary": summary, "conversation": conversation}
+    )
+    model = await provision_langchain_model(
+        prompt, None, "chat", max_tokens=CHAT_HISTORY_SUMMARY_MAX_TOKENS
+    )
+    response = await model.ainvoke(prompt)
+    return message_text(response).strip()
+
+
+def schedule_summary(
+    key: str,
+    summary: Optional[str],
+    messages: List[BaseMessage],
+    summarized_count: int,
+    persist: Callable[[str, int], Awaitable[None]],
+) -> None:
+    """
+    Summarize messages that left the history window, in the background.
+
+    Args:
+        key: Conversation key; one summary runs per conversation at a time
+        summary: Current summary, extended with `messages`
+        messages: Messages not covered by `summary` yet
+        summarized_count: Messages covered once `messages` are summarized
+        persist: Stores the new summary and summarized_count
+    """
+    pending = _pending_summaries.get(key)
+    if not messages or (pending is not None and not pending.done()):
+        return
+
+    async def run() -> None:
+        try:
+            new_summary = await summarize_history(summary, messages)
+            if new_summary:
+                await persist(new_summary, summarized_count)
+        except Exception as e:
+            logger.warning(f"Failed to summarize chat history for {key}: {str(e)}")
+        finally:
+            _pending_summaries.pop(key, None)
+
+    _pending_summaries[key] = asyncio.get_running_loop().create_task(run())
@@ -0,0 +1,190 @@
+"""
+Chunk-level context assembly for Open Notebook.
+
+Builds prompt context from retrieved source_embedding chunks instead of whole
+documents: each matched chunk is included together with up to
+CONTEXT_NEIGHBOR_CHUNKS chunks on either side (by `order`), best hits first,
+until the token budget is spent. Chunks are then rendered per source in
+document order, with a gap marker between non-adjacent passages.
+
+The budget is spent with the token counts stored on source_embedding rows;
+only chunks stored without one are tokenized.
+"""
+
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from open_notebook.database.repository import ensure_record_id, repo_query
+from open_notebook.domain.notebook import Source
+
+from .token_utils import token_count
+
+CONTEXT_NEIGHBOR_CHUNKS = int(os.getenv("CONTEXT_NEIGHBOR_CHUNKS", "1"))
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "4000"))
+
+ChunkKey = Tuple[str, int]
+
+
+def neighbor_orders(order: int, neighbors: int) -> List[int]:
+    """The matched order followed by its neighbours, closest first."""
+    orders = [order]
+    for distance in range(1, neighbors + 1):
+        orders.extend([order - distance, order + distance])
+    return [o for o in orders if o >= 0]
+
+
+def select_chunks(
+    hits: List[Dict[str, Any]],
+    chunks: Dict[ChunkKey, str],
+    neighbors: int,
+    max_tokens: int,
+    count: Callable[[str], int] = token_count,
+    token_counts: Optional[Dict[ChunkKey, int]] = None,
+) -> Dict[str, Dict[int, str]]:
+    """
+    Pick chunks for the context within a token budget.
+
+    Args:
+        hits: Retrieved chunks (id, order), best first
+        chunks: Available chunk texts by (source id, order), hits included
+        neighbors: Neighbouring chunks to add on each side of a hit
+        max_tokens: Budget for the selected chunk texts
+        count: Token counter, for chunks missing from `token_counts`
+        token_counts: Stored token counts by (source id, order)
+
+    Returns:
+        {source_id: {order: content}} of the selected chunks
+    """
+    selected: Dict[str, Dict[int, str]] = {}
+    used = 0
+    for hit in hits:
+        source_id = str(hit["id"])
+        for order in neighbor_orders(int(hit.get("order") or 0), neighbors):
+            content = chunks.get((source_id, order))
+            if content is None or order in selected.get(source_id, {}):
+                continue
+            tokens = (token_counts or {}).get((source_id, order))
+            if tokens is None:
+                tokens = count(content)
+            if used + tokens > max_tokens:
+                continue
+            selected.setdefault(source_id, {})[order] = content
+            used += tokens
+    return selected
+
+
+def render_passages(chunks: Dict[int, str]) -> str:
+    """Join chunks in document order, marking gaps between non-adjacent ones."""
+    parts: List[str] = []
+    previous: Optional[int] = None
+    for order in sorted(chunks):
+        if previous is not None and order != previous + 1:
+            parts.append("[...]")
+        parts.append(chunks[order].strip())
+        previous = order
+    return "\n\n".join(parts)
+
+
+async def fetch_chunks(
+    hits: List[Dict[str, Any]], neighbors: int
+) -> Tuple[Dict[ChunkKey, str], Dict[ChunkKey, int]]:
+    """
+    Texts of the hit chunks and their neighbours, in one query.
+
+    Returns:
+        Tuple of (texts, stored token counts) by (source id, order)
+    """
+    chunks: Dict[ChunkKey, str] = {}
+    token_counts: Dict[ChunkKey, int] = {}
+    for hit in hits:
+        key = (str(hit["id"]), int(hit.get("order") or 0))
+        chunks[key] = hit.get("content") or ""
+        if hit.get("token_count") is not None:
+            token_counts[key] = int(hit["token_count"])
+    if neighbors <= 0:
+        return chunks, token_counts
+
+    wanted = {
+        (str(hit["id"]), order)
+        for hit in hits
+        for order in neighbor_orders(int(hit.get("order") or 0), neighbors)
+    } - set(chunks)
+    if not wanted:
+        return chunks, token_counts
+
+    rows = await repo_query(
+        """
+        SELECT source AS id, order, content, token_count FROM source_embedding
+        WHERE source IN $source_ids AND order IN $orders
+        """,
+        {
+            "source_ids": [ensure_record_id(sid) for sid in {sid for sid, _ in wanted}],
+            "orders": sorted({order for _, order in wanted}),
+        },
+    )
+    for row in rows:
+        key = (str(row["id"]), int(row.get("order") or 0))
+        if key in wanted:
+            chunks[key] = row.get("content") or ""
+            if row.get("token_count") is not None:
+                token_counts[key] = int(row["token_count"])
+    return chunks, token_counts
+
+
+async def assemble_chunk_context(
+    hits: List[Dict[str, Any]],
+    neighbors: int = CONTEXT_NEIGHBOR_CHUNKS,
+    max_tokens: int = CONTEXT_MAX_TOKENS,
+    max_sources: Optional[int] = None,
+) -> Tuple[str, List[str]]:
+    """
+    Build a context string from retrieved chunks.
+
+    Sources excluded from chat (chat_include == "off") are skipped.
+
+    Returns:
+        Tuple of (context string, list of "source:<id>" references included)
+    """
+    source_order: List[str] = []
+    for hit in hits:
+        if hit.get("id") and str(hit["id"]) not in source_order:
+            source_order.append(str(hit["id"]))
+    if not source_order:
+        return "", []
+
+    sources = {
+        source.id: source
+        for source in await Source.get_many(
+            source_order, fields=["title", "chat_include"]
+        )
+        if (source.chat_include or "full") != "off"
+    }
+    allowed = [sid for sid in source_order if sid in sources][:max_sources]
+    hits = [hit for hit in hits if str(hit.get("id")) in allowed]
+
+    chunks, token_counts = await fetch_chunks(hits, neighbors)
+    selected = select_chunks(
+        hits, chunks, neighbors, max_tokens, token_counts=token_counts
+    )
+
+    context_parts: List[str] = []
+    available_ids: List[str] = []
+    for source_id in allowed:
+        if source_id not in selected:
+            continue
+        source_id_clean = source_id.split(":")[-1]
+        source_ref_id = f"source:{source_id_clean}"
+        context_parts.append(
+            f"=== {source_ref_id} ===\n"
+            f"Title: {sources[source_id].title or 'No title'}\n"
+            f"\nRelevant Content:\n{render_passages(selected[source_id])}\n"
+        )
+        available_ids.append(source_ref_id)
+
+    logger.debug(
+        f"Assembled context from {sum(len(c) for c in selected.values())} chunks "
+        f"of {len(available_ids)} sources"
+    )
+    return "\n\n".join(context_parts), available_ids
@@ -7,31 +7,99 @@ and build context from sources and notebooks.
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, List, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
 from loguru import logger
 
+from open_notebook.database.repository import ensure_record_id, repo_query
 from open_notebook.domain.notebook import Notebook, Source
 from open_notebook.exceptions import DatabaseOperationError, NotFoundError
 
 from .text_utils import token_count
 
 
+def _text_prefix(full_text: str, chunks: List[str]) -> str:
+    """
+    Text of `full_text` up to the end of the last of `chunks`.
+
+    Chunks come from split_text, so they are overlapping substrings of the
+    full text in order; falls back to joining them if one cannot be located.
+    """
+    start = end = 0
+    for chunk in chunks:
+        position = full_text.find(chunk, start)
+        if position < 0:
+            return "\n\n".join(chunks)
+        start = position + 1
+        end = position + len(chunk)
+    return full_text[:end]
+
+
 @dataclass
 class ContextItem:
-    """Represents a single item in the context."""
+    """
+    Represents a single item in the context.
+
+    Items built from embedded sources carry their chunks and per-chunk token
+    counts, which lets truncate_to_fit trim them at chunk boundaries instead
+    of dropping them whole.
+    """
     
     id: str
     type: Literal["source"]
     content: Dict[str, Any]
     priority: int = 0
     token_count: Optional[int] = None
+    chunks: Optional[List[str]] = None
+    chunk_token_counts: Optional[List[int]] = None
     
     def __post_init__(self):
-        """Calculate token count for the content if not provided."""
+        """Calculate token counts for the content if not provided."""
+        if self.chunks is not None and self.chunk_token_counts is None:
+            self.chunk_token_counts = [token_count(chunk) for chunk in self.chunks]
         if self.token_count is None:
-            content_str = str(self.content)
-            self.token_count = token_count(content_str)
+            if self.chunk_token_counts:
+                # Chunk counts cover full_text (slightly over, due to overlap)
+                other = {k: v for k, v in self.content.items() if k != "full_text"}
+                self.token_count = sum(self.chunk_token_counts) + token_count(
+                    self._text(other)
+                )
+            else:
+                self.token_count = token_count(self._text(self.content))
+
+    @staticmethod
+    def _text(content: Dict[str, Any]) -> str:
+        return "\n".join(str(value) for value in content.values() if value)
+
+    def trim(self, max_tokens: int) -> bool:
+        """
+        Keep the longest prefix of chunks that fits in `max_tokens`.
+
+        Returns:
+            False if the item has no chunks or not even its first chunk fits
+        """
+        if not self.chunks or not self.chunk_token_counts:
+            return False
+        overhead = (self.token_count or 0) - sum(self.chunk_token_counts)
+        used = overhead
+        keep = 0
+        for count in self.chunk_token_counts:
+            if used + count > max_tokens:
+                break
+            used += count
+            keep += 1
+        if keep == 0:
+            return False
+
+        full_text = self.content.get("full_text") or ""
+        self.content = {
+            **self.content,
+            "full_text": _text_prefix(full_text, self.chunks[:keep]),
+        }
+        self.chunks = self.chunks[:keep]
+        self.chunk_token_counts = self.chunk_token_counts[:keep]
+        self.token_count = used
+        return True
 
 
 @dataclass
@@ -158,13 +226,26 @@ class ContextBuilder:
             context_size: Literal["short", "long"] = "long" if "full content" in inclusion_level else "short"
             source_context = await source.get_context(context_size=context_size)
 
+            chunks: Optional[List[str]] = None
+            chunk_token_counts: Optional[List[int]] = None
+            if context_size == "long" and source.id and source_context.get("full_text"):
+                chunks, chunk_token_counts = await self._get_source_chunks(source.id)
+
+            # Stored count of the full text, used when the source has no chunks
+            item_tokens: Optional[int] = None
+            if context_size == "long" and chunks is None and source.token_count is not None:
+                item_tokens = source.token_count + token_count(source.title or "")
+
             # Add source item
             priority = (self.context_config.priority_weights or {}).get("source", 100)
             item = ContextItem(
                 id=source.id or "",
                 type="source",
                 content=source_context,
-                priority=priority
+                priority=priority,
+                token_count=item_tokens,
+                chunks=chunks,
+                chunk_token_counts=chunk_token_counts,
             )
             self.add_item(item)
             
@@ -176,6 +257,37 @@ class ContextBuilder:
             logger.error(f"Error adding source context for {source_id}: {str(e)}")
             raise
     
+    async def _get_source_chunks(
+        self, source_id: str
+    ) -> Tuple[Optional[List[str]], Optional[List[int]]]:
+        """
+        Embedded chunks of a source in order, with their token counts.
+
+        Uses the token counts stored with the chunks at vectorization time and
+        only counts chunks that have none.
+        """
+        try:
+            rows = await repo_query(
+                """
+                SELECT order, content, token_count FROM source_embedding
+                WHERE source = $id ORDER BY order
+                """,
+                {"id": ensure_record_id(source_id)},
+            )
+        except Exception as e:
+            logger.warning(f"Could not load chunks for {source_id}: {str(e)}")
+            return None, None
+        if not rows:
+            return None, None
+        chunks = [row.get("content") or "" for row in rows]
+        counts = [
+            row.get("token_count")
+            if isinstance(row.get("token_count"), int)
+            else token_count(chunk)
+            for row, chunk in zip(rows, chunks)
+        ]
+        return chunks, counts
+
     async def _add_notebook_context(self, notebook_id: str) -> None:
         """
         Add notebook content based on context configuration.
@@ -232,7 +344,13 @@ class ContextBuilder:
     
     def truncate_to_fit(self, max_tokens: int) -> None:
         """
-        Remove items if total token count exceeds limit.
+        Fit the items into the token budget, keeping the most priority-weighted
+        content.
+
+        Items are taken in priority order. An item that does not fit whole is
+        trimmed to the chunks that fit, and lower-priority items still fill the
+        remaining space, so a single oversized item no longer evicts
+        everything behind it. Items without chunks are kept or dropped whole.
         
         Args:
             max_tokens: Maximum allowed tokens
@@ -248,16 +366,27 @@ class ContextBuilder:
         
         logger.info(f"Truncating from {total_tokens} to {max_tokens} tokens")
         
-        # Remove items from the end (lowest priority) until under limit
-        current_tokens = total_tokens
-        removed_count = 0
+        remaining = max_tokens
+        kept_ids = set()
+        trimmed_count = 0
+        for item in sorted(self.items, key=lambda x: x.priority, reverse=True):
+            tokens = item.token_count or 0
+            if tokens <= remaining:
+                remaining -= tokens
+            elif item.trim(remaining):
+                remaining -= item.token_count or 0
+                trimmed_count += 1
+            else:
+                continue
+            kept_ids.add(id(item))
         
-        while current_tokens > max_tokens and self.items:
-            removed_item = self.items.pop()
-            current_tokens -= (removed_item.token_count or 0)
-            removed_count += 1
+        removed_count = len(self.items) - len(kept_ids)
+        self.items = [item for item in self.items if id(item) in kept_ids]
         
-        logger.info(f"Removed {removed_count} items, final token count: {current_tokens}")
+        logger.info(
+            f"Removed {removed_count} items, trimmed {trimmed_count}, "
+            f"final token count: {max_tokens - remaining}"
+        )
     
     def remove_duplicates(self) -> None:
         """Remove duplicate items based on ID."""
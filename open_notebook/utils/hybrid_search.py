@@ -0,0 +1,204 @@
+"""
+Hybrid retrieval for Open Notebook.
+
+Runs a BM25 query on the source_embedding chunk index (idx_source_embed_chunk)
+and a vector query concurrently, then fuses the two rankings with reciprocal
+rank fusion (RRF). Hits are chunk-level: one row per (source, order) with the
+fused score and the score from each retriever.
+
+On large notebooks a keyword prefilter first narrows the vector candidate set
+to the sources whose full text matches the query terms (idx_source_full_text),
+so the vector leg scores far fewer chunks.
+"""
+
+import asyncio
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from open_notebook.database.repository import ensure_record_id, repo_query
+from open_notebook.utils.vector_index import get_notebook_source_ids, knn_search
+
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+# Hits pulled from each retriever before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "30"))
+# Notebooks with more sources than this get the keyword prefilter
+HYBRID_PREFILTER_MIN_SOURCES = int(os.getenv("HYBRID_PREFILTER_MIN_SOURCES", "50"))
+HYBRID_MAX_TERMS = int(os.getenv("HYBRID_MAX_TERMS", "20"))
+
+
+def search_terms(query_text: str, max_terms: int = HYBRID_MAX_TERMS) -> List[str]:
+    """Distinct lowercase words of a query, in order, ignoring very short ones."""
+    terms: List[str] = []
+    for word in re.findall(r"\w+", query_text.lower()):
+        if len(word) >= 3 and word not in terms:
+            terms.append(word)
+    return terms[:max_terms]
+
+
+def _match_any(field: str, terms: List[str]) -> Tuple[str, str, Dict[str, str]]:
+    """
+    Full-text condition matching any of the terms, with its summed BM25 score.
+
+    The matches operator requires every term of a single query string, so each
+    term gets its own @n@ reference to get OR semantics.
+    """
+    condition = " OR ".join(f"{field} @{i}@ $term{i}" for i in range(1, len(terms) + 1))
+    score = " + ".join(f"(search::score({i}) ?? 0)" for i in range(1, len(terms) + 1))
+    params = {f"term{i}": term for i, term in enumerate(terms, start=1)}
+    return condition, score, params
+
+
+def chunk_key(hit: Dict[str, Any]) -> Tuple[str, int]:
+    return str(hit.get("id")), int(hit.get("order") or 0)
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[List[Dict[str, Any]]], k: int = HYBRID_RRF_K
+) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked hit lists: score(chunk) = sum over lists of 1 / (k + rank).
+
+    Returns:
+        Unique hits (first occurrence wins for the payload) with a `score`
+        field, best first
+    """
+    fused: Dict[Tuple[str, int], Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            key = chunk_key(hit)
+            entry = fused.setdefault(key, {**hit, "score": 0.0})
+            for field, value in hit.items():
+                entry.setdefault(field, value)
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda hit: hit["score"], reverse=True)
+
+
+async def bm25_search(
+    query_text: str,
+    source_ids: Optional[List[Any]] = None,
+    limit: int = HYBRID_CANDIDATES,
+) -> List[Dict[str, Any]]:
+    """BM25 ranking of source_embedding chunks matching any query term."""
+    terms = search_terms(query_text)
+    if not terms:
+        return []
+    condition, score, params = _match_any("content", terms)
+    return await repo_query(
+        f"""
+        SELECT source AS id, order, content, token_count, {score} AS bm25_score
+        FROM source_embedding
+        WHERE ({condition})
+            AND ($source_ids = NONE OR source IN $source_ids)
+        ORDER BY bm25_score DESC
+        LIMIT $limit
+        """,
+        {
+            **params,
+            "source_ids": (
+                [ensure_record_id(sid) for sid in source_ids]
+                if source_ids is not None
+                else None
+            ),
+            "limit": limit,
+        },
+    )
+
+
+async def keyword_prefilter(query_text: str, source_ids: List[Any]) -> List[Any]:
+    """Sources among `source_ids` whose full text matches any query term."""
+    terms = search_terms(query_text)
+    if not terms or not source_ids:
+        return []
+    condition, _, params = _match_any("full_text", terms)
+    return await repo_query(
+        f"SELECT VALUE id FROM source WHERE ({condition}) AND id IN $source_ids",
+        {**params, "source_ids": [ensure_record_id(sid) for sid in source_ids]},
+    )
+
+
+async def hybrid_search(
+    query_text: str,
+    query_embedding: Optional[List[float]],
+    notebook_id: Optional[str] = None,
+    limit: int = 8,
+    min_similarity: float = 0.0,
+    candidates: int = HYBRID_CANDIDATES,
+    prefilter: Optional[bool] = None,
+    source_ids: Optional[List[Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Chunk-level hybrid search over source_embedding.
+
+    Args:
+        query_text: Text for the BM25 leg (and the keyword prefilter)
+        query_embedding: Embedding for the vector leg; BM25 only if None
+        notebook_id: Restrict to the notebook's sources
+        limit: Number of fused hits to return
+        min_similarity: Cosine threshold for the vector leg
+        candidates: Hits pulled from each leg before fusion
+        prefilter: Force the keyword prefilter on/off; by default it is used
+            for notebooks with more than HYBRID_PREFILTER_MIN_SOURCES sources
+        source_ids: Restrict to these sources (intersected with the notebook's)
+
+    Returns:
+        Rows with id (source id), order, content, score (RRF), similarity and
+        bm25_score (None when the chunk was not returned by that leg)
+    """
+    vector_scope: Optional[List[Any]] = None
+    if source_ids is not None:
+        source_ids = [str(sid) for sid in source_ids]
+        vector_scope = source_ids
+    if notebook_id:
+        notebook_sources = [str(sid) for sid in await get_notebook_source_ids(notebook_id)]
+        if source_ids is not None:
+            in_notebook = set(notebook_sources)
+            source_ids = [sid for sid in source_ids if sid in in_notebook]
+            vector_scope = source_ids
+        else:
+            source_ids = notebook_sources
+    if source_ids is not None and not source_ids:
+        return []
+
+    if source_ids is not None and query_embedding:
+        if prefilter is None:
+            prefilter = len(source_ids) > HYBRID_PREFILTER_MIN_SOURCES
+        if prefilter:
+            try:
+                vector_scope = (
+                    await keyword_prefilter(query_text, source_ids) or vector_scope
+                )
+            except Exception as e:
+                logger.warning(f"Keyword prefilter failed, searching all sources: {e}")
+
+    async def vector_leg() -> List[Dict[str, Any]]:
+        if not query_embedding:
+            return []
+        return await knn_search(
+            query_embedding,
+            notebook_id=notebook_id,
+            limit=candidates,
+            min_similarity=min_similarity,
+            source_ids=vector_scope,
+        )
+
+    vector_hits, bm25_hits = await asyncio.gather(
+        vector_leg(),
+        bm25_search(query_text, source_ids, candidates),
+        return_exceptions=True,
+    )
+    rankings = []
+    for name, hits in (("vector", vector_hits), ("bm25", bm25_hits)):
+        if isinstance(hits, BaseException):
+            logger.warning(f"Hybrid search {name} leg failed: {hits}")
+            continue
+        rankings.append(hits)
+
+    fused = reciprocal_rank_fusion(rankings)
+    for hit in fused:
+        hit["id"] = str(hit["id"])
+        hit.setdefault("similarity", None)
+        hit.setdefault("bm25_score", None)
+    return fused[:limit]
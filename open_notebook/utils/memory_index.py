@@ -0,0 +1,268 @@
+"""
+In-process vector index for Open Notebook.
+
+Optional retrieval accelerator (MEMORY_VECTOR_INDEX=true): source_embedding
+vectors of a notebook are loaded once into a contiguous float32 matrix whose
+rows are L2-normalized, so cosine similarity becomes a single matrix-vector
+product and top-k is an argpartition. Small, hot notebooks (like the health
+guideline notebook) are then searched without touching the database.
+
+Freshness:
+- Sources deleted through the API are dropped right away (remove_source()).
+- Embeddings are written by the commands worker, so every
+  MEMORY_INDEX_REFRESH_SECONDS the index compares each source's chunk count
+  and latest chunk write time (source_embedding.updated) with the loaded
+  version, and reloads the sources that changed in one batch. A full reload
+  happens after MEMORY_INDEX_MAX_AGE_SECONDS.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from loguru import logger
+
+from open_notebook.database.repository import ensure_record_id, repo_query
+
+MEMORY_VECTOR_INDEX = os.getenv("MEMORY_VECTOR_INDEX", "false").lower() == "true"
+MEMORY_INDEX_MAX_NOTEBOOKS = int(os.getenv("MEMORY_INDEX_MAX_NOTEBOOKS", "8"))
+MEMORY_INDEX_REFRESH_SECONDS = float(os.getenv("MEMORY_INDEX_REFRESH_SECONDS", "30"))
+MEMORY_INDEX_MAX_AGE_SECONDS = float(os.getenv("MEMORY_INDEX_MAX_AGE_SECONDS", "600"))
+
+# Per-source (chunk count, latest chunk write time)
+SourceVersion = Tuple[int, str]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+@dataclass
+class NotebookIndex:
+    """Normalized embedding matrix and row metadata for one notebook."""
+
+    notebook_id: str
+    matrix: np.ndarray = field(default_factory=lambda: np.zeros((0, 0), np.float32))
+    source_ids: List[str] = field(default_factory=list)
+    orders: List[int] = field(default_factory=list)
+    contents: List[str] = field(default_factory=list)
+    # Stored token counts of the chunks (None for rows stored without one)
+    token_counts: List[Optional[int]] = field(default_factory=list)
+    # Versions of the loaded sources, by source id
+    versions: Dict[str, SourceVersion] = field(default_factory=dict)
+    loaded_at: float = field(default_factory=time.monotonic)
+    checked_at: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    def from_rows(cls, notebook_id: str, rows: List[Dict[str, Any]]) -> "NotebookIndex":
+        index = cls(notebook_id=notebook_id)
+        index.replace_sources(set(), rows)
+        return index
+
+    @property
+    def dimension(self) -> int:
+        return self.matrix.shape[1] if self.matrix.ndim == 2 else 0
+
+    def chunk_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for source_id in self.source_ids:
+            counts[source_id] = counts.get(source_id, 0) + 1
+        return counts
+
+    def replace_sources(self, source_ids: set, rows: List[Dict[str, Any]]) -> None:
+        """Drop all rows of `source_ids`, then append `rows`."""
+        keep = [i for i, sid in enumerate(self.source_ids) if sid not in source_ids]
+        rows = [row for row in rows if row.get("embedding")]
+        if rows:
+            dimension = len(rows[0]["embedding"])
+            rows = [row for row in rows if len(row["embedding"]) == dimension]
+            if self.dimension and self.dimension != dimension:
+                keep = []  # Embedding model changed: old rows are unusable
+        new_matrix = (
+            _normalize(np.asarray([row["embedding"] for row in rows], dtype=np.float32))
+            if rows
+            else None
+        )
+
+        parts = [self.matrix[keep]] if keep else []
+        if new_matrix is not None:
+            parts.append(new_matrix)
+        self.matrix = (
+            np.ascontiguousarray(np.vstack(parts))
+            if parts
+            else np.zeros((0, 0), np.float32)
+        )
+        self.source_ids = [self.source_ids[i] for i in keep] + [
+            str(row["id"]) for row in rows
+        ]
+        self.orders = [self.orders[i] for i in keep] + [
+            int(row.get("order") or 0) for row in rows
+        ]
+        self.contents = [self.contents[i] for i in keep] + [
+            row.get("content") or "" for row in rows
+        ]
+        self.token_counts = [self.token_counts[i] for i in keep] + [
+            row.get("token_count") for row in rows
+        ]
+
+    def search(
+        self,
+        query_embedding: List[float],
+        limit: int,
+        min_similarity: float = 0.0,
+        source_ids: Optional[Set[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Top-k rows by cosine similarity, best first, optionally restricted to `source_ids`."""
+        if not self.source_ids or len(query_embedding) != self.dimension:
+            return []
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        scores = self.matrix @ query
+        if source_ids is not None:
+            allowed = np.fromiter(
+                (sid in source_ids for sid in self.source_ids),
+                dtype=bool,
+                count=len(self.source_ids),
+            )
+            scores = np.where(allowed, scores, -np.inf)
+        if limit < len(scores):
+            top = np.argpartition(-scores, limit)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [
+            {
+                "id": self.source_ids[i],
+                "content": self.contents[i],
+                "order": self.orders[i],
+                "token_count": self.token_counts[i],
+                "similarity": float(scores[i]),
+            }
+            for i in top
+            if np.isfinite(scores[i]) and scores[i] >= min_similarity
+        ]
+
+
+class MemoryVectorIndex:
+    """Per-notebook cache of NotebookIndex objects with LRU eviction."""
+
+    def __init__(self, enabled: bool = MEMORY_VECTOR_INDEX):
+        self.enabled = enabled
+        self._indexes: "OrderedDict[str, NotebookIndex]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def _fetch_rows(self, source_ids: List[Any]) -> List[Dict[str, Any]]:
+        if not source_ids:
+            return []
+        return await repo_query(
+            """
+            SELECT source AS id, order, content, embedding, token_count
+            FROM source_embedding
+            WHERE source IN $source_ids AND embedding != NONE
+            """,
+            {"source_ids": [ensure_record_id(sid) for sid in source_ids]},
+        )
+
+    async def _source_versions(self, notebook_id: str) -> Dict[str, SourceVersion]:
+        source_ids = await repo_query(
+            "SELECT VALUE in FROM reference WHERE out = $notebook_id",
+            {"notebook_id": ensure_record_id(notebook_id)},
+        )
+        if not source_ids:
+            return {}
+        rows = await repo_query(
+            """
+            SELECT source, count() AS chunks, array::max(updated) AS updated
+            FROM source_embedding
+            WHERE source IN $source_ids
+            GROUP BY source
+            """,
+            {"source_ids": [ensure_record_id(sid) for sid in source_ids]},
+        )
+        return {
+            str(row["source"]): (row["chunks"], str(row.get("updated")))
+            for row in rows
+        }
+
+    async def _load(self, notebook_id: str) -> NotebookIndex:
+        versions = await self._source_versions(notebook_id)
+        rows = await self._fetch_rows(list(versions.keys()))
+        index = NotebookIndex.from_rows(notebook_id, rows)
+        index.versions = versions
+        logger.debug(
+            f"Loaded in-memory vector index for {notebook_id}: "
+            f"{len(index.source_ids)} chunks, dimension {index.dimension}"
+        )
+        return index
+
+    async def _refresh(self, index: NotebookIndex) -> None:
+        """Reload only the sources whose chunks were added, removed or rewritten."""
+        versions = await self._source_versions(index.notebook_id)
+        changed = {
+            sid
+            for sid in set(versions) | set(index.versions)
+            if versions.get(sid) != index.versions.get(sid)
+        }
+        if changed:
+            rows = await self._fetch_rows([sid for sid in changed if sid in versions])
+            index.replace_sources(changed, rows)
+            logger.debug(
+                f"Refreshed {len(changed)} sources in vector index for {index.notebook_id}"
+            )
+        index.versions = versions
+        index.checked_at = time.monotonic()
+
+    async def get(self, notebook_id: str) -> NotebookIndex:
+        """Return a fresh index for the notebook, loading or refreshing as needed."""
+        lock = self._locks.setdefault(notebook_id, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            index = self._indexes.get(notebook_id)
+            if index is None or now - index.loaded_at > MEMORY_INDEX_MAX_AGE_SECONDS:
+                index = await self._load(notebook_id)
+            elif now - index.checked_at > MEMORY_INDEX_REFRESH_SECONDS:
+                await self._refresh(index)
+
+            self._indexes[notebook_id] = index
+            self._indexes.move_to_end(notebook_id)
+            while len(self._indexes) > MEMORY_INDEX_MAX_NOTEBOOKS:
+                evicted, _ = self._indexes.popitem(last=False)
+                self._locks.pop(evicted, None)
+            return index
+
+    async def search(
+        self,
+        notebook_id: str,
+        query_embedding: List[float],
+        limit: int = 8,
+        min_similarity: float = 0.0,
+        source_ids: Optional[List[Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        index = await self.get(notebook_id)
+        if index.source_ids and len(query_embedding) != index.dimension:
+            # Embeddings were rebuilt with another model since the last load
+            self.invalidate(notebook_id)
+            index = await self.get(notebook_id)
+        allowed = {str(sid) for sid in source_ids} if source_ids is not None else None
+        return index.search(query_embedding, limit, min_similarity, allowed)
+
+    def remove_source(self, source_id: str) -> None:
+        """Drop a deleted source from every loaded index."""
+        for index in self._indexes.values():
+            if source_id in index.source_ids:
+                index.replace_sources({source_id}, [])
+            index.versions.pop(source_id, None)
+
+    def invalidate(self, notebook_id: Optional[str] = None) -> None:
+        if notebook_id is None:
+            self._indexes.clear()
+        else:
+            self._indexes.pop(notebook_id, None)
+
+
+memory_vector_index = MemoryVectorIndex()
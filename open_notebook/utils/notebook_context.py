@@ -0,0 +1,282 @@
+"""
+Notebook context for the health assistant.
+
+build_notebook_context() runs retrieval (hybrid search plus chunk assembly)
+over a notebook. get_notebook_context() serves the result from materialized
+snapshots instead: one ContextSnapshot per (notebook, retrieval config),
+valid while the notebook's `updated` timestamp is unchanged. When the
+notebook's sources change, Notebook.update_timestamp schedules a background
+rebuild, so the request path reads a ready-made string.
+
+Snapshots are only stored when retrieval found matching chunks. The
+"latest sources" fallback (e.g. while embeddings are still being generated
+by the worker) is always rebuilt per request. Snapshots older than
+CONTEXT_SNAPSHOT_MAX_AGE_SECONDS are served once more while a background
+refresh runs, which picks up changes that do not bump the notebook.
+"""
+
+import asyncio
+import os
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from open_notebook.domain.context_snapshot import ContextSnapshot, config_hash
+from open_notebook.domain.notebook import Notebook, Source
+from open_notebook.utils.chunk_context import (
+    CONTEXT_MAX_TOKENS,
+    CONTEXT_NEIGHBOR_CHUNKS,
+    assemble_chunk_context,
+)
+from open_notebook.utils.hybrid_search import search_terms
+from open_notebook.utils.retrieval_cache import (
+    TTLCache,
+    cached_hybrid_search,
+    get_query_embedding,
+)
+
+CONTEXT_SNAPSHOTS = os.getenv("CONTEXT_SNAPSHOTS", "true").lower() == "true"
+CONTEXT_SNAPSHOT_MAX_AGE_SECONDS = float(
+    os.getenv("CONTEXT_SNAPSHOT_MAX_AGE_SECONDS", "900")
+)
+CONTEXT_SNAPSHOT_REFRESH_DELAY_SECONDS = float(
+    os.getenv("CONTEXT_SNAPSHOT_REFRESH_DELAY_SECONDS", "5")
+)
+CHAT_CONTEXT_MIN_COVERAGE = float(os.getenv("CHAT_CONTEXT_MIN_COVERAGE", "0.6"))
+
+MAX_SOURCE_CONTEXT_CHARS = 8000
+RETRIEVAL_LIMIT = 8
+RETRIEVAL_MIN_SIMILARITY = 0.4
+MAX_CONTEXT_SOURCES = 5
+
+# In-process copies of the stored snapshots, by (notebook id, config hash)
+_snapshots = TTLCache(64)
+_pending_refreshes: Dict[str, "asyncio.Task[None]"] = {}
+
+
+def retrieval_config(query_text: str) -> Dict[str, Any]:
+    """Everything that shapes the context built for a query."""
+    return {
+        "query_text": query_text,
+        "limit": RETRIEVAL_LIMIT,
+        "min_similarity": RETRIEVAL_MIN_SIMILARITY,
+        "max_sources": MAX_CONTEXT_SOURCES,
+        "neighbors": CONTEXT_NEIGHBOR_CHUNKS,
+        "max_tokens": CONTEXT_MAX_TOKENS,
+    }
+
+
+def context_covers(
+    message: str, context: str, min_coverage: float = CHAT_CONTEXT_MIN_COVERAGE
+) -> bool:
+    """
+    Cheap check whether a context already covers a chat message: the share of
+    the message's words (4+ letters, to skip most function words) that appear
+    in the context. Messages without such words are always covered.
+    """
+    terms = [term for term in search_terms(message) if len(term) >= 4]
+    if not terms:
+        return True
+    words = set(re.findall(r"\w+", context.lower()))
+    covered = sum(1 for term in terms if term in words)
+    return covered / len(terms) >= min_coverage
+
+
+async def fetch_context_sources(source_ids: List[str], max_sources: int) -> List[Source]:
+    """Fetch candidate sources in one query, skipping those excluded from chat."""
+    try:
+        sources = await Source.get_many(
+            source_ids,
+            fields=["title", "chat_include", "full_text"],
+            # One extra character tells whether the text had to be truncated
+            full_text_limit=MAX_SOURCE_CONTEXT_CHARS + 1,
+        )
+    except Exception:
+        return []
+    return [
+        source for source in sources if (source.chat_include or "full") != "off"
+    ][:max_sources]
+
+
+async def build_notebook_context(
+    notebook: Notebook, query_text: Optional[str] = None
+) -> Tuple[str, List[str], bool]:
+    """
+    Build the context string from the notebook chunks matching the query, or
+    from the beginning of the latest sources when nothing matches.
+
+    Returns:
+        Tuple of (context string, "source:<id>" references, whether the
+        context came from retrieval)
+    """
+    if query_text:
+        try:
+            try:
+                query_embedding = await get_query_embedding(query_text)
+            except Exception:
+                query_embedding = None  # Keyword-only retrieval
+
+            results = await cached_hybrid_search(
+                query_text,
+                query_embedding,
+                notebook_id=str(notebook.id),
+                version=notebook.updated,
+                limit=RETRIEVAL_LIMIT,
+                min_similarity=RETRIEVAL_MIN_SIMILARITY,
+            )
+            if results:
+                context_str, available_ids = await assemble_chunk_context(
+                    results, max_sources=MAX_CONTEXT_SOURCES
+                )
+                if context_str:
+                    return context_str, available_ids, True
+        except Exception as e:
+            logger.warning(f"Retrieval failed for notebook {notebook.id}: {str(e)}")
+
+    # No matching chunks: fall back to the beginning of the latest sources
+    context_parts = []
+    available_ids = []
+    sources = await notebook.get_sources()
+    sources_to_include = await fetch_context_sources(
+        [source.id for source in sources[:MAX_CONTEXT_SOURCES] if source.id],
+        MAX_CONTEXT_SOURCES,
+    )
+
+    for source in sources_to_include:
+        source_id = str(source.id)
+        source_ref_id = f"source:{source_id.split(':')[-1]}"
+
+        context_text = f"=== {source_ref_id} ===\n"
+        context_text += f"Title: {source.title or 'No title'}\n"
+
+        available_ids.append(source_ref_id)
+        full_text = source.full_text or ""
+        if full_text:
+            truncated = len(full_text) > MAX_SOURCE_CONTEXT_CHARS
+            context_text += f"\nFull Content: {full_text[:MAX_SOURCE_CONTEXT_CHARS]}{'...' if truncated else ''}\n"
+
+        context_parts.append(context_text)
+
+    return "\n\n".join(context_parts), available_ids, False
+
+
+def _snapshot_age(snapshot: ContextSnapshot) -> float:
+    if not snapshot.updated:
+        return 0.0
+    updated = snapshot.updated
+    if updated.tzinfo is None:
+        updated = updated.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - updated).total_seconds()
+
+
+async def _store_snapshot(
+    notebook: Notebook, config: Dict[str, Any], context: str, available_ids: List[str]
+) -> None:
+    snapshot = ContextSnapshot(
+        notebook_id=str(notebook.id),
+        notebook_updated=str(notebook.updated),
+        config_hash=config_hash(config),
+        config=config,
+        context=context,
+        available_ids=available_ids,
+        updated=datetime.now(timezone.utc),
+    )
+    try:
+        await snapshot.store()
+    except Exception as e:
+        logger.warning(f"Failed to store context snapshot for {notebook.id}: {str(e)}")
+    _snapshots.set((snapshot.notebook_id, snapshot.config_hash), snapshot)
+
+
+async def get_notebook_context(
+    notebook: Notebook, query_text: Optional[str] = None
+) -> Tuple[str, List[str]]:
+    """
+    Context string and references for a notebook, served from its snapshot
+    when one matches the notebook's current version.
+    """
+    if not query_text or not CONTEXT_SNAPSHOTS:
+        context, available_ids, _ = await build_notebook_context(notebook, query_text)
+        return context, available_ids
+
+    config = retrieval_config(query_text)
+    digest = config_hash(config)
+    version = str(notebook.updated)
+    key = (str(notebook.id), digest)
+
+    snapshot: Optional[ContextSnapshot] = _snapshots.get(key)
+    if snapshot is None or snapshot.notebook_updated != version:
+        try:
+            snapshot = await ContextSnapshot.find(str(notebook.id), digest)
+        except Exception:
+            snapshot = None
+        if snapshot is not None:
+            _snapshots.set(key, snapshot)
+
+    if snapshot is not None and snapshot.notebook_updated == version:
+        if _snapshot_age(snapshot) > CONTEXT_SNAPSHOT_MAX_AGE_SECONDS:
+            schedule_snapshot_refresh(str(notebook.id), delay=0)
+        return snapshot.context, list(snapshot.available_ids)
+
+    context, available_ids, retrieved = await build_notebook_context(notebook, query_text)
+    if retrieved:
+        await _store_snapshot(notebook, config, context, available_ids)
+    return context, available_ids
+
+
+async def refresh_notebook_snapshots(notebook_id: str) -> int:
+    """
+    Rebuild every stored snapshot of a notebook for its current version.
+
+    Returns:
+        Number of snapshots rebuilt
+    """
+    notebook = await Notebook.get(notebook_id)
+    refreshed = 0
+    for snapshot in await ContextSnapshot.for_notebook(notebook_id):
+        query_text = snapshot.config.get("query_text")
+        if not query_text or snapshot.config != retrieval_config(query_text):
+            # Built with another retrieval config; rebuilt on demand instead
+            continue
+        context, available_ids, retrieved = await build_notebook_context(
+            notebook, query_text
+        )
+        if retrieved:
+            await _store_snapshot(notebook, snapshot.config, context, available_ids)
+            refreshed += 1
+    logger.debug(f"Refreshed {refreshed} context snapshots for {notebook_id}")
+    return refreshed
+
+
+def schedule_snapshot_refresh(
+    notebook_id: str, delay: float = CONTEXT_SNAPSHOT_REFRESH_DELAY_SECONDS
+) -> None:
+    """
+    Rebuild a notebook's snapshots in the background after `delay` seconds.
+
+    Changes arriving while a refresh is pending are folded into it. Does
+    nothing outside a running event loop.
+    """
+    if not CONTEXT_SNAPSHOTS:
+        return
+    notebook_id = str(notebook_id)
+    pending = _pending_refreshes.get(notebook_id)
+    if pending is not None and not pending.done():
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+
+    async def run() -> None:
+        try:
+            await asyncio.sleep(delay)
+            await refresh_notebook_snapshots(notebook_id)
+        except Exception as e:
+            logger.warning(f"Context snapshot refresh failed for {notebook_id}: {str(e)}")
+        finally:
+            _pending_refreshes.pop(notebook_id, None)
+
+    _pending_refreshes[notebook_id] = loop.create_task(run())
@@ -0,0 +1,77 @@
+"""
+Compiled prompt templates for Open Notebook.
+
+Prompter(prompt_template=...) builds a new Jinja environment on every call,
+so each render searches the prompt folders and compiles the template again.
+render_prompt() renders the same templates (same search path, same sandbox,
+same `current_time` variable) from one process-wide environment, which
+compiles each template once. precompile_prompts() compiles all of them at
+startup, so the first requests do not pay for it either.
+
+With PROMPT_TEMPLATES_AUTO_RELOAD enabled (for development), a template is
+recompiled when its file's modification time changes. Otherwise edits to
+the prompt files need a restart.
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional, Union
+
+from ai_prompter import Prompter
+from jinja2 import FileSystemLoader, Template
+from jinja2.sandbox import SandboxedEnvironment
+from pydantic import BaseModel
+
+PROMPT_TEMPLATES_AUTO_RELOAD = (
+    os.getenv("PROMPT_TEMPLATES_AUTO_RELOAD", "false").lower() == "true"
+)
+# Jinja keeps at most this many compiled templates
+PROMPT_TEMPLATE_CACHE_SIZE = 100
+
+_environment: Optional[SandboxedEnvironment] = None
+
+
+def get_environment() -> SandboxedEnvironment:
+    """The shared environment, searching the same folders as Prompter."""
+    global _environment
+    if _environment is None:
+        folders = Prompter(template_text="").prompt_folders or []
+        _environment = SandboxedEnvironment(
+            loader=FileSystemLoader(folders),
+            auto_reload=PROMPT_TEMPLATES_AUTO_RELOAD,
+            cache_size=PROMPT_TEMPLATE_CACHE_SIZE,
+        )
+    return _environment
+
+
+def get_prompt_template(name: str) -> Template:
+    """Compiled template by name, with or without the .jinja extension."""
+    if name.endswith(".jinja"):
+        name = name[: -len(".jinja")]
+    return get_environment().get_template(f"{name}.jinja")
+
+
+def render_prompt(
+    name: str, data: Optional[Union[Dict[str, Any], BaseModel]] = None
+) -> str:
+    """Render a prompt template like Prompter(prompt_template=name).render(data)."""
+    if isinstance(data, BaseModel):
+        render_data = data.model_dump()
+    else:
+        render_data = dict(data or {})
+    render_data["current_time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return get_prompt_template(name).render(render_data)
+
+
+def precompile_prompts() -> int:
+    """
+    Compile every prompt template found in the prompt folders.
+
+    Returns:
+        Number of templates compiled
+    """
+    environment = get_environment()
+    names = environment.list_templates(extensions=["jinja"])
+    for name in names:
+        environment.get_template(name)
+    return len(names)
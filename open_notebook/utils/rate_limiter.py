@@ -0,0 +1,56 @@
+"""
+Rate limiting utilities for Open Notebook.
+Provides an asyncio token bucket used to pace calls to external AI providers.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket.
+
+    The bucket holds up to `capacity` tokens and refills continuously at
+    `rate` tokens per second. `acquire()` waits until enough tokens are
+    available. A rate of 0 (or less) disables limiting entirely.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, calls_per_minute: Optional[int]) -> "TokenBucket":
+        """Build a bucket from a calls-per-minute budget (None/0 = unlimited)."""
+        if not calls_per_minute or calls_per_minute <= 0:
+            return cls(rate=0)
+        rate = calls_per_minute / 60.0
+        return cls(rate=rate, capacity=max(1.0, min(float(calls_per_minute), rate * 5)))
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until `tokens` tokens are available and consume them."""
+        if not self.enabled:
+            return
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
@@ -0,0 +1,84 @@
+"""
+Response cache for health recommendations.
+
+Repeated requests for the same examination (a page reload, a retried
+request, the stream and non-stream endpoints in turn) are served the answer
+generated for the first of them. Requests share an entry only when every
+value the recommendation prompts render is the same:
+
+- age, gender, height, weight, blood pressure and BMI, as given
+- risk level and risk probability (to the one decimal shown in the prompt)
+- cholesterol, glucose, smoking, alcohol and physical activity, as given
+
+and when the chat model, the TruLens setting and the retrieved notebook
+context (by content digest) are the same. A cached answer therefore never
+quotes another examination's numbers, and any change to the notebook's
+context starts new entries. Entries expire after
+RECOMMENDATION_CACHE_TTL_SECONDS; 0 disables the cache.
+"""
+
+import hashlib
+import os
+from typing import Any, Hashable, List, Optional, Tuple
+
+from open_notebook.utils.retrieval_cache import TTLCache
+
+RECOMMENDATION_CACHE_TTL_SECONDS = float(
+    os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", "3600")
+)
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "256"))
+
+recommendation_cache = TTLCache(
+    RECOMMENDATION_CACHE_SIZE, RECOMMENDATION_CACHE_TTL_SECONDS
+)
+
+
+def prompt_profile(request: Any) -> Tuple[Hashable, ...]:
+    """Values of a recommendation request rendered into its prompt."""
+    return (
+        request.age,
+        request.gender,
+        request.height,
+        request.weight,
+        request.systolic_blood_pressure,
+        request.diastolic_blood_pressure,
+        request.bmi,
+        request.risk_level,
+        f"{request.prob_disease:.1f}",
+        request.cholesterol,
+        request.glucose,
+        request.smoking,
+        request.alcohol,
+        request.physical_activity,
+    )
+
+
+def context_version(context: str, available_ids: List[str]) -> str:
+    digest = hashlib.sha1(context.encode("utf-8"))
+    digest.update("\n".join(available_ids).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def recommendation_key(
+    request: Any,
+    context: str,
+    available_ids: List[str],
+    model_id: Optional[str],
+    evaluated: bool,
+) -> Tuple[Hashable, ...]:
+    """
+    Cache key of a recommendation request.
+
+    Args:
+        request: The HealthRecommendationRequest
+        context: Notebook context the recommendation is generated from
+        available_ids: References available in the context
+        model_id: Chat model generating the recommendation
+        evaluated: Whether the answer is evaluated with TruLens
+    """
+    return (
+        prompt_profile(request),
+        context_version(context, available_ids),
+        model_id,
+        evaluated,
+    )
@@ -2,6 +2,10 @@ import re
 from typing import Dict, List, Optional, Tuple
 
 from open_notebook.domain.notebook import Source
+from open_notebook.utils.retrieval_cache import RETRIEVAL_CACHE_TTL_SECONDS, TTLCache
+
+# Source titles by "source:<id>"; the TTL covers renames made by other processes
+reference_title_cache = TTLCache(1024, RETRIEVAL_CACHE_TTL_SECONDS)
 
 
 def parse_references(text: str) -> List[Tuple[str, str, int, int]]:
@@ -26,35 +30,106 @@ async def fetch_reference_titles(
 ) -> Dict[str, str]:
     """
     Fetch titles for all references.
-    
+
+    Titles come from the in-process cache; the missing ones are read in a
+    single query that projects only the title.
+
     Returns dict mapping "type:id" to title.
     """
     titles = {}
-    unique_refs = {}
-    
+    missing = []
+
     for ref_type, ref_id, _, _ in references:
         key = f"{ref_type}:{ref_id}"
-        if key not in unique_refs:
-            unique_refs[key] = (ref_type, ref_id)
-    
-    for key, (ref_type, ref_id) in unique_refs.items():
+        if ref_type != "source" or key in titles or key in missing:
+            continue
+        title = reference_title_cache.get(key)
+        if title is not None:
+            titles[key] = title
+        else:
+            missing.append(key)
+
+    if missing:
         try:
-            full_id = f"{ref_type}:{ref_id}" if not ref_id.startswith(f"{ref_type}:") else ref_id
-            title = ""
-            
-            if ref_type == "source":
-                source = await Source.get(full_id)
-                if source:
-                    title = source.title or key
-            
-            if title:
-                titles[key] = title
+            sources = await Source.get_many(missing, fields=["title"])
         except Exception:
-            pass
-    
+            sources = []
+        for source in sources:
+            key = str(source.id)
+            title = source.title or key
+            reference_title_cache.set(key, title)
+            titles[key] = title
+
     return titles
 
 
+def invalidate_reference_title(source_id: str) -> None:
+    """Drop a source's cached title after it is updated or deleted."""
+    source_id = str(source_id)
+    key = source_id if source_id.startswith("source:") else f"source:{source_id}"
+    reference_title_cache.pop_where(lambda cached: cached == key)
+
+
+def _rewrite_citations(
+    text: str,
+    references: List[Tuple[str, str, int, int]],
+    reference_map: Dict[str, Dict],
+) -> str:
+    """
+    Replace citations with numbered links in a single right-to-left pass.
+
+    Known citations become "[n](#ref-type-id)", absorbing the "[...]" or
+    "[[...]]" around them; unknown ones are dropped. The bracket check on the
+    right looks at the already rewritten text, as the text is built up in
+    pieces instead of being re-sliced for every citation.
+    """
+    pieces: List[str] = []  # Rewritten text right of the cursor, last piece first
+    cursor = len(text)
+
+    def peek(n: int) -> str:
+        head = ""
+        for piece in reversed(pieces):
+            head += piece[: n - len(head)]
+            if len(head) >= n:
+                break
+        return head
+
+    def consume(n: int) -> None:
+        while n and pieces:
+            piece = pieces.pop()
+            if len(piece) > n:
+                pieces.append(piece[n:])
+                n = 0
+            else:
+                n -= len(piece)
+
+    for ref_type, ref_id, start_idx, end_idx in reversed(references):
+        if end_idx < cursor:
+            pieces.append(text[end_idx:cursor])
+        cursor = start_idx
+
+        key = f"{ref_type}:{ref_id}"
+        if key not in reference_map:
+            continue
+
+        context_before = text[max(0, start_idx - 2):start_idx]
+        context_after = peek(2)
+
+        if context_before == "[[" and context_after.startswith("]]"):
+            cursor = start_idx - 2
+            consume(2)
+        elif context_before.endswith("[") and context_after.startswith("]"):
+            cursor = start_idx - 1
+            consume(1)
+
+        number = reference_map[key]["number"]
+        pieces.append(f"[{number}](#ref-{ref_type}-{ref_id})")
+
+    if cursor:
+        pieces.append(text[:cursor])
+    return "".join(reversed(pieces))
+
+
 def process_references(
     text: str,
     reference_titles: Dict[str, str]
@@ -84,32 +159,7 @@ def process_references(
             }
             next_number += 1
     
-    processed_text = text
-    
-    for ref_type, ref_id, start_idx, end_idx in reversed(references):
-        key = f"{ref_type}:{ref_id}"
-        if key not in reference_map:
-            processed_text = processed_text[:start_idx] + processed_text[end_idx:]
-            continue
-        
-        ref_data = reference_map[key]
-        number = ref_data["number"]
-        
-        context_before = processed_text[max(0, start_idx - 2):start_idx]
-        context_after = processed_text[end_idx:min(len(processed_text), end_idx + 2)]
-        
-        replace_start = start_idx
-        replace_end = end_idx
-        
-        if context_before == "[[" and context_after.startswith("]]"):
-            replace_start = start_idx - 2
-            replace_end = end_idx + 2
-        elif context_before.endswith("[") and context_after.startswith("]"):
-            replace_start = start_idx - 1
-            replace_end = end_idx + 1
-        
-        citation_link = f"[{number}](#ref-{ref_type}-{ref_id})"
-        processed_text = processed_text[:replace_start] + citation_link + processed_text[replace_end:]
+    processed_text = _rewrite_citations(text, references, reference_map)
     
     processed_text = re.sub(r'\[source:[a-zA-Z0-9_]+\]', '', processed_text)
     processed_text = re.sub(r'\[source:[a-zA-Z0-9_]+', '', processed_text)
@@ -0,0 +1,149 @@
+"""
+Retrieval caches for Open Notebook.
+
+- Query embeddings are cached by (embedding model id, text), so repeated
+  queries (like the fixed health retrieval query) skip the provider call.
+- Notebook search results (hybrid_search) are cached by (notebook id, query
+  embedding hash, notebook content version, search parameters, query text). The content version is the
+  notebook's `updated` timestamp, which is bumped whenever sources are added,
+  removed or deleted; Notebook.update_timestamp also drops the notebook's
+  entries explicitly. A TTL bounds staleness for changes that do not touch the
+  notebook record (e.g. embeddings finishing in the commands worker).
+"""
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from open_notebook.domain.models import model_manager
+from open_notebook.utils.hybrid_search import hybrid_search
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "256"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "128"))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "300"))
+
+
+class TTLCache:
+    """Small LRU cache with an optional per-entry time to live."""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if self.ttl is not None and time.monotonic() - stored_at >= self.ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove all entries whose key matches `predicate`."""
+        keys = [key for key in self._data if predicate(key)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+query_embedding_cache = TTLCache(QUERY_EMBEDDING_CACHE_SIZE)
+retrieval_cache = TTLCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL_SECONDS)
+
+
+def embedding_hash(embedding: List[float]) -> str:
+    return hashlib.sha1(np.asarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+
+
+async def get_query_embedding(text: str) -> Optional[List[float]]:
+    """
+    Embedding of a query text with the default embedding model, cached by
+    (model id, text).
+
+    Returns:
+        The embedding, or None when no embedding model is configured
+    """
+    defaults = await model_manager.get_defaults()
+    model_id = defaults.default_embedding_model
+    if not model_id:
+        return None
+
+    key = (model_id, text)
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        embedding_model = await model_manager.get_model(model_id)
+        if not embedding_model:
+            return None
+        embedding = (await embedding_model.aembed([text]))[0]
+        query_embedding_cache.set(key, embedding)
+    return embedding
+
+
+async def cached_hybrid_search(
+    query_text: str,
+    query_embedding: Optional[List[float]],
+    notebook_id: str,
+    version: Any,
+    limit: int = 8,
+    min_similarity: float = 0.0,
+) -> List[Dict[str, Any]]:
+    """
+    hybrid_search scoped to a notebook, cached by (notebook id, query
+    embedding hash, notebook content version, limit, min_similarity, query
+    text).
+
+    Empty results are not cached, so a notebook whose embeddings are still
+    being generated is searched again on the next request.
+    """
+    key = (
+        str(notebook_id),
+        embedding_hash(query_embedding) if query_embedding else None,
+        str(version),
+        limit,
+        min_similarity,
+        query_text,
+    )
+    results = retrieval_cache.get(key)
+    if results is None:
+        results = await hybrid_search(
+            query_text,
+            query_embedding,
+            notebook_id=notebook_id,
+            limit=limit,
+            min_similarity=min_similarity,
+        )
+        if results:
+            retrieval_cache.set(key, results)
+    return results
+
+
+def invalidate_retrieval_cache(notebook_id: Optional[str] = None) -> None:
+    """Drop cached search results for a notebook (or all notebooks)."""
+    if notebook_id is None:
+        retrieval_cache.clear()
+        return
+    removed = retrieval_cache.pop_where(lambda key: key[0] == str(notebook_id))
+    if removed:
+        logger.debug(f"Invalidated {removed} cached retrievals for {notebook_id}")
@@ -0,0 +1,80 @@
+"""
+Settings cache for Open Notebook.
+
+Settings records (DefaultModels, ContentSettings, the TruLens flag) are read
+on every chat turn and recommendation but rarely written. Their rows are
+served from memory for SETTINGS_CACHE_TTL_SECONDS, and writes made by this
+process invalidate them right away.
+
+With SETTINGS_LIVE_UPDATES enabled, the API also keeps a LIVE SELECT on the
+`open_notebook` table (where the settings records live), so writes made by
+other processes (another API worker, the commands worker) invalidate the
+cache too, instead of waiting for the TTL.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+SETTINGS_CACHE_TTL_SECONDS = float(os.getenv("SETTINGS_CACHE_TTL_SECONDS", "30"))
+SETTINGS_LIVE_UPDATES = os.getenv("SETTINGS_LIVE_UPDATES", "false").lower() == "true"
+SETTINGS_TABLE = "open_notebook"
+LIVE_RETRY_SECONDS = 30.0
+
+# {record id: (row, stored at)}
+_settings: Dict[str, Tuple[Dict[str, Any], float]] = {}
+
+
+def get_cached_setting(record_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Cached row of a settings record, or None when it has to be read again.
+    A record that does not exist is cached as an empty row.
+    """
+    entry = _settings.get(str(record_id))
+    if entry is None:
+        return None
+    row, stored_at = entry
+    if time.monotonic() - stored_at >= SETTINGS_CACHE_TTL_SECONDS:
+        _settings.pop(str(record_id), None)
+        return None
+    return dict(row)
+
+
+def cache_setting(record_id: str, row: Optional[Dict[str, Any]]) -> None:
+    if SETTINGS_CACHE_TTL_SECONDS > 0:
+        _settings[str(record_id)] = (dict(row or {}), time.monotonic())
+
+
+def invalidate_setting(record_id: Optional[str] = None) -> None:
+    """Drop a cached settings record, or all of them."""
+    if record_id is None:
+        _settings.clear()
+    else:
+        _settings.pop(str(record_id), None)
+
+
+async def watch_settings() -> None:
+    """
+    Invalidate the cache on every change to the settings table, until
+    cancelled. Reconnects after LIVE_RETRY_SECONDS when the connection fails.
+    Requires a WebSocket SURREAL_URL.
+    """
+    from open_notebook.database.repository import db_connection
+
+    while True:
+        try:
+            async with db_connection() as connection:
+                query_id = await connection.live(SETTINGS_TABLE)
+                # Changes may have been missed while not subscribed
+                invalidate_setting()
+                notifications = await connection.subscribe_live(query_id)
+                async for _ in notifications:
+                    invalidate_setting()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Settings live updates interrupted: {str(e)}")
+        await asyncio.sleep(LIVE_RETRY_SECONDS)
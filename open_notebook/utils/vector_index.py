@@ -0,0 +1,235 @@
+"""
+Vector index utilities for Open Notebook.
+
+SurrealDB HNSW indexes need a fixed DIMENSION, which depends on the configured
+embedding model, so the index on source_embedding.embedding is defined at
+runtime (API startup, end of an embedding rebuild) instead of in a migration.
+A rebuild removes the index when it starts, since stored embeddings may not
+match the new model's dimension until it finishes. Retrieval uses the KNN
+operator against that index and falls back to a brute-force cosine scan when
+the index is not available.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from open_notebook.database.repository import ensure_record_id, repo_query
+from open_notebook.domain.models import model_manager
+from open_notebook.utils.memory_index import memory_vector_index
+
+VECTOR_INDEX_NAME = "idx_source_embedding_vector"
+
+# HNSW build parameters
+VECTOR_INDEX_EFC = int(os.getenv("VECTOR_INDEX_EFC", "150"))
+VECTOR_INDEX_M = int(os.getenv("VECTOR_INDEX_M", "12"))
+
+# KNN query parameters: nearest chunks pulled from the index before the
+# notebook/threshold filters are applied, and the search-time beam width
+VECTOR_SEARCH_CANDIDATES = int(os.getenv("VECTOR_SEARCH_CANDIDATES", "200"))
+VECTOR_SEARCH_EF = int(os.getenv("VECTOR_SEARCH_EF", "250"))
+# Source scopes (explicit or a notebook's) up to this size are scored with an exact scan
+VECTOR_EXACT_SCAN_MAX_SOURCES = int(os.getenv("VECTOR_EXACT_SCAN_MAX_SOURCES", "50"))
+# Candidate multiplier for the retry of a scoped KNN query that came back short
+VECTOR_SEARCH_OVERSAMPLE = 4
+
+
+async def get_embedding_dimension() -> Optional[int]:
+    """
+    Dimension of the configured embedding model.
+
+    Probes the model with a short string; if the provider is unreachable, falls
+    back to the length of an already stored embedding.
+    """
+    try:
+        embedding_model = await model_manager.get_embedding_model()
+        if embedding_model:
+            return len((await embedding_model.aembed(["dimension probe"]))[0])
+    except Exception as e:
+        logger.warning(f"Could not probe embedding model dimension: {e}")
+
+    rows = await repo_query(
+        "SELECT VALUE array::len(embedding) FROM source_embedding WHERE embedding != NONE LIMIT 1"
+    )
+    if rows and isinstance(rows[0], int):
+        return rows[0]
+    return None
+
+
+async def get_vector_index_dimension() -> Optional[int]:
+    """Dimension of the existing HNSW index, or None if it is not defined."""
+    info = await repo_query("INFO FOR TABLE source_embedding")
+    data: Dict[str, Any] = (info[0] if isinstance(info, list) and info else info) or {}  # type: ignore[assignment]
+    definition = (data.get("indexes") or {}).get(VECTOR_INDEX_NAME)
+    if not definition:
+        return None
+    match = re.search(r"DIMENSION (\d+)", str(definition))
+    return int(match.group(1)) if match else None
+
+
+async def ensure_vector_index(dimension: Optional[int] = None) -> Optional[int]:
+    """
+    Make sure the HNSW index on source_embedding.embedding matches the embedding
+    model dimension, (re)defining it when missing or stale.
+
+    Returns:
+        The index dimension, or None when no embedding model is configured
+    """
+    dimension = dimension or await get_embedding_dimension()
+    if not dimension:
+        logger.info("No embedding model configured - skipping vector index setup")
+        return None
+
+    current = await get_vector_index_dimension()
+    if current == dimension:
+        return dimension
+
+    if current is not None:
+        logger.info(
+            f"Vector index dimension changed ({current} -> {dimension}), redefining"
+        )
+        await remove_vector_index()
+
+    logger.info(f"Defining HNSW vector index with dimension {dimension}")
+    await repo_query(
+        f"""
+        DEFINE INDEX {VECTOR_INDEX_NAME} ON source_embedding
+        FIELDS embedding
+        HNSW DIMENSION {dimension} DIST COSINE TYPE F32
+        EFC {VECTOR_INDEX_EFC} M {VECTOR_INDEX_M}
+        CONCURRENTLY
+        """
+    )
+    return dimension
+
+
+async def remove_vector_index() -> None:
+    """Drop the HNSW index; searches use the brute-force scan until it is redefined."""
+    await repo_query(
+        f"REMOVE INDEX IF EXISTS {VECTOR_INDEX_NAME} ON TABLE source_embedding"
+    )
+
+
+async def get_notebook_source_ids(notebook_id: str) -> List[Any]:
+    """Record ids of the sources referenced by a notebook."""
+    return await repo_query(
+        "SELECT VALUE in FROM reference WHERE out = $notebook_id",
+        {"notebook_id": ensure_record_id(notebook_id)},
+    )
+
+
+async def knn_search(
+    query_embedding: List[float],
+    notebook_id: Optional[str] = None,
+    limit: int = 8,
+    min_similarity: float = 0.0,
+    candidates: Optional[int] = None,
+    source_ids: Optional[List[Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Nearest source_embedding chunks for a query embedding.
+
+    `source_ids` restricts the search to those sources (e.g. a keyword
+    prefilter or search filters); otherwise a notebook_id scopes the search
+    to the notebook's sources. A narrow scope would mostly fall outside the
+    global KNN candidates, so scopes of up to VECTOR_EXACT_SCAN_MAX_SOURCES
+    sources are scored exactly with a cosine scan instead.
+    Notebook-scoped searches are answered from the in-process index when
+    MEMORY_VECTOR_INDEX is enabled. Otherwise uses the HNSW index through the
+    KNN operator; the scope and similarity filters are applied to the
+    `candidates` nearest chunks. A scoped query that leaves fewer than `limit`
+    rows is retried with VECTOR_SEARCH_OVERSAMPLE times more candidates, then
+    scanned exactly. Falls back to the scan as well if the KNN query fails
+    (e.g. the index is not defined yet or its dimension is stale).
+
+    Returns:
+        Rows with id (source id), content, order and similarity, best first
+    """
+    if notebook_id and memory_vector_index.enabled:
+        try:
+            return await memory_vector_index.search(
+                notebook_id, query_embedding, limit, min_similarity, source_ids
+            )
+        except Exception as e:
+            logger.warning(f"In-memory vector search failed, using database: {e}")
+
+    if source_ids is not None:
+        source_ids = [ensure_record_id(source_id) for source_id in source_ids]
+    elif notebook_id:
+        source_ids = [
+            ensure_record_id(source_id)
+            for source_id in await get_notebook_source_ids(notebook_id)
+        ]
+    if source_ids is not None and not source_ids:
+        return []
+    scan_only = (
+        source_ids is not None and len(source_ids) <= VECTOR_EXACT_SCAN_MAX_SOURCES
+    )
+
+    k = max(candidates or VECTOR_SEARCH_CANDIDATES, limit)
+    if scan_only:
+        attempts = []
+    elif source_ids is not None:
+        attempts = [k, k * VECTOR_SEARCH_OVERSAMPLE]
+    else:
+        attempts = [k]
+    for k in attempts:
+        ef = max(VECTOR_SEARCH_EF, k)
+        try:
+            rows = await repo_query(
+                f"""
+                SELECT * FROM (
+                    SELECT
+                        source AS id,
+                        content,
+                        order,
+                        token_count,
+                        1 - vector::distance::knn() AS similarity
+                    FROM source_embedding
+                    WHERE embedding <|{k},{ef}|> $query_embedding
+                )
+                WHERE similarity >= $min_similarity
+                    AND ($source_ids = NONE OR id IN $source_ids)
+                ORDER BY similarity DESC
+                LIMIT $limit
+                """,
+                {
+                    "query_embedding": query_embedding,
+                    "min_similarity": min_similarity,
+                    "source_ids": source_ids,
+                    "limit": limit,
+                },
+            )
+        except Exception as e:
+            logger.warning(f"KNN vector search failed, using brute-force scan: {e}")
+            break
+        if len(rows) >= limit or source_ids is None:
+            return rows
+
+    return await repo_query(
+        """
+        SELECT * FROM (
+            SELECT
+                source AS id,
+                content,
+                order,
+                token_count,
+                vector::similarity::cosine(embedding, $query_embedding) AS similarity
+            FROM source_embedding
+            WHERE ($source_ids = NONE OR source IN $source_ids)
+                AND embedding != NONE
+                AND array::len(embedding) = array::len($query_embedding)
+        )
+        WHERE similarity >= $min_similarity
+        ORDER BY similarity DESC
+        LIMIT $limit
+        """,
+        {
+            "query_embedding": query_embedding,
+            "min_similarity": min_similarity,
+            "source_ids": source_ids,
+            "limit": limit,
+        },
+    )
@@ -5,14 +5,18 @@ This test suite focuses on validation logic, business rules, and data structures
 that can be tested without database mocking.
 """
 
+from unittest.mock import AsyncMock, patch
+
 import pytest
 from pydantic import ValidationError
 
 from open_notebook.domain.base import RecordModel
 from open_notebook.domain.content_settings import ContentSettings
-from open_notebook.domain.models import ModelManager
+from open_notebook.domain.context_snapshot import ContextSnapshot, config_hash
+from open_notebook.domain.models import DefaultModels, Model, ModelManager
 from open_notebook.domain.notebook import Notebook, Source
 from open_notebook.exceptions import InvalidInputError
+from open_notebook.utils.settings_cache import invalidate_setting
 
 # ============================================================================
 # TEST SUITE 1: RecordModel Singleton Pattern
@@ -62,6 +66,48 @@ class TestModelManager:
         assert manager1 is not manager2
         assert id(manager1) != id(manager2)
 
+    @pytest.mark.asyncio
+    async def test_model_instances_cached_per_config(self):
+        """Test model instances are reused for the same model id and config."""
+        manager = ModelManager()
+        record = Model(id="model:chat", name="gpt-4o-mini", provider="openai", type="language")
+
+        with patch(
+            "open_notebook.domain.models.Model.get", AsyncMock(return_value=record)
+        ) as get_model, patch(
+            "open_notebook.domain.models.AIFactory.create_language",
+            side_effect=lambda **kwargs: object(),
+        ) as create:
+            first = await manager.get_model("model:chat", max_tokens=100)
+            assert await manager.get_model("model:chat", max_tokens=100) is first
+            assert get_model.await_count == 1
+
+            other = await manager.get_model("model:chat", max_tokens=200)
+            assert other is not first
+            assert create.call_count == 2
+
+            manager.invalidate("model:chat")
+            assert await manager.get_model("model:chat", max_tokens=100) is not first
+            assert get_model.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_model_writes_invalidate_cached_instances(self):
+        """Test saving or deleting a model record drops its cached instances."""
+        record = Model(id="model:chat", name="gpt-4o-mini", provider="openai", type="language")
+
+        with patch(
+            "open_notebook.domain.base.ObjectModel.save", AsyncMock()
+        ), patch(
+            "open_notebook.domain.base.ObjectModel.delete", AsyncMock(return_value=True)
+        ), patch(
+            "open_notebook.domain.models.model_manager.invalidate"
+        ) as invalidate:
+            await record.save()
+            invalidate.assert_called_once_with("model:chat")
+
+            assert await record.delete() is True
+            assert invalidate.call_count == 2
+
 
 # ============================================================================
 # TEST SUITE 3: Notebook Domain Logic
@@ -85,6 +131,24 @@ class TestNotebookDomain:
         notebook = Notebook(name="Valid Name", description="Test")
         assert notebook.name == "Valid Name"
 
+    @pytest.mark.asyncio
+    async def test_get_latest_is_cached_until_invalidated(self):
+        """Test the default notebook is looked up once until a notebook changes."""
+        Notebook.invalidate_latest()
+        latest = Notebook(id="notebook:1", name="Latest", description="")
+        with patch(
+            "open_notebook.domain.notebook.repo_query",
+            AsyncMock(return_value=[{"id": "notebook:1", "updated": None}]),
+        ) as query, patch.object(Notebook, "get", AsyncMock(return_value=latest)):
+            assert await Notebook.get_latest() is latest
+            assert await Notebook.get_latest() is latest
+            assert query.await_count == 1
+
+            Notebook.invalidate_latest()
+            await Notebook.get_latest()
+            assert query.await_count == 2
+        Notebook.invalidate_latest()
+
 # ============================================================================
 # TEST SUITE 4: Source Domain
 # ============================================================================
@@ -108,6 +172,32 @@ class TestSourceDomain:
         save_data = source3._prepare_save_data()
         assert "command" in save_data
 
+    def test_compute_text_stats(self):
+        """Test character and token counts computed from full_text."""
+        source = Source(title="Test", full_text="one two three four five")
+        with patch("tiktoken.get_encoding", side_effect=ImportError()):
+            source.compute_text_stats()
+
+        assert source.char_count == 23
+        assert source.token_count == int(5 * 1.3)
+        assert "token_count" in source._prepare_save_data()
+
+        empty = Source(title="Empty")
+        empty.compute_text_stats()
+        assert empty.char_count == 0
+        assert empty.token_count == 0
+
+    @pytest.mark.asyncio
+    async def test_get_many_without_ids(self):
+        """Test that an empty id list does not query the database."""
+        assert await Source.get_many([]) == []
+
+    @pytest.mark.asyncio
+    async def test_get_many_rejects_invalid_fields(self):
+        """Test that projected field names are validated."""
+        with pytest.raises(InvalidInputError):
+            await Source.get_many(["source:1"], fields=["title; DELETE source"])
+
 
 # ============================================================================
 # TEST SUITE 6: Content Settings
@@ -125,5 +215,77 @@ class TestContentSettings:
         assert settings.default_content_processing_engine_doc == "auto"
         assert settings.default_embedding_option == "ask"
 
+# ============================================================================
+# TEST SUITE 7: Context Snapshots
+# ============================================================================
+
+
+class TestContextSnapshot:
+    """Test suite for ContextSnapshot identity."""
+
+    def test_config_hash_ignores_key_order(self):
+        """Test that equal configs hash equally regardless of key order."""
+        assert config_hash({"a": 1, "b": "x"}) == config_hash({"b": "x", "a": 1})
+        assert config_hash({"a": 1}) != config_hash({"a": 2})
+
+    def test_record_id_per_notebook_and_config(self):
+        """Test that each (notebook, config) pair maps to one record."""
+        digest = config_hash({"query_text": "sleep"})
+        record_id = ContextSnapshot.record_id("notebook:abc", digest)
+
+        assert record_id == f"context_snapshot:abc_{digest[:16]}"
+        assert ContextSnapshot.record_id("abc", digest) == record_id
+        assert ContextSnapshot.record_id("notebook:def", digest) != record_id
+
+
+# ============================================================================
+# TEST SUITE 8: Settings Cache
+# ============================================================================
+
+
+class TestSettingsCache:
+    """Test suite for cached settings records."""
+
+    @pytest.mark.asyncio
+    async def test_default_models_served_from_cache(self):
+        """Test DefaultModels is read once and re-read after a write."""
+        invalidate_setting()
+        row = {"default_chat_model": "model:chat"}
+
+        with patch(
+            "open_notebook.domain.base.repo_query", AsyncMock(return_value=[row])
+        ) as query, patch("open_notebook.domain.base.repo_upsert", AsyncMock()):
+            first = await DefaultModels.get_instance()
+            second = await DefaultModels.get_instance()
+            assert first.default_chat_model == "model:chat"
+            assert second is not first
+            assert query.await_count == 1
+
+            # Changes to one instance do not leak into the cached record
+            first.default_chat_model = "model:other"
+            assert (await DefaultModels.get_instance()).default_chat_model == "model:chat"
+
+            await first.update()
+            query.return_value = [{"default_chat_model": "model:other"}]
+            defaults = await DefaultModels.get_instance()
+            assert defaults.default_chat_model == "model:other"
+
+        invalidate_setting()
+
+    @pytest.mark.asyncio
+    async def test_missing_record_cached(self):
+        """Test a settings record that does not exist yet is not re-queried."""
+        invalidate_setting()
+
+        with patch(
+            "open_notebook.domain.base.repo_query", AsyncMock(return_value=[])
+        ) as query:
+            assert (await DefaultModels.get_instance()).default_chat_model is None
+            assert (await DefaultModels.get_instance()).default_chat_model is None
+            assert query.await_count == 1
+
+        invalidate_setting()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
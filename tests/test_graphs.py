@@ -9,6 +9,7 @@ from datetime import datetime
 
 import pytest
 
+from open_notebook.graphs.checkpoint import prune_checkpoints
 from open_notebook.graphs.prompt import PatternChainState, graph
 from open_notebook.graphs.tools import get_current_timestamp
 
@@ -90,5 +91,54 @@ class TestPromptGraph:
         assert hasattr(graph, "ainvoke")
 
 
+# ============================================================================
+# TEST SUITE 3: Chat Checkpoints
+# ============================================================================
+
+
+class TestCheckpointPruning:
+    """Test suite for pruning old chat checkpoints."""
+
+    @pytest.mark.asyncio
+    async def test_prune_keeps_latest_state_per_thread(self, tmp_path):
+        """Test that pruning drops old checkpoints but not conversations."""
+        import operator
+        from typing import Annotated
+
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        from langgraph.graph import END, START, StateGraph
+        from typing_extensions import TypedDict
+
+        class CounterState(TypedDict):
+            turns: Annotated[list, operator.add]
+
+        builder = StateGraph(CounterState)
+        builder.add_node("count", lambda state: {"turns": ["reply"]})
+        builder.add_edge(START, "count")
+        builder.add_edge("count", END)
+
+        checkpointer = AsyncSqliteSaver(aiosqlite.connect(str(tmp_path / "c.sqlite")))
+        counter = builder.compile(checkpointer=checkpointer)
+        try:
+            for thread_id, turns in (("a", 3), ("b", 1)):
+                config = {"configurable": {"thread_id": thread_id}}
+                for _ in range(turns):
+                    await counter.ainvoke({"turns": ["message"]}, config)
+
+            deleted = await prune_checkpoints(checkpointer, keep=1)
+
+            async with checkpointer.conn.execute(
+                "SELECT thread_id, count(*) FROM checkpoints GROUP BY thread_id"
+            ) as cursor:
+                assert dict(await cursor.fetchall()) == {"a": 1, "b": 1}
+            assert deleted > 0
+
+            state = await counter.aget_state({"configurable": {"thread_id": "a"}})
+            assert len(state.values["turns"]) == 6
+        finally:
+            await checkpointer.conn.close()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
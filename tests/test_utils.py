@@ -5,7 +5,11 @@ This test suite focuses on testing utility functions that perform actual logic
 without heavy mocking - string processing, validation, and algorithms.
 """
 
+from types import SimpleNamespace
+
 import pytest
+from ai_prompter import Prompter
+from langchain_core.messages import AIMessage, HumanMessage
 
 from open_notebook.utils import (
     clean_thinking_content,
@@ -17,7 +21,31 @@ from open_notebook.utils import (
     split_text,
     token_count,
 )
-from open_notebook.utils.context_builder import ContextBuilder, ContextConfig
+from open_notebook.utils.chat_history import build_history, summary_section
+from open_notebook.utils.chunk_context import (
+    neighbor_orders,
+    render_passages,
+    select_chunks,
+)
+from open_notebook.utils.context_builder import (
+    ContextBuilder,
+    ContextConfig,
+    ContextItem,
+)
+from open_notebook.utils.hybrid_search import reciprocal_rank_fusion, search_terms
+from open_notebook.utils.memory_index import NotebookIndex
+from open_notebook.utils.notebook_context import context_covers
+from open_notebook.utils.prompt_templates import get_prompt_template, render_prompt
+from open_notebook.utils.rate_limiter import TokenBucket
+from open_notebook.utils.recommendation_cache import recommendation_key
+from open_notebook.utils.reference_utils import (
+    fetch_reference_titles,
+    invalidate_reference_title,
+    parse_references,
+    process_references,
+    reference_title_cache,
+)
+from open_notebook.utils.retrieval_cache import TTLCache, embedding_hash
 
 # ============================================================================
 # TEST SUITE 1: Text Utilities
@@ -246,6 +274,638 @@ class TestContextBuilder:
         assert builder.notebook_id == "notebook:456"
         assert builder.max_tokens == 1000
 
+    @staticmethod
+    def _source_item(item_id, priority, chunks, counts):
+        return ContextItem(
+            id=item_id,
+            type="source",
+            content={"id": item_id, "full_text": " ".join(chunks)},
+            priority=priority,
+            token_count=sum(counts),
+            chunks=chunks,
+            chunk_token_counts=counts,
+        )
+
+    def test_truncate_trims_at_chunk_boundary(self):
+        """Test that an oversized item is trimmed instead of dropped."""
+        builder = ContextBuilder()
+        builder.items = [
+            self._source_item("source:big", 100, ["one", "two", "three"], [40, 40, 40])
+        ]
+        builder.truncate_to_fit(90)
+
+        assert len(builder.items) == 1
+        item = builder.items[0]
+        assert item.chunks == ["one", "two"]
+        assert item.token_count == 80
+        assert item.content["full_text"] == "one two"
+
+    def test_truncate_keeps_lower_priority_items_that_fit(self):
+        """Test that an oversized item does not evict smaller ones behind it."""
+        builder = ContextBuilder()
+        builder.items = [
+            self._source_item("source:a", 100, ["a"], [50]),
+            ContextItem(
+                id="source:huge",
+                type="source",
+                content={"id": "source:huge"},
+                priority=90,
+                token_count=500,
+            ),
+            self._source_item("source:c", 80, ["c"], [30]),
+        ]
+        builder.truncate_to_fit(100)
+
+        assert [item.id for item in builder.items] == ["source:a", "source:c"]
+
+    def test_item_token_count_ignores_dict_repr(self):
+        """Test that token counts come from the text values only."""
+        from unittest.mock import patch
+
+        # Word-count fallback keeps the test independent of tiktoken downloads
+        with patch("tiktoken.get_encoding", side_effect=ImportError()):
+            item = ContextItem(
+                id="source:1",
+                type="source",
+                content={"title": None, "full_text": "one two three four five"},
+            )
+
+        assert item.token_count == int(5 * 1.3)
+
+
+# ============================================================================
+# TEST SUITE 5: Rate Limiter
+# ============================================================================
+
+
+class TestTokenBucket:
+    """Test suite for the asyncio token bucket."""
+
+    def test_per_minute_unlimited(self):
+        """Test that a zero or missing budget disables limiting."""
+        assert not TokenBucket.per_minute(0).enabled
+        assert not TokenBucket.per_minute(None).enabled
+        assert TokenBucket.per_minute(60).enabled
+
+    @pytest.mark.asyncio
+    async def test_acquire_waits_when_empty(self):
+        """Test that acquiring past the capacity waits for a refill."""
+        import time
+
+        bucket = TokenBucket(rate=20.0, capacity=1.0)
+        started = time.monotonic()
+        await bucket.acquire()
+        await bucket.acquire()
+        elapsed = time.monotonic() - started
+
+        # Second token needs 1/20s of refill
+        assert elapsed >= 0.04
+
+
+# ============================================================================
+# TEST SUITE 6: In-Memory Vector Index
+# ============================================================================
+
+
+class TestNotebookIndex:
+    """Test suite for the in-process notebook vector index."""
+
+    ROWS = [
+        {"id": "source:a", "order": 0, "content": "a0", "embedding": [1.0, 0.0]},
+        {"id": "source:a", "order": 1, "content": "a1", "embedding": [0.6, 0.8]},
+        {"id": "source:b", "order": 0, "content": "b0", "embedding": [0.0, 2.0]},
+    ]
+
+    def test_search_orders_by_similarity(self):
+        """Test that results are ranked by cosine similarity."""
+        index = NotebookIndex.from_rows("notebook:1", self.ROWS)
+        results = index.search([0.0, 1.0], limit=3)
+
+        assert [r["content"] for r in results] == ["b0", "a1", "a0"]
+        assert results[0]["similarity"] == pytest.approx(1.0)
+
+    def test_search_limit_and_threshold(self):
+        """Test the limit and min_similarity filters."""
+        index = NotebookIndex.from_rows("notebook:1", self.ROWS)
+
+        assert len(index.search([1.0, 0.0], limit=1)) == 1
+        results = index.search([1.0, 0.0], limit=3, min_similarity=0.5)
+        assert [r["content"] for r in results] == ["a0", "a1"]
+
+    def test_search_dimension_mismatch(self):
+        """Test that a query of another dimension returns nothing."""
+        index = NotebookIndex.from_rows("notebook:1", self.ROWS)
+        assert index.search([1.0, 0.0, 0.0], limit=3) == []
+
+    def test_replace_sources(self):
+        """Test replacing and removing the chunks of a source."""
+        index = NotebookIndex.from_rows("notebook:1", self.ROWS)
+        index.replace_sources(
+            {"source:a"},
+            [{"id": "source:a", "order": 0, "content": "new", "embedding": [1.0, 1.0]}],
+        )
+        assert index.chunk_counts() == {"source:b": 1, "source:a": 1}
+
+        index.replace_sources({"source:b"}, [])
+        assert [r["content"] for r in index.search([0.0, 1.0], limit=5)] == ["new"]
+
+    @pytest.mark.asyncio
+    async def test_refresh_reloads_rewritten_sources(self):
+        """Test a source re-embedded with the same chunk count is reloaded."""
+        from unittest.mock import AsyncMock, patch
+
+        from open_notebook.utils import memory_index
+
+        versions = [
+            {"source": "source:a", "chunks": 2, "updated": "2026-01-01T00:00:00Z"},
+            {"source": "source:b", "chunks": 1, "updated": "2026-01-01T00:00:00Z"},
+        ]
+        rewritten = [
+            {**versions[0], "updated": "2026-01-02T00:00:00Z"},
+            versions[1],
+        ]
+        new_rows = [
+            {"id": "source:a", "order": 0, "content": "new0", "embedding": [1.0, 0.0]},
+            {"id": "source:a", "order": 1, "content": "new1", "embedding": [0.6, 0.8]},
+        ]
+        query = AsyncMock(
+            side_effect=[
+                ["source:a", "source:b"], versions, self.ROWS,
+                ["source:a", "source:b"], versions,
+                ["source:a", "source:b"], rewritten, new_rows,
+            ]
+        )
+        vector_index = memory_index.MemoryVectorIndex(enabled=True)
+        with patch.object(memory_index, "repo_query", query):
+            index = await vector_index._load("notebook:1")
+            await vector_index._refresh(index)
+            assert query.await_count == 5  # Nothing changed, nothing fetched
+
+            await vector_index._refresh(index)
+
+        contents = [r["content"] for r in index.search([1.0, 0.0], limit=3)]
+        assert contents == ["new0", "new1", "b0"]
+        fetched = query.await_args_list[-1].args[1]["source_ids"]
+        assert [str(sid) for sid in fetched] == ["source:a"]
+
+
+# ============================================================================
+# TEST SUITE 7: Retrieval Cache
+# ============================================================================
+
+
+class TestRetrievalCache:
+    """Test suite for the retrieval cache primitives."""
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted."""
+        cache = TTLCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_ttl_expiry(self):
+        """Test that expired entries are not returned."""
+        cache = TTLCache(maxsize=2, ttl=0)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+
+    def test_pop_where(self):
+        """Test invalidating entries of one notebook."""
+        cache = TTLCache(maxsize=10)
+        cache.set(("notebook:1", "h1"), [1])
+        cache.set(("notebook:1", "h2"), [2])
+        cache.set(("notebook:2", "h1"), [3])
+
+        assert cache.pop_where(lambda key: key[0] == "notebook:1") == 2
+        assert len(cache) == 1
+
+    def test_embedding_hash(self):
+        """Test that equal embeddings hash equally."""
+        assert embedding_hash([0.1, 0.2]) == embedding_hash([0.1, 0.2])
+        assert embedding_hash([0.1, 0.2]) != embedding_hash([0.2, 0.1])
+
+    @pytest.mark.asyncio
+    async def test_cached_hybrid_search_keys_and_invalidation(self):
+        """Test hits per notebook version and query, and per-notebook invalidation."""
+        from unittest.mock import AsyncMock, patch
+
+        from open_notebook.utils import retrieval_cache
+
+        rows = [{"id": "source:a", "content": "a0", "order": 0}]
+        search = AsyncMock(return_value=rows)
+        with patch.object(retrieval_cache, "hybrid_search", search), patch.object(
+            retrieval_cache, "retrieval_cache", TTLCache(maxsize=10)
+        ):
+            cached = retrieval_cache.cached_hybrid_search
+            assert await cached("sleep", [0.1, 0.2], "notebook:1", "v1") == rows
+            assert await cached("sleep", [0.1, 0.2], "notebook:1", "v1") == rows
+            assert search.await_count == 1
+
+            await cached("sleep", [0.1, 0.2], "notebook:1", "v2")
+            await cached("diet", [0.1, 0.2], "notebook:1", "v2")
+            assert search.await_count == 3
+
+            retrieval_cache.invalidate_retrieval_cache("notebook:1")
+            await cached("sleep", [0.1, 0.2], "notebook:1", "v1")
+            assert search.await_count == 4
+
+
+# ============================================================================
+# TEST SUITE 8: Hybrid Search
+# ============================================================================
+
+
+class TestHybridSearch:
+    """Test suite for hybrid retrieval helpers."""
+
+    def test_search_terms(self):
+        """Test query term extraction."""
+        terms = search_terms("Blood pressure, BMI and blood glucose", max_terms=3)
+        assert terms == ["blood", "pressure", "bmi"]
+
+    def test_rrf_rewards_agreement(self):
+        """Test that a chunk ranked by both retrievers wins."""
+        vector = [
+            {"id": "source:a", "order": 0, "similarity": 0.9},
+            {"id": "source:b", "order": 2, "similarity": 0.8},
+        ]
+        bm25 = [
+            {"id": "source:b", "order": 2, "bm25_score": 3.1},
+            {"id": "source:c", "order": 1, "bm25_score": 2.0},
+        ]
+        fused = reciprocal_rank_fusion([vector, bm25], k=60)
+
+        assert [(h["id"], h["order"]) for h in fused] == [
+            ("source:b", 2),
+            ("source:a", 0),
+            ("source:c", 1),
+        ]
+        assert fused[0]["similarity"] == 0.8
+        assert fused[0]["bm25_score"] == 3.1
+        assert fused[0]["score"] == pytest.approx(1 / 62 + 1 / 61)
+
+    def test_rrf_keeps_chunks_separate(self):
+        """Test that chunks of the same source are fused independently."""
+        fused = reciprocal_rank_fusion(
+            [[{"id": "source:a", "order": 0}, {"id": "source:a", "order": 1}]]
+        )
+        assert len(fused) == 2
+
+
+# ============================================================================
+# TEST SUITE 9: Chunk Context Assembly
+# ============================================================================
+
+
+class TestChunkContext:
+    """Test suite for chunk-level context assembly."""
+
+    CHUNKS = {
+        ("source:a", 0): "alpha zero",
+        ("source:a", 1): "alpha one",
+        ("source:a", 2): "alpha two",
+        ("source:a", 5): "alpha five",
+        ("source:b", 0): "beta zero",
+    }
+
+    @staticmethod
+    def count(text):
+        return len(text.split())
+
+    def test_neighbor_orders(self):
+        """Test neighbour ordering and the lower bound."""
+        assert neighbor_orders(1, 2) == [1, 0, 2, 3]
+        assert neighbor_orders(4, 0) == [4]
+
+    def test_select_with_neighbors(self):
+        """Test that hits pull in adjacent chunks."""
+        hits = [{"id": "source:a", "order": 1}, {"id": "source:b", "order": 0}]
+        selected = select_chunks(hits, self.CHUNKS, 1, 100, self.count)
+
+        assert sorted(selected["source:a"]) == [0, 1, 2]
+        assert list(selected["source:b"]) == [0]
+
+    def test_select_respects_budget(self):
+        """Test that best hits are kept first within the token budget."""
+        hits = [{"id": "source:a", "order": 1}, {"id": "source:b", "order": 0}]
+        selected = select_chunks(hits, self.CHUNKS, 1, 4, self.count)
+
+        # Hit (2 tokens) + closest neighbour (2 tokens) fill the budget
+        assert sorted(selected["source:a"]) == [0, 1]
+        assert "source:b" not in selected
+
+    def test_select_uses_stored_token_counts(self):
+        """Test stored token counts are used instead of tokenizing the chunks."""
+        hits = [{"id": "source:a", "order": 1}]
+        stored = {("source:a", 0): 10, ("source:a", 1): 3, ("source:a", 2): 3}
+
+        def count(text):
+            raise AssertionError(f"tokenized {text!r}")
+
+        selected = select_chunks(hits, self.CHUNKS, 1, 6, count, stored)
+        assert sorted(selected["source:a"]) == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_fetch_chunks_returns_token_counts(self):
+        """Test token counts come back with the hits and their neighbours."""
+        from unittest.mock import AsyncMock, patch
+
+        from open_notebook.utils import chunk_context
+
+        hits = [{"id": "source:a", "order": 1, "content": "alpha one", "token_count": 2}]
+        rows = [
+            {"id": "source:a", "order": 0, "content": "alpha zero", "token_count": 4},
+            {"id": "source:a", "order": 2, "content": "alpha two", "token_count": None},
+        ]
+        with patch.object(chunk_context, "repo_query", AsyncMock(return_value=rows)):
+            chunks, token_counts = await chunk_context.fetch_chunks(hits, 1)
+
+        assert set(chunks) == {("source:a", 0), ("source:a", 1), ("source:a", 2)}
+        assert token_counts == {("source:a", 0): 4, ("source:a", 1): 2}
+
+    def test_render_marks_gaps(self):
+        """Test document-order rendering with gap markers."""
+        text = render_passages({5: "five", 0: "zero", 1: "one"})
+        assert text == "zero\n\none\n\n[...]\n\nfive"
+
+    def test_context_covers_message(self):
+        """Test the reuse check for stored chat context."""
+        context = "=== source:a ===\nRelevant Content:\nReduce salt to lower blood pressure."
+
+        assert context_covers("How do I lower my blood pressure?", context)
+        assert not context_covers("Is intermittent fasting safe for diabetics?", context)
+        # Nothing to look up
+        assert context_covers("ok, ya", context)
+
+
+# ============================================================================
+# TEST SUITE 10: References
+# ============================================================================
+
+
+class TestReferences:
+    """Test suite for citation parsing and title resolution."""
+
+    @pytest.mark.asyncio
+    async def test_titles_fetched_in_one_query_and_cached(self):
+        """Test that unique citations are resolved with a single batched read."""
+        from unittest.mock import AsyncMock, patch
+
+        from open_notebook.domain.notebook import Source
+
+        reference_title_cache.clear()
+        refs = parse_references("[source:a] and [source:b], again [source:a]")
+        sources = [Source(id="source:a", title="A"), Source(id="source:b")]
+
+        with patch.object(Source, "get_many", AsyncMock(return_value=sources)) as get_many:
+            titles = await fetch_reference_titles(refs)
+            assert titles == {"source:a": "A", "source:b": "source:b"}
+            get_many.assert_awaited_once_with(
+                ["source:a", "source:b"], fields=["title"]
+            )
+
+            assert await fetch_reference_titles(refs) == titles
+            assert get_many.await_count == 1
+
+            invalidate_reference_title("a")
+            await fetch_reference_titles(refs)
+            assert get_many.call_args.args[0] == ["source:a"]
+        reference_title_cache.clear()
+
+    def test_duplicate_citations_share_a_number(self):
+        """Test that repeated citations reuse the first number."""
+        text, refs = process_references(
+            "Walk daily [source:a]. Sleep well [source:b]. Walk more [source:a].",
+            {"source:a": "A", "source:b": "B"},
+        )
+
+        assert text == (
+            "Walk daily [1](#ref-source-a). Sleep well [2](#ref-source-b). "
+            "Walk more [1](#ref-source-a)."
+        )
+        assert [(ref["number"], ref["id"]) for ref in refs] == [(1, "a"), (2, "b")]
+
+    def test_adjacent_citations(self):
+        """Test bracketed citations written back to back."""
+        titles = {"source:a": "A", "source:b": "B"}
+
+        text, _ = process_references("Eat fiber [source:a][source:b].", titles)
+        assert text == "Eat fiber [1](#ref-source-a)[2](#ref-source-b)."
+
+        text, _ = process_references("Eat fiber [[source:a]][[source:b]].", titles)
+        assert text == "Eat fiber [1](#ref-source-a)[2](#ref-source-b)."
+
+
+# ============================================================================
+# TEST SUITE 11: Chat History Window
+# ============================================================================
+
+
+class TestChatHistory:
+    """Test suite for the token-budgeted chat history."""
+
+    @staticmethod
+    def _messages(count):
+        return [
+            HumanMessage(content=f"q{i}") if i % 2 == 0 else AIMessage(content=f"a{i}")
+            for i in range(count)
+        ]
+
+    def test_keeps_last_messages(self):
+        """Test the window holds at most `keep` messages."""
+        messages = self._messages(10)
+
+        recent, start = build_history(messages, max_tokens=1000, keep=4, count=len)
+        assert start == 6
+        assert recent == messages[6:]
+
+        recent, start = build_history(messages[:3], max_tokens=1000, keep=4, count=len)
+        assert start == 0
+        assert len(recent) == 3
+
+    def test_token_budget(self):
+        """Test older messages are dropped once the budget is used."""
+        messages = self._messages(6)
+
+        recent, start = build_history(messages, max_tokens=4, keep=6, count=len)
+        assert start == 4
+        assert [m.content for m in recent] == ["q4", "a5"]
+
+    def test_last_message_always_included(self):
+        """Test the latest message is sent even when it exceeds the budget."""
+        messages = [HumanMessage(content="x" * 50)]
+
+        recent, start = build_history(messages, max_tokens=10, keep=4, count=len)
+        assert recent == messages
+        assert start == 0
+
+        recent, start = build_history([], max_tokens=10, keep=4, count=len)
+        assert recent == [] and start == 0
+
+    def test_summary_section(self):
+        """Test the summary is only added to the prompt when present."""
+        assert summary_section(None) == ""
+        assert summary_section("") == ""
+        assert summary_section("User walks daily.").endswith("User walks daily.")
+
+
+# ============================================================================
+# TEST SUITE 12: Prompt Templates
+# ============================================================================
+
+
+class TestPromptTemplates:
+    """Test suite for the cached prompt templates."""
+
+    def test_template_compiled_once(self):
+        """Test the same compiled template is reused across renders."""
+        assert get_prompt_template("chat_summary") is get_prompt_template(
+            "chat_summary.jinja"
+        )
+
+    def test_render_matches_prompter(self):
+        """Test cached renders match Prompter renders."""
+        data = {"summary": "User walks daily.", "conversation": "User: hi"}
+
+        expected = Prompter(prompt_template="chat_summary").render(data=data)
+        assert render_prompt("chat_summary", data) == expected
+
+
+# ============================================================================
+# TEST SUITE 13: Recommendation Cache
+# ============================================================================
+
+
+class TestRecommendationCache:
+    """Test suite for the recommendation cache keys."""
+
+    @staticmethod
+    def _request(**overrides):
+        profile = dict(
+            age=45,
+            gender=1,
+            height=170,
+            weight=79.0,
+            bmi=27.3,
+            systolic_blood_pressure=125,
+            diastolic_blood_pressure=75,
+            risk_level="medium",
+            prob_disease=42.0,
+            cholesterol=None,
+            glucose=None,
+            smoking=None,
+            alcohol=None,
+            physical_activity=1,
+        )
+        profile.update(overrides)
+        return SimpleNamespace(**profile)
+
+    def test_same_examination_same_key(self):
+        """Test repeated requests for the same examination share a key."""
+        key = recommendation_key(self._request(), "ctx", ["source:a"], "model:x", True)
+
+        # The prompt shows the probability to one decimal
+        repeated = self._request(prob_disease=42.04)
+        assert recommendation_key(repeated, "ctx", ["source:a"], "model:x", True) == key
+
+    def test_similar_profiles_never_share_answers(self):
+        """Test profiles that differ only in their numbers get their own answers."""
+        cache = TTLCache(maxsize=16, ttl=60)
+        first = self._request()
+        cache.set(
+            recommendation_key(first, "ctx", ["source:a"], "model:x", True),
+            "BMI 27.3, probabilitas 42.0%",
+        )
+
+        for change in (
+            {"age": 49},
+            {"height": 172},
+            {"weight": 80.5},
+            {"bmi": 28.9},
+            {"systolic_blood_pressure": 128},
+            {"diastolic_blood_pressure": 78},
+            {"prob_disease": 47.5},
+        ):
+            similar = self._request(**change)
+            key = recommendation_key(similar, "ctx", ["source:a"], "model:x", True)
+            assert cache.get(key) is None, change
+
+    def test_key_changes(self):
+        """Test profile, context, model and evaluation changes start new entries."""
+        request = self._request()
+        key = recommendation_key(request, "ctx", ["source:a"], "model:x", True)
+
+        assert recommendation_key(self._request(risk_level="high"), "ctx", ["source:a"], "model:x", True) != key
+        assert recommendation_key(self._request(smoking=1), "ctx", ["source:a"], "model:x", True) != key
+        assert recommendation_key(request, "ctx2", ["source:a"], "model:x", True) != key
+        assert recommendation_key(request, "ctx", ["source:b"], "model:x", True) != key
+        assert recommendation_key(request, "ctx", ["source:a"], "model:y", True) != key
+        assert recommendation_key(request, "ctx", ["source:a"], "model:x", False) != key
+
+
+# ============================================================================
+# TEST SUITE 14: Scoped Vector Search
+# ============================================================================
+
+
+class TestScopedVectorSearch:
+    """Test suite for notebook-scoped vector search in a large corpus."""
+
+    @staticmethod
+    def _rows(count):
+        return [
+            {"id": f"source:s{i}", "content": f"chunk {i}", "order": 0, "similarity": 0.9}
+            for i in range(count)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_small_notebook_scanned_exactly(self):
+        """Test a small notebook is scored exactly, not filtered from global KNN hits."""
+        from unittest.mock import AsyncMock, patch
+
+        from open_notebook.utils import vector_index
+
+        query = AsyncMock(return_value=self._rows(2))
+        with patch.object(vector_index.memory_vector_index, "enabled", False), patch.object(
+            vector_index,
+            "get_notebook_source_ids",
+            AsyncMock(return_value=["source:s0", "source:s1", "source:s2"]),
+        ), patch.object(vector_index, "repo_query", query):
+            rows = await vector_index.knn_search([0.1, 0.2], notebook_id="notebook:guides")
+
+        assert len(rows) == 2
+        assert query.await_count == 1
+        assert "<|" not in query.await_args.args[0]
+
+    @pytest.mark.asyncio
+    async def test_large_notebook_retries_then_scans(self):
+        """Test a scoped KNN query that comes back short is oversampled, then scanned."""
+        from unittest.mock import AsyncMock, patch
+
+        from open_notebook.utils import vector_index
+
+        source_ids = [f"source:s{i}" for i in range(vector_index.VECTOR_EXACT_SCAN_MAX_SOURCES + 10)]
+        # The notebook's chunks are outside the global top candidates
+        query = AsyncMock(side_effect=[[], self._rows(1), self._rows(8)])
+        with patch.object(vector_index.memory_vector_index, "enabled", False), patch.object(
+            vector_index, "get_notebook_source_ids", AsyncMock(return_value=source_ids)
+        ), patch.object(vector_index, "repo_query", query):
+            rows = await vector_index.knn_search(
+                [0.1, 0.2], notebook_id="notebook:guides", limit=8, candidates=200
+            )
+
+        assert len(rows) == 8
+        statements = [call.args[0] for call in query.await_args_list]
+        assert "<|200," in statements[0]
+        assert f"<|{200 * vector_index.VECTOR_SEARCH_OVERSAMPLE}," in statements[1]
+        assert "<|" not in statements[2]
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])